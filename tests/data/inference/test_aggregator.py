@@ -1,25 +1,29 @@
 import torch
+import numpy as np
 import torchio as tio
 from torchio import LOCATION, DATA
+from torchio.data.inference.aggregator import (
+    get_gaussian_weights,
+    get_last_occurrences,
+)
 from ...utils import TorchioTestCase
 
 
 class TestAggregator(TorchioTestCase):
     """Tests for `aggregator` module."""
 
-    def aggregate(self, mode, fixture):
+    def aggregate(self, mode, fixture, patch_weights=None):
         tensor = torch.ones(1, 1, 4, 4)
-<<<<<<< HEAD
-        IMG = 'img'
-        subject = tio.Subject({IMG: tio.ScalarImage(tensor=tensor)})
-=======
         image_name = 'img'
         subject = tio.Subject({image_name: tio.ScalarImage(tensor=tensor)})
->>>>>>> 3f98bcf00e4d004418f21f0cdb5282bee77fada3
         patch_size = 1, 3, 3
         patch_overlap = 0, 2, 2
         sampler = tio.data.GridSampler(subject, patch_size, patch_overlap)
-        aggregator = tio.data.GridAggregator(sampler, overlap_mode=mode)
+        aggregator = tio.data.GridAggregator(
+            sampler,
+            overlap_mode=mode,
+            patch_weights=patch_weights,
+        )
         loader = torch.utils.data.DataLoader(sampler, batch_size=3)
         values_dict = {
             (0, 0): 0,
@@ -28,17 +32,10 @@ class TestAggregator(TorchioTestCase):
             (1, 1): 6,
         }
         for batch in loader:
-<<<<<<< HEAD
-            for location, data in zip(batch[LOCATION], batch[IMG][DATA]):
-                coords_2d = tuple(location[1:3].tolist())
-                data *= values_dict[coords_2d]
-            aggregator.add_batch(batch[IMG][DATA], batch[LOCATION])
-=======
             for location, data in zip(batch[LOCATION], batch[image_name][DATA]):
                 coords_2d = tuple(location[1:3].tolist())
                 data *= values_dict[coords_2d]
             aggregator.add_batch(batch[image_name][DATA], batch[LOCATION])
->>>>>>> 3f98bcf00e4d004418f21f0cdb5282bee77fada3
         output = aggregator.get_output_tensor()
         self.assertTensorEqual(output, fixture)
 
@@ -82,3 +79,162 @@ class TestAggregator(TorchioTestCase):
         aggregator = self.run_sampler_aggregator()
         with self.assertWarns(UserWarning):
             aggregator.get_output_tensor()
+
+    def reconstruct(self, overlap_mode, patch_size, patch_overlap, padding):
+        tensor = torch.rand(2, 17, 12, 9)
+        aggregator = self.aggregate_tensor(
+            tensor,
+            overlap_mode,
+            patch_size,
+            patch_overlap,
+            padding,
+        )
+        self.assertTensorAlmostEqual(aggregator.get_output_tensor(), tensor)
+
+    def aggregate_tensor(
+            self,
+            tensor,
+            overlap_mode,
+            patch_size,
+            patch_overlap,
+            padding,
+            **kwargs,
+            ):
+        subject = tio.Subject(image=tio.ScalarImage(tensor=tensor))
+        grid_sampler = tio.inference.GridSampler(
+            subject,
+            patch_size,
+            patch_overlap,
+            padding_mode=padding,
+        )
+        patch_loader = torch.utils.data.DataLoader(grid_sampler, batch_size=5)
+        aggregator = tio.inference.GridAggregator(
+            grid_sampler,
+            overlap_mode=overlap_mode,
+            **kwargs,
+        )
+        for batch in patch_loader:
+            aggregator.add_batch(batch['image'][DATA], batch[LOCATION])
+        return aggregator
+
+    def test_reconstruction_crop(self):
+        self.reconstruct('crop', (6, 4, 9), (2, 2, 0), 'constant')
+        self.reconstruct('crop', 4, 0, None)
+
+    def test_reconstruction_average(self):
+        for padding in None, 'constant':
+            self.reconstruct('average', (5, 4, 9), (2, 2, 0), padding)
+            self.reconstruct('average', 4, 0, padding)
+
+    def test_reconstruction_gaussian(self):
+        self.reconstruct('gaussian', (6, 4, 9), (2, 2, 0), None)
+        self.reconstruct('gaussian', 4, 2, 'constant')
+
+    def test_gaussian_weights(self):
+        weights = get_gaussian_weights((5, 4, 1))
+        self.assertEqual(weights.shape, (5, 4, 1))
+        self.assertEqual(weights.max(), weights[2, 1, 0])
+        self.assertEqual(weights.max(), weights[2, 2, 0])
+        self.assertTensorAlmostEqual(weights, weights.flip(0).flip(1))
+        self.assertGreater(weights.min(), 0)
+
+    def test_overlap_weighted(self):
+        # The center of each patch weighs 5 times more than the rest
+        patch_weights = torch.ones(1, 3, 3)
+        patch_weights[0, 1, 1] = 5
+        fixture = torch.Tensor((
+            (0, 1, 1, 2),
+            (2, 1.5, 2.5, 4),
+            (2, 3.5, 4.5, 4),
+            (4, 5, 5, 6),
+        )).reshape(1, 1, 4, 4)
+        self.aggregate('weighted', fixture, patch_weights=patch_weights)
+
+    def test_weighted_no_weights(self):
+        with self.assertRaises(ValueError):
+            self.reconstruct('weighted', 4, 0, None)
+
+    def test_weights_wrong_mode(self):
+        sampler = tio.inference.GridSampler(self.sample_subject, 4)
+        with self.assertRaises(ValueError):
+            tio.inference.GridAggregator(
+                sampler,
+                overlap_mode='crop',
+                patch_weights=torch.ones(4, 4, 4),
+            )
+
+    def test_weights_wrong_shape(self):
+        sampler = tio.inference.GridSampler(self.sample_subject, 4)
+        with self.assertRaises(ValueError):
+            tio.inference.GridAggregator(
+                sampler,
+                overlap_mode='weighted',
+                patch_weights=torch.ones(4, 4, 3),
+            )
+
+    def test_weights_not_positive(self):
+        sampler = tio.inference.GridSampler(self.sample_subject, 4)
+        with self.assertRaises(ValueError):
+            tio.inference.GridAggregator(
+                sampler,
+                overlap_mode='weighted',
+                patch_weights=torch.zeros(4, 4, 4),
+            )
+
+    def test_memmap(self):
+        tensor = torch.rand(3, 17, 12, 9)
+        for overlap_mode in 'crop', 'average', 'gaussian':
+            path = self.dir / f'{overlap_mode}.npy'
+            args = tensor, overlap_mode, (6, 4, 4), 2, 'constant'
+            expected = self.aggregate_tensor(*args).get_output_tensor()
+            aggregator = self.aggregate_tensor(*args, output_path=path)
+            output = aggregator.get_output_tensor()
+            self.assertTensorAlmostEqual(output, expected)
+            # Calling again does not normalize the values twice
+            output = aggregator.get_output_tensor()
+            self.assertTensorAlmostEqual(output, expected)
+            self.assertEqual(np.load(path).shape, (3, 19, 14, 11))
+
+    def test_accumulation_dtype(self):
+        tensor = torch.rand(2, 17, 12, 9)
+        aggregator = self.aggregate_tensor(
+            tensor,
+            'average',
+            (6, 4, 4),
+            2,
+            None,
+            accumulation_dtype=torch.float16,
+        )
+        output = aggregator.get_output_tensor()
+        self.assertEqual(output.dtype, torch.float16)
+        self.assertTensorAlmostEqual(output.float(), tensor, decimal=2)
+
+    def test_argmax(self):
+        tensor = torch.rand(5, 17, 12, 9)
+        for overlap_mode in 'crop', 'average', 'gaussian':
+            args = tensor, overlap_mode, (6, 4, 4), 2, 'constant'
+            expected = self.aggregate_tensor(*args).get_output_tensor()
+            expected = expected.argmax(dim=0)
+            aggregator = self.aggregate_tensor(*args, argmax=True)
+            output = aggregator.get_output_tensor()
+            self.assertEqual(output.shape, (1, 17, 12, 9))
+            self.assertEqual(output.dtype, torch.uint8)
+            self.assertTensorEqual(output[0].long(), expected)
+
+    def test_memmap_wrong_dtype(self):
+        with self.assertRaises(ValueError):
+            self.aggregate_tensor(
+                torch.rand(1, 8, 8, 8),
+                'average',
+                4,
+                0,
+                None,
+                output_path=self.dir / 'bfloat16.npy',
+                accumulation_dtype=torch.bfloat16,
+            )
+
+    def test_last_occurrences(self):
+        indices = torch.tensor([4, 2, 4, 7, 2, 2, 9])
+        mask = get_last_occurrences(indices)
+        expected = [False, False, True, True, False, True, True]
+        self.assertEqual(mask.tolist(), expected)
@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 
 from copy import copy
-from torchio.data import GridSampler
+import torch
+import numpy as np
+import torchio
+from torchio import DATA, AFFINE, PATH, LOCATION
+from torchio.data import GridSampler, GridAggregator
 from ...utils import TorchioTestCase
 
 
@@ -48,3 +52,64 @@ class TestGridSampler(TorchioTestCase):
             self.sample_subject, patch_size, patch_overlap, padding_mode='reflect')
         final_shape = self.sample_subject.shape
         self.assertEqual(initial_shape, final_shape)
+
+    def test_patches_are_views(self):
+        self.sample_subject.load()
+        sampler = GridSampler(self.sample_subject, (5, 10, 10), (2, 4, 6))
+        for index in range(len(sampler)):
+            patch = sampler[index]
+            location = sampler.locations[index]
+            expected = sampler.crop(sampler.subject, location[:3], (5, 10, 10))
+            for name, image in patch.get_images_dict().items():
+                self.assertTensorEqual(image.data, expected[name].data)
+                self.assertTensorEqual(image.affine, expected[name].affine)
+            self.assertEqual(patch.history, [])
+        patch.t1.data.fill_(-1)  # patches share memory with the subject
+        i0, j0, k0, i1, j1, k1 = location
+        region = sampler.subject.t1.data[:, i0:i1, j0:j1, k0:k1]
+        self.assertTensorEqual(region, -torch.ones_like(region))
+
+    def test_batch(self):
+        sampler = GridSampler(
+            self.sample_subject, (5, 10, 10), (2, 4, 6), padding_mode=0)
+        batch_sampler = torch.utils.data.BatchSampler(
+            torch.utils.data.SequentialSampler(sampler),
+            batch_size=4,
+            drop_last=False,
+        )
+        loader = torch.utils.data.DataLoader(
+            sampler, sampler=batch_sampler, batch_size=None)
+        collated_loader = torch.utils.data.DataLoader(sampler, batch_size=4)
+        for batch, expected in zip(loader, collated_loader):
+            self.assertEqual(batch.keys(), expected.keys())
+            self.assertTensorEqual(batch[LOCATION], expected[LOCATION])
+            for name in 't1', 't2', 'label':
+                self.assertEqual(batch[name].keys(), expected[name].keys())
+                self.assertTensorEqual(batch[name][DATA], expected[name][DATA])
+                self.assertTensorAlmostEqual(
+                    batch[name][AFFINE], expected[name][AFFINE])
+                self.assertEqual(batch[name][PATH], expected[name][PATH])
+
+    def test_lazy_batch(self):
+        subject = torchio.Subject(
+            t1=torchio.ScalarImage(self.get_image_path('lazy', suffix='.nii')),
+        )
+        sampler = GridSampler(subject, (5, 10, 10), (2, 4, 6))
+        batch = sampler[np.arange(4)]
+        self.assertFalse(sampler.subject.t1._loaded)
+        for patch_index in range(4):
+            expected = sampler[patch_index]
+            self.assertTensorEqual(
+                batch['t1'][DATA][patch_index], expected.t1.data)
+            self.assertTensorAlmostEqual(
+                batch['t1'][AFFINE][patch_index], expected.t1.affine)
+
+    def test_batch_aggregation(self):
+        subject = self.sample_subject
+        sampler = GridSampler(subject, (5, 10, 10), (2, 4, 6), padding_mode=0)
+        aggregator = GridAggregator(sampler)
+        indices = np.arange(len(sampler))
+        for batch_indices in np.array_split(indices, 3):
+            batch = sampler[batch_indices]
+            aggregator.add_batch(batch['t1'][DATA], batch[LOCATION])
+        self.assertTensorEqual(aggregator.get_output_tensor(), subject.t1.data)
@@ -1,6 +1,8 @@
 import torch
+import numpy as np
 import torchio
 from torchio.data import LabelSampler
+from torchio.data.sampler.label import get_label_index, save_label_index
 from ...utils import TorchioTestCase
 
 
@@ -58,3 +60,66 @@ class TestLabelSampler(TorchioTestCase):
         probabilities = sampler.get_probability_map(subject)
         fixture = torch.Tensor((1 / 4, 3 / 4))
         assert torch.all(probabilities.squeeze().eq(fixture))
+
+    def test_label_index(self):
+        labels = torch.tensor((3, 0, 5, 3, 5, 5, 0)).reshape(1, 1, 1, -1)
+        label_index = get_label_index(labels)
+        self.assertEqual(label_index.labels.tolist(), [0, 3, 5])
+        self.assertEqual(label_index.counts.tolist(), [2, 2, 3])
+        self.assertEqual(label_index.indices.tolist(), [1, 6, 0, 3, 2, 4, 5])
+
+    def test_same_distribution_as_probability_map(self):
+        torch.manual_seed(0)
+        labels = torch.randint(0, 4, (1, 8, 7, 6))
+        labels[0, 4:][labels[0, 4:] == 3] = 0
+        subject = torchio.Subject(label=torchio.LabelMap(tensor=labels))
+        probs_dict = {0: 1, 1: 2, 2: 0, 3: 5}
+        sampler = LabelSampler((5, 3, 1), 'label', probs_dict)
+        probability_map = sampler.get_probability_map(subject)[0].numpy()
+        probability_map = probability_map.astype(float)
+        index_ini, index_fin = sampler.get_centers_bounds(labels.shape[1:])
+        is_center = np.zeros_like(probability_map, dtype=bool)
+        is_center[tuple(map(slice, index_ini, index_fin))] = True
+        probability_map[~is_center] = 0
+        probability_map /= probability_map.sum()
+        table = sampler.get_sampling_table(subject)
+        num_samples = 100000
+        centers = sampler.sample_centers(table, num_samples)
+        histogram = np.zeros_like(probability_map)
+        np.add.at(histogram, tuple(centers.T), 1 / num_samples)
+        self.assertTensorAlmostEqual(histogram, probability_map, decimal=2)
+
+    def test_persist_index(self):
+        subject = torchio.Subject(
+            label=torchio.LabelMap(self.get_image_path('label', binary=True)),
+        )
+        sampler = LabelSampler(5, 'label', persist_index=True)
+        index_path = self.dir / 'label_label_index.npz'
+        self.assertFalse(index_path.is_file())
+        patch = next(sampler(subject))
+        self.assertTrue(index_path.is_file())
+        self.assertEqual(patch['label'][torchio.DATA][0, 2, 2, 2], 1)
+        expected = get_label_index(subject.label.data)
+        loaded = sampler.get_label_index(subject)
+        self.assertEqual(loaded.shape, expected.shape)
+        self.assertTensorEqual(loaded.indices, expected.indices)
+        self.assertTensorEqual(loaded.counts, expected.counts)
+
+    def test_corrupt_index(self):
+        subject = torchio.Subject(
+            label=torchio.LabelMap(self.get_image_path('label', binary=True)),
+        )
+        sampler = LabelSampler(5, 'label', persist_index=True)
+        index_path = self.dir / 'label_label_index.npz'
+        index_path.write_bytes(b'not an index')
+        expected = get_label_index(subject.label.data)
+        label_index = sampler.get_label_index(subject)
+        self.assertTensorEqual(label_index.indices, expected.indices)
+        loaded = sampler.get_label_index(subject)  # rewritten
+        self.assertTensorEqual(loaded.indices, expected.indices)
+
+    def test_save_index_error(self):
+        label_index = get_label_index(torch.ones(1, 2, 3, 4))
+        path = self.dir / 'missing' / 'label_label_index.npz'
+        save_label_index(label_index, path)  # errors are ignored
+        self.assertFalse(path.parent.exists())
@@ -14,3 +14,10 @@ class TestPatchSampler(TorchioTestCase):
 
     def test_extract_patch(self):
         PatchSampler(1).extract_patch(self.sample_subject, (3, 4, 5))
+
+    def test_patch_history_not_recorded(self):
+        subject = self.sample_subject
+        patch = PatchSampler(5).extract_patch(subject, (3, 4, 5))
+        self.assertEqual(patch.history, [])
+        expected = subject.t1.data[:, 3:8, 4:9, 5:10]
+        self.assertTensorEqual(patch.t1.data, expected)
@@ -22,3 +22,14 @@ class TestUniformSampler(TorchioTestCase):
         patch_size = 2
         sampler = UniformSampler(patch_size)
         next(sampler(subject))
+
+    def test_lazy_patches(self):
+        subject = torchio.Subject(
+            t1=torchio.ScalarImage(self.get_image_path('lazy', suffix='.nii')),
+        )
+        sampler = UniformSampler(5)
+        patch = next(sampler(subject))
+        self.assertFalse(subject.t1._loaded)
+        i, j, k = patch['index_ini']
+        expected = subject.t1.data[:, i:i + 5, j:j + 5, k:k + 5]
+        self.assertTensorEqual(patch.t1.data, expected)
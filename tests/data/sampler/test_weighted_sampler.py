@@ -1,6 +1,8 @@
 import torch
+import numpy as np
 import torchio
 from torchio.data import WeightedSampler
+from torchio.data.sampler.weighted import get_alias_table
 from ...utils import TorchioTestCase
 
 
@@ -33,3 +35,44 @@ class TestWeightedSampler(TorchioTestCase):
         patch_size = 2
         sampler = torchio.data.WeightedSampler(patch_size, 'im1')
         next(sampler(subject))
+
+    def test_alias_table(self):
+        weights = np.array((0.5, 3, 1, 0.1, 7, 2, 2, 0.4))
+        probabilities, aliases = get_alias_table(weights)
+        # Reconstruct the distribution from the columns of the table
+        num_columns = len(weights)
+        distribution = np.bincount(
+            aliases,
+            weights=1 - probabilities,
+            minlength=num_columns,
+        )
+        distribution += probabilities
+        self.assertTensorAlmostEqual(
+            distribution / num_columns, weights / weights.sum())
+
+    def test_sampling_distribution(self):
+        prob = torch.zeros(1, 5, 5, 5)
+        prob[0, 1, 2, 3] = 1
+        prob[0, 3, 1, 2] = 3
+        subject = torchio.Subject(prob=torchio.ScalarImage(tensor=prob))
+        sampler = WeightedSampler(3, 'prob')
+        patches = list(sampler(subject, num_patches=4000))
+        self.assertEqual(len(patches), 4000)
+        indices_ini = np.array([patch['index_ini'] for patch in patches])
+        first = np.all(indices_ini == (0, 1, 2), axis=1).sum()
+        second = np.all(indices_ini == (2, 0, 1), axis=1).sum()
+        self.assertEqual(first + second, 4000)
+        self.assertAlmostEqual(second / 4000, 0.75, delta=0.03)
+
+    def test_cache(self):
+        subject = torchio.Subject(
+            t1=torchio.ScalarImage(self.get_image_path('t1')),
+            prob=torchio.ScalarImage(self.get_image_path('prob')),
+        )
+        sampler = WeightedSampler(5, 'prob', cache_size=1)
+        next(sampler(subject))
+        table = sampler.get_sampling_table(subject)
+        self.assertIs(sampler.get_sampling_table(subject), table)
+        transformed = torchio.Crop((0, 1, 0, 0, 0, 0))(subject)
+        self.assertIsNot(sampler.get_sampling_table(transformed), table)
+        self.assertEqual(len(sampler._tables), 1)
@@ -6,6 +6,8 @@ import copy
 import h5py
 import torch
 import numpy as np
+import nibabel as nib
+import torchio as tio
 from torchio import ScalarImage, LabelMap, Subject, INTENSITY, LABEL, STEM
 from ..utils import TorchioTestCase
 from torchio import RandomFlip, RandomAffine
@@ -142,3 +144,92 @@ class TestImage(TorchioTestCase):
     def test_plot(self):
         image = self.sample_subject.t1
         image.plot(show=False, output_path=self.dir / 'image.png')
+
+    def test_mmap_crop(self):
+        path = self.dir / 'mmap.nii'
+        data = np.arange(60, dtype=np.int16).reshape(3, 4, 5)
+        nib.save(nib.Nifti1Image(data, np.eye(4)), str(path))
+        subject = tio.Subject(image=tio.ScalarImage(path, mmap=True))
+        cropped = tio.Crop((1, 1, 1, 1, 1, 1))(subject)
+        self.assertEqual(cropped.image.data.dtype, torch.float32)
+        self.assertTensorEqual(
+            cropped.image.data[0],
+            torch.from_numpy(data[1:-1, 1:-1, 1:-1]).float(),
+        )
+        self.assertEqual(subject.image.data.dtype, torch.int16)
+
+    def test_mmap_normalization(self):
+        path = self.dir / 'mmap.nii'
+        data = np.arange(60, dtype=np.int16).reshape(3, 4, 5)
+        nib.save(nib.Nifti1Image(data, np.eye(4)), str(path))
+        image = tio.ScalarImage(path, mmap=True)
+        region, _ = image.read_region((0, 1, 1), (3, 3, 4))
+        self.assertEqual(image.data.dtype, torch.int16)
+        self.assertEqual(region.dtype, torch.float32)
+        patch = tio.ScalarImage(tensor=region)
+        transforms = tio.ZNormalization(), tio.RescaleIntensity((0, 1))
+        for transform in transforms:
+            for input_image in image, patch:
+                transformed = transform(tio.Subject(image=input_image))
+                self.assertEqual(transformed.image.data.dtype, torch.float32)
+        self.assertEqual(image.data.dtype, torch.int16)
+
+    def test_read_region_lazy(self):
+        index_ini = 1, 2, 3
+        index_fin = 5, 10, 20
+        for suffix in ('.nii.gz', '.nii', '.nrrd', '.img', '.mnc'):
+            path = self.get_image_path('region', suffix=suffix)
+            image = ScalarImage(path)
+            self.assertEqual(image.shape, (1, 10, 20, 30))
+            copied = copy.copy(image)
+            region, affine = copied.read_region(index_ini, index_fin)
+            self.assertFalse(image._loaded)
+            self.assertFalse(copied._loaded)
+            image.load()
+            loaded_region, loaded_affine = image.read_region(
+                index_ini, index_fin)
+            self.assertEqual(region.shape, (1, 4, 8, 17))
+            self.assertTensorAlmostEqual(region, loaded_region)
+            self.assertTensorAlmostEqual(affine, loaded_affine)
+            expected = image.data[:, 1:5, 2:10, 3:20]
+            expected_affine = image.affine.copy()
+            expected_affine[:3, 3] += image.affine[:3, :3] @ index_ini
+            self.assertTensorEqual(region, expected)
+            self.assertTrue(np.allclose(affine, expected_affine))
+
+    def test_read_region_h5_lazypatch(self):
+        path = self.get_h5DS_path('lazy_region', no_channel_dim=True)
+        with h5py.File(path, 'r') as f:
+            image = ScalarImage(h5DS=f['data'], lazypatch=True)
+            self.assertEqual(image.shape, (1, 10, 20, 30))
+            subject = Subject(image=image)
+            cropped = tio.Crop((1, 2, 3, 4, 5, 6))(subject)
+            expected = f['data'][1:-2, 3:-4, 5:-6]
+        self.assertEqual(cropped.image.shape, (1, 7, 13, 19))
+        self.assertTensorEqual(cropped.image.data[0], expected)
+
+    def test_header_metadata(self):
+        for suffix in ('.nii.gz', '.nii', '.nrrd', '.img', '.mnc'):
+            path = self.get_image_path(
+                'header', suffix=suffix, spacing=(1, 2, 3))
+            image = ScalarImage(path)
+            metadata = (
+                image.shape,
+                image.spacing,
+                image.orientation,
+                image.get_center(),
+                image.get_bounds(),
+            )
+            bounds = image.bounds
+            Subject(image=image).check_consistent_spatial_shape()
+            self.assertFalse(image._loaded)
+            image.load()
+            loaded_metadata = (
+                image.shape,
+                image.spacing,
+                image.orientation,
+                image.get_center(),
+                image.get_bounds(),
+            )
+            self.assertEqual(metadata, loaded_metadata)
+            self.assertTensorAlmostEqual(bounds, image.bounds)
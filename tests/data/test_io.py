@@ -4,6 +4,7 @@ from pathlib import Path
 import torch
 import pytest
 import numpy as np
+import nibabel as nib
 
 from ..utils import TorchioTestCase
 from torchio.data import io, ScalarImage
@@ -29,6 +30,37 @@ class TestIO(TorchioTestCase):
         # I need to find something readable by nib but not sitk
         io.read_image(self.nii_path)
 
+    def test_read_image_mmap(self):
+        path = self.dir / 'int16.nii'
+        data = np.arange(60, dtype=np.int16).reshape(3, 4, 5)
+        nib.save(nib.Nifti1Image(data, np.eye(4)), str(path))
+        tensor, _ = io.read_image(path, mmap=True)
+        self.assertEqual(tensor.dtype, torch.int16)
+        self.assertEqual(tuple(tensor.shape), (1, 3, 4, 5))
+        self.assertTensorEqual(tensor[0], torch.from_numpy(data))
+
+    def test_read_image_mmap_affine(self):
+        path = self.dir / 'qform_sform.nii'
+        qform = np.diag((2, 2, 2, 1))
+        qform[:3, 3] = 5, 6, 7
+        sform = np.diag((1, 1.5, 3, 1))
+        data = np.arange(60, dtype=np.int16).reshape(3, 4, 5)
+        nii = nib.Nifti1Image(data, None)
+        nii.set_qform(qform, code=1)
+        nii.set_sform(sform, code=1)
+        nib.save(nii, str(path))
+        _, affine = io.read_image(path)
+        _, mmap_affine = io.read_image(path, mmap=True)
+        self.assertTrue(np.allclose(mmap_affine, affine))
+        self.assertTrue(np.allclose(mmap_affine, io.read_affine(path)))
+
+    def test_read_image_mmap_compressed(self):
+        path = self.dir / 'int16.nii.gz'
+        data = np.arange(60, dtype=np.int16).reshape(3, 4, 5)
+        nib.save(nib.Nifti1Image(data, np.eye(4)), str(path))
+        tensor, _ = io.read_image(path, mmap=True)
+        self.assertEqual(tensor.dtype, torch.float32)
+
     def test_save_rgb(self):
         im = ScalarImage(tensor=torch.rand(1, 4, 5, 1))
         with self.assertWarns(UserWarning):
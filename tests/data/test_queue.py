@@ -1,6 +1,11 @@
-from torch.utils.data import DataLoader
+from itertools import islice
+
+import torch
+from torch.utils.data import DataLoader, DistributedSampler
+from torch.utils.data import BatchSampler, SequentialSampler
 from torchio.data import UniformSampler
-from torchio import SubjectsDataset, Queue, DATA
+from torchio.data.queue import PatchesStorage, get_patches_memory
+from torchio import SubjectsDataset, Queue, DATA, AFFINE
 from torchio.utils import create_dummy_dataset
 from ..utils import TorchioTestCase
 
@@ -34,3 +39,147 @@ class TestQueue(TorchioTestCase):
         for batch in batch_loader:
             _ = batch['one_modality'][DATA]
             _ = batch['segmentation'][DATA]
+
+    def test_queue_fill_in_background(self):
+        subjects_dataset = SubjectsDataset(self.subjects_list)
+        sampler = UniformSampler(10)
+        queue_dataset = Queue(
+            subjects_dataset,
+            max_length=6,
+            samples_per_volume=2,
+            sampler=sampler,
+            fill_in_background=True,
+        )
+        batch_loader = DataLoader(queue_dataset, batch_size=4)
+        num_patches = 0
+        for batch in batch_loader:
+            num_patches += len(batch['one_modality'][DATA])
+        self.assertEqual(num_patches, len(queue_dataset))
+        self.assertGreaterEqual(queue_dataset.blocked_time, 0)
+        self.assertIn('blocked_time', str(queue_dataset))
+
+    def test_queue_sample_in_workers(self):
+        subjects_dataset = SubjectsDataset(self.subjects_list)
+        sampler = UniformSampler(10)
+        for num_workers in 0, 2:
+            queue_dataset = Queue(
+                subjects_dataset,
+                max_length=6,
+                samples_per_volume=3,
+                sampler=sampler,
+                num_workers=num_workers,
+                sample_in_workers=True,
+            )
+            batch_loader = DataLoader(queue_dataset, batch_size=4)
+            num_patches = 0
+            for batch in batch_loader:
+                patches = batch['one_modality'][DATA]
+                self.assertEqual(patches.shape[-3:], (10, 10, 10))
+                num_patches += len(patches)
+            self.assertEqual(num_patches, len(queue_dataset))
+
+    def test_queue_subject_sampler(self):
+        subjects_dataset = SubjectsDataset(self.subjects_list)
+        epochs_paths = []
+        for rank in range(2):
+            subject_sampler = DistributedSampler(
+                subjects_dataset,
+                num_replicas=2,
+                rank=rank,
+                shuffle=True,
+                seed=42,
+            )
+            queue_dataset = Queue(
+                subjects_dataset,
+                max_length=5,
+                samples_per_volume=1,
+                sampler=UniformSampler(10),
+                shuffle_patches=False,
+                subject_sampler=subject_sampler,
+            )
+            self.assertEqual(len(queue_dataset), 5)
+            paths = [
+                [queue_dataset[i]['one_modality']['path'] for i in range(5)]
+                for _ in range(2)  # epochs
+            ]
+            epochs_paths.append(paths)
+        for epoch in range(2):
+            rank_0_paths = epochs_paths[0][epoch]
+            rank_1_paths = epochs_paths[1][epoch]
+            self.assertEqual(len(set(rank_0_paths + rank_1_paths)), 10)
+        # Subjects are shuffled differently at each epoch
+        self.assertNotEqual(epochs_paths[0][0], epochs_paths[0][1])
+
+    def test_queue_max_memory(self):
+        subjects_dataset = SubjectsDataset(self.subjects_list)
+        samples_per_volume = 2
+        sampler = UniformSampler(10)
+        patch = next(sampler(subjects_dataset[0]))
+        images = patch.get_images(intensity_only=False)
+        patch_memory = sum(image.memory for image in images)
+        max_memory = 3 * samples_per_volume * patch_memory
+        queue_dataset = Queue(
+            subjects_dataset,
+            max_length=20,
+            samples_per_volume=samples_per_volume,
+            sampler=sampler,
+            max_memory=max_memory,
+        )
+        _ = queue_dataset[0]
+        self.assertEqual(queue_dataset.num_patches, 3 * samples_per_volume - 1)
+        self.assertEqual(
+            queue_dataset.memory,
+            queue_dataset.num_patches * patch_memory,
+        )
+        self.assertEqual(queue_dataset.num_filled_patches, 6)
+        self.assertGreater(queue_dataset.patches_per_second, 0)
+        self.assertIn('memory', str(queue_dataset))
+
+    def test_queue_contiguous_storage(self):
+        subjects_dataset = SubjectsDataset(self.subjects_list)
+        queue_dataset = Queue(
+            subjects_dataset,
+            max_length=6,
+            samples_per_volume=2,
+            sampler=UniformSampler(10),
+            contiguous_storage=True,
+        )
+        batch_sampler = BatchSampler(
+            SequentialSampler(queue_dataset),
+            batch_size=4,
+            drop_last=False,
+        )
+        batch_loader = DataLoader(
+            queue_dataset,
+            sampler=batch_sampler,
+            batch_size=None,
+        )
+        num_patches = 0
+        for batch in batch_loader:
+            patches = batch['one_modality'][DATA]
+            self.assertEqual(patches.shape[-3:], (10, 10, 10))
+            self.assertEqual(len(batch['segmentation'][DATA]), len(patches))
+            self.assertEqual(len(batch['one_modality'][AFFINE]), len(patches))
+            num_patches += len(patches)
+        self.assertEqual(num_patches, len(queue_dataset))
+        remaining_patches = list(queue_dataset.patches_list)
+        self.assertEqual(
+            queue_dataset.memory,
+            get_patches_memory(remaining_patches),
+        )
+
+    def test_patches_storage(self):
+        sampler = UniformSampler(10)
+        subject = SubjectsDataset(self.subjects_list)[0]
+        patches = list(islice(sampler(subject), 5))
+        expected = [patch['one_modality'][DATA].clone() for patch in patches]
+        storage = PatchesStorage(patches)
+        self.assertEqual(storage.tensors['one_modality'].shape[0], 5)
+        batch, _ = storage.pop_batch(3)
+        self.assertEqual(len(storage), 2)
+        self.assertTensorEqual(
+            batch['one_modality'][DATA], torch.stack(expected[2:]))
+        self.assertTensorEqual(storage.pop()['one_modality'][DATA], expected[1])
+        patches[0]['one_modality'].set_data(torch.rand(1, 10, 10, 9))
+        with self.assertRaises(ValueError):
+            PatchesStorage(patches)
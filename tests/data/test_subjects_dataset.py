@@ -77,3 +77,96 @@ class TestSubjectsDataset(TorchioTestCase):
         for batch in loader:
             batch['t1'][DATA]
             batch['brain'][DATA]
+
+    def test_cache_dir(self):
+        transform = torchio.Compose([
+            torchio.ToCanonical(),
+            torchio.RescaleIntensity((0, 1)),
+            torchio.RandomNoise(),
+        ])
+        cache_dir = self.dir / 'cache'
+        dataset = SubjectsDataset(
+            self.subjects_list,
+            transform=transform,
+            cache_dir=cache_dir,
+        )
+        first = dataset[0]
+        self.assertEqual(len(list(cache_dir.iterdir())), 1)
+        second = dataset[0]
+        self.assertEqual(len(list(cache_dir.iterdir())), 1)
+        names = [name for name, _ in second.history]
+        self.assertEqual(names, ['ToCanonical', 'RescaleIntensity', 'RandomNoise'])
+        reference = SubjectsDataset(
+            self.subjects_list,
+            transform=torchio.Compose(transform.transform.transforms[:2]),
+        )[0]
+        first_noise = first.t1.data - reference.t1.data
+        second_noise = second.t1.data - reference.t1.data
+        self.assertTensorNotEqual(first_noise, second_noise)
+        self.assertTensorAlmostEqual(first.t1.affine, second.t1.affine)
+
+    def test_cache_dir_nested_random(self):
+        transform = torchio.Compose(
+            [
+                torchio.ToCanonical(),
+                torchio.Compose([torchio.RandomNoise()]),
+            ],
+            fuse_spatial=True,
+        )
+        dataset = SubjectsDataset(
+            self.subjects_list,
+            transform=transform,
+            cache_dir=self.dir / 'cache',
+        )
+        self.assertEqual(len(dataset._deterministic_transforms), 1)
+        self.assertTrue(dataset._random_transform.fuse_spatial)
+        self.assertTensorNotEqual(dataset[0].t1.data, dataset[0].t1.data)
+
+    def test_cache_key_stable(self):
+        def get_key(transform):
+            dataset = SubjectsDataset(
+                self.subjects_list,
+                transform=transform,
+                cache_dir=self.dir / 'cache',
+            )
+            return dataset._get_cache_key(self.subjects_list[0])
+        key = get_key(torchio.CropOrPad(10))
+        self.assertIsNotNone(key)
+        self.assertEqual(key, get_key(torchio.CropOrPad(10)))
+        self.assertNotEqual(key, get_key(torchio.CropOrPad(12)))
+        transform = torchio.RescaleIntensity(
+            (0, 1),
+            masking_method=lambda x: x > 0,
+        )
+        self.assertIsNone(get_key(transform))
+
+    def test_loaded_data_shared(self):
+        subject = self.sample_subject
+        subject.load()
+        dataset = SubjectsDataset([subject])
+        self.assertIs(dataset[0].t1.data, subject.t1.data)
+
+    def test_loaded_data_not_modified(self):
+        subject = self.sample_subject
+        subject.load()
+        original = subject.t1.data.clone()
+        transform = torchio.RescaleIntensity((0, 1))
+        dataset = SubjectsDataset([subject], transform=transform)
+        transformed = dataset[0]
+        self.assertTensorNotEqual(transformed.t1.data, subject.t1.data)
+        self.assertTensorEqual(subject.t1.data, original)
+
+    def test_unloaded_copy(self):
+        dataset = SubjectsDataset(self.subjects_list, load_getitem=False)
+        subject = dataset[0]
+        self.assertFalse(subject.t1._loaded)
+        self.assertFalse(self.subjects_list[0].t1._loaded)
+
+    def test_shared_memory(self):
+        dataset = SubjectsDataset(self.subjects_list, shared_memory=True)
+        for subject in self.subjects_list:
+            for image in subject.get_images(intensity_only=False):
+                self.assertTrue(image.data.is_shared())
+        self.assertEqual(len(dataset._arenas), 1)
+        subject = dataset[0]
+        self.assertTrue(subject.t1.data.is_shared())
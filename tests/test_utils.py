@@ -2,6 +2,8 @@
 
 """Tests for `utils` package."""
 
+import tracemalloc
+
 import numpy as np
 import SimpleITK as sitk
 from torchio import RandomFlip
@@ -56,6 +58,18 @@ class TestUtils(TorchioTestCase):
         tensor, affine = sitk_to_nib(image)
         self.assertAlmostEqual(data.sum(), tensor.sum())
 
+    def test_sitk_to_nib_single_copy(self):
+        data = np.random.randint(0, 100, size=(30, 40, 50)).astype(np.int16)
+        image = sitk.GetImageFromArray(data)
+        tracemalloc.start()
+        array, _ = sitk_to_nib(image, dtype=np.float32)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertEqual(array.dtype, np.float32)
+        self.assertTensorEqual(array[0], data.transpose().astype(np.float32))
+        # Only the float32 array is allocated, with no intermediate int16 copy
+        self.assertLess(peak, 1.1 * array.nbytes)
+
 
 class TestNibabelToSimpleITK(TorchioTestCase):
 
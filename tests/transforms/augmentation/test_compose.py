@@ -0,0 +1,142 @@
+import torch
+import numpy as np
+import torchio
+from torchio.transforms import (
+    Pad,
+    Crop,
+    Compose,
+    Resample,
+    CropOrPad,
+    ToCanonical,
+    RandomAffine,
+)
+from ...utils import TorchioTestCase
+
+
+class TestCompose(TorchioTestCase):
+    """Tests for `Compose`."""
+    def get_subject(self, tensor=None):
+        affine = np.diag((1.5, -1, 2, 1))
+        affine[:3, 3] = 3, -2, 1
+        if tensor is None:
+            tensor = torch.rand(2, 20, 22, 18)
+        label = (torch.rand(1, 20, 22, 18) > 0.5).float()
+        return torchio.Subject(
+            t1=torchio.ScalarImage(tensor=tensor, affine=affine),
+            label=torchio.LabelMap(tensor=label, affine=affine.copy()),
+        )
+
+    def assert_fused_equal(self, transforms, subject, **kwargs):
+        torch.manual_seed(0)
+        expected = Compose(transforms)(subject)
+        torch.manual_seed(0)
+        fused = Compose(transforms, fuse_spatial=True)(subject)
+        for name in 't1', 'label':
+            self.assertEqual(fused[name].shape, expected[name].shape)
+            self.assertTensorAlmostEqual(
+                fused[name].affine, expected[name].affine)
+            self.assertTensorAlmostEqual(
+                fused[name].data, expected[name].data, **kwargs)
+        return expected, fused
+
+    def test_fuse_reorient_resample_crop(self):
+        transforms = ToCanonical(), Resample(1.3), CropOrPad((15, 16, 30))
+        self.assert_fused_equal(transforms, self.get_subject(), decimal=5)
+
+    def test_fuse_crop_pad(self):
+        transforms = Crop((1, 2, 3, 1, 0, 2)), Pad((2, 1, 0, 3, 1, 1))
+        self.assert_fused_equal(transforms, self.get_subject(), decimal=5)
+
+    def test_fuse_affine(self):
+        # Interpolating twice a smooth image is close to interpolating once
+        i, j, k = (torch.arange(n).float() for n in (20, 22, 18))
+        tensor = i[:, None, None] + j[:, None] + k
+        tensor = tensor[np.newaxis]
+        transforms = (
+            RandomAffine(degrees=10, scales=0.1, default_pad_value=0),
+            Crop((2, 3, 2, 3, 2, 3)),
+            Resample(1.3),
+        )
+        # Cropping does not interpolate, so the results are the same
+        subject = self.get_subject(tensor)
+        self.assert_fused_equal(transforms[:2], subject, decimal=4)
+        torch.manual_seed(0)
+        transformed = Compose(transforms)(self.get_subject(tensor))
+        torch.manual_seed(0)
+        fused = Compose(transforms, fuse_spatial=True)(self.get_subject(tensor))
+        difference = (fused.t1.data - transformed.t1.data).abs()
+        self.assertLess(difference.median(), 0.05)
+
+    def test_history(self):
+        transforms = (
+            ToCanonical(),
+            RandomAffine(),
+            torchio.RandomNoise(),
+            Crop(1),
+            Pad(1),
+        )
+        torch.manual_seed(0)
+        expected = Compose(transforms)(self.get_subject())
+        torch.manual_seed(0)
+        fused = Compose(transforms, fuse_spatial=True)(self.get_subject())
+        self.assertEqual(fused.history, expected.history)
+
+    def test_different_grids(self):
+        subject = self.get_subject()
+        subject.label.affine[0, 3] += 1
+        transforms = Crop(1), Pad(1)
+        self.assert_fused_equal(transforms, subject)
+
+    def test_not_fusable(self):
+        transforms = Crop(1), Pad(1, padding_mode='reflect')
+        self.assert_fused_equal(transforms, self.get_subject())
+
+    def test_fuse_kspace(self):
+        transforms = (
+            torchio.RandomMotion(num_transforms=2, backend='torch'),
+            torchio.RandomGhosting(),
+            torchio.RandomSpike(),
+            torchio.RandomNoise(),
+            torchio.RandomGhosting(),
+        )
+        subject = self.get_subject()
+        torch.manual_seed(0)
+        expected = Compose(transforms)(subject)
+        torch.manual_seed(0)
+        fused = Compose(transforms, fuse_kspace=True)(subject)
+        self.assertEqual(fused.history, expected.history)
+        self.assertTensorAlmostEqual(
+            fused.t1.data, expected.t1.data, decimal=4)
+        self.assertTensorEqual(fused.label.data, subject.label.data)
+
+    def test_fuse_kspace_probability(self):
+        transforms = torchio.RandomGhosting(p=0), torchio.RandomSpike()
+        torch.manual_seed(0)
+        expected = Compose(transforms)(self.get_subject())
+        torch.manual_seed(0)
+        fused = Compose(transforms, fuse_kspace=True)(self.get_subject())
+        self.assertEqual(fused.history, expected.history)
+        self.assertTensorAlmostEqual(
+            fused.t1.data, expected.t1.data, decimal=4)
+
+    def test_fuse_default_values(self):
+        # Padded regions must get the fill of the padding, not the default
+        # value of the previous transform
+        subject = self.get_subject(torch.rand(2, 20, 22, 18) + 1)
+        transforms = (
+            RandomAffine(degrees=10, default_pad_value='minimum'),
+            Pad((3, 0, 1, 2, 0, 4), padding_mode=-5),
+            CropOrPad((30, 16, 25), padding_mode=-3),
+        )
+        expected, fused = self.assert_fused_equal(
+            transforms, subject, decimal=4)
+        self.assertTrue(torch.any(fused.t1.data == -5))
+        self.assertTrue(torch.any(fused.t1.data == -3))
+
+    def test_fuse_crop_or_pad_history(self):
+        transforms = Pad(2), CropOrPad((30, 16, 25))
+        expected, fused = self.assert_fused_equal(
+            transforms, self.get_subject(), decimal=5)
+        names = [name for name, _ in fused.history]
+        self.assertEqual(names, ['Pad', 'Pad', 'Crop', 'CropOrPad'])
+        self.assertEqual(fused.history, expected.history)
@@ -1,3 +1,4 @@
+import torch
 from torchio.transforms import RandomAffine
 from ...utils import TorchioTestCase
 
@@ -143,3 +144,22 @@ class TestRandomAffine(TorchioTestCase):
         do_assert(RandomAffine(translation=(-10, 10)))
         do_assert(RandomAffine(translation=3 * (10,)))
         do_assert(RandomAffine(translation=3 * [-10, 10]))
+
+    def test_torch_backend(self):
+        kwargs = dict(degrees=20, scales=0.2, translation=3)
+        torch.manual_seed(0)
+        expected = RandomAffine(**kwargs)(self.sample_subject)
+        torch.manual_seed(0)
+        transform = RandomAffine(backend='torch', **kwargs)
+        transformed = transform(self.sample_subject)
+        self.assertTensorAlmostEqual(
+            transformed.t1.data, expected.t1.data, decimal=4)
+        self.assertTensorEqual(transformed.label.data, expected.label.data)
+
+    def test_torch_backend_bspline(self):
+        with self.assertRaises(ValueError):
+            RandomAffine(image_interpolation='bspline', backend='torch')
+
+    def test_wrong_backend(self):
+        with self.assertRaises(ValueError):
+            RandomAffine(backend='wrong')
@@ -1,3 +1,5 @@
+import torch
+import numpy as np
 from torchio import RandomBiasField
 from ...utils import TorchioTestCase
 
@@ -25,3 +27,20 @@ class TestRandomBiasField(TorchioTestCase):
     def test_wrong_order_type(self):
         with self.assertRaises(TypeError):
             RandomBiasField(order='wrong')
+
+    def test_bias_field_polynomials(self):
+        # Compare with a direct evaluation of each polynomial
+        order = 3
+        shape = 5, 6, 7
+        coefficients = np.random.rand(20) - 0.5
+        bias_field = RandomBiasField.generate_bias_field(
+            torch.rand(1, *shape), order, coefficients)
+        ranges = [np.arange(-n / 2, n / 2) for n in shape]
+        i, j, k = np.meshgrid(
+            *(r / r.max() for r in ranges), indexing='ij')
+        expected = np.zeros(shape)
+        exponents = RandomBiasField.get_exponents(order)
+        for coefficient, (a, b, c) in zip(coefficients, exponents):
+            expected += coefficient * i ** a * j ** b * k ** c
+        self.assertEqual(bias_field.dtype, np.float32)
+        self.assertTensorAlmostEqual(bias_field, np.exp(expected), decimal=5)
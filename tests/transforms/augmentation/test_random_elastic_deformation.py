@@ -1,3 +1,4 @@
+import torch
 from torchio import Interpolation
 from torchio.transforms import RandomElasticDeformation
 from ...utils import TorchioTestCase
@@ -83,3 +84,14 @@ class TestRandomElasticDeformation(TorchioTestCase):
     def test_max_displacement(self):
         RandomElasticDeformation(max_displacement=5)
         RandomElasticDeformation(max_displacement=(5, 6, 7))
+
+    def test_torch_backend(self):
+        kwargs = dict(num_control_points=5, max_displacement=(2, 3, 5))
+        torch.manual_seed(0)
+        expected = RandomElasticDeformation(**kwargs)(self.sample_subject)
+        torch.manual_seed(0)
+        transform = RandomElasticDeformation(backend='torch', **kwargs)
+        transformed = transform(self.sample_subject)
+        self.assertTensorAlmostEqual(
+            transformed.t1.data, expected.t1.data, decimal=4)
+        self.assertTensorEqual(transformed.label.data, expected.label.data)
@@ -12,6 +12,13 @@ class TestRandomLabelsToImage(TorchioTestCase):
         transformed = transform(self.sample_subject)
         self.assertIn('image_from_labels', transformed)
 
+    def test_label_map_not_modified(self):
+        original = self.sample_subject['label'][DATA].clone()
+        transform = RandomLabelsToImage(label_key='label', used_labels=[1])
+        transformed = transform(self.sample_subject)
+        self.assertTensorEqual(transformed['label'][DATA], original)
+        self.assertTensorEqual(self.sample_subject['label'][DATA], original)
+
     def test_deterministic_simulation(self):
         """The transform creates an image where values are equal to given
         mean if standard deviation is zero.
@@ -1,3 +1,4 @@
+import torch
 from torchio import RandomMotion
 from ...utils import TorchioTestCase
 
@@ -47,3 +48,11 @@ class TestRandomMotion(TorchioTestCase):
     def test_wrong_image_interpolation_value(self):
         with self.assertRaises(AttributeError):
             RandomMotion(image_interpolation='wrong')
+
+    def test_torch_backend(self):
+        torch.manual_seed(0)
+        expected = RandomMotion()(self.sample_subject)
+        torch.manual_seed(0)
+        transformed = RandomMotion(backend='torch')(self.sample_subject)
+        self.assertTensorAlmostEqual(
+            transformed.t1.data, expected.t1.data, decimal=4)
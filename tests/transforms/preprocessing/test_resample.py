@@ -73,3 +73,26 @@ class TestResample(TorchioTestCase):
         transform = Resample(0.5)
         shape = transform(image).shape
         self.assertEqual(shape, (1, 4, 6, 1))
+
+    def test_torch_backend(self):
+        for target in 2, (0.7, 1.3, 1), 't1':
+            expected = Resample(target)(self.sample_subject)
+            transform = Resample(target, backend='torch')
+            transformed = transform(self.sample_subject)
+            self.assertEqual(transformed.t2.shape, expected.t2.shape)
+            self.assertTensorAlmostEqual(
+                transformed.t2.data, expected.t2.data, decimal=4)
+            self.assertTensorAlmostEqual(
+                transformed.t2.affine, expected.t2.affine)
+            self.assertTensorEqual(transformed.label.data, expected.label.data)
+
+    def test_antialias(self):
+        tensor = torch.ones(1, 20, 20, 20)
+        tensor[:, ::2] = -1  # highest frequency along the first axis
+        image = ScalarImage(tensor=tensor)
+        aliased = Resample((3, 1, 1))(image)
+        antialiased = Resample((3, 1, 1), antialias=True)(image)
+        self.assertEqual(antialiased.shape, aliased.shape)
+        self.assertGreater(aliased.data.abs().mean(), 0.5)
+        self.assertLess(antialiased.data.abs().mean(), 0.1)
+        self.assertFalse(Resample(2, antialias=True).is_fusable())
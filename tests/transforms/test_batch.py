@@ -0,0 +1,114 @@
+import torch
+import numpy as np
+import torchio
+from torchio import DATA, AFFINE
+from torchio.data.queue import collate_patches
+from ..utils import TorchioTestCase
+
+
+class TestBatch(TorchioTestCase):
+    """Tests for `Transform.transform_batch`."""
+    def get_subjects(self, num_subjects=3):
+        subjects = []
+        for i in range(num_subjects):
+            affine = np.diag((1.5, 1, 2, 1))
+            affine[:3, 3] = i, -i, 2 * i
+            subject = torchio.Subject(
+                t1=torchio.ScalarImage(
+                    tensor=torch.rand(2, 10, 12, 8) + i,
+                    affine=affine,
+                ),
+                label=torchio.LabelMap(
+                    tensor=(torch.rand(1, 10, 12, 8) > 0.5).float(),
+                    affine=affine.copy(),
+                ),
+            )
+            subjects.append(subject)
+        return subjects
+
+    def assert_batch_equal(self, transform, **kwargs):
+        subjects = self.get_subjects()
+        batch = collate_patches(subjects)
+        transformed = transform.transform_batch(batch)
+        for i, subject in enumerate(subjects):
+            expected = transform(subject)
+            for name in 't1', 'label':
+                self.assertTensorAlmostEqual(
+                    transformed[name][DATA][i], expected[name][DATA], **kwargs)
+                self.assertTensorAlmostEqual(
+                    transformed[name][AFFINE][i], expected[name][AFFINE])
+        return batch, transformed
+
+    def test_input_not_modified(self):
+        batch = collate_patches(self.get_subjects())
+        original = batch['t1'][DATA].clone()
+        transformed = torchio.ZNormalization().transform_batch(batch)
+        self.assertIsNot(batch['t1'], transformed['t1'])
+        self.assertTensorEqual(batch['t1'][DATA], original)
+
+    def test_z_normalization(self):
+        self.assert_batch_equal(torchio.ZNormalization(), decimal=5)
+
+    def test_z_normalization_mask(self):
+        transform = torchio.ZNormalization(masking_method='label')
+        self.assert_batch_equal(transform, decimal=5)
+
+    def test_rescale(self):
+        self.assert_batch_equal(torchio.RescaleIntensity((0, 1)), decimal=5)
+
+    def test_rescale_percentiles(self):
+        transform = torchio.RescaleIntensity(
+            (-1, 1),
+            percentiles=(1, 99),
+            masking_method=lambda x: x > x.mean(),
+        )
+        self.assert_batch_equal(transform, decimal=5)
+
+    def test_gamma(self):
+        transform = torchio.RandomGamma(log_gamma=(0.2, 0.2))
+        self.assert_batch_equal(transform, decimal=5)
+
+    def test_bias_field(self):
+        transform = torchio.RandomBiasField(coefficients=(0.3, 0.3))
+        self.assert_batch_equal(transform, decimal=5)
+
+    def test_noise(self):
+        transform = torchio.RandomNoise(mean=(1, 1), std=(0, 0))
+        self.assert_batch_equal(transform)
+        transform = torchio.RandomNoise(std=(0.5, 2))
+        batch = collate_patches(self.get_subjects(num_subjects=16))
+        transformed = transform.transform_batch(batch)
+        noise = transformed['t1'][DATA] - batch['t1'][DATA]
+        stds = noise.reshape(16, -1).std(1)
+        self.assertGreater(stds.max() - stds.min(), 0.1)
+
+    def test_affine(self):
+        transform = torchio.RandomAffine(
+            scales=(1.1, 1.1),
+            degrees=(10, 10),
+            translation=(1, 1),
+            backend='torch',
+            default_pad_value='minimum',
+        )
+        self.assert_batch_equal(transform, decimal=4)
+
+    def test_compose(self):
+        transforms = torchio.Crop((1, 2, 0, 1, 2, 0)), torchio.Pad(1)
+        self.assert_batch_equal(torchio.Compose(transforms))
+
+    def test_probability(self):
+        batch = collate_patches(self.get_subjects(num_subjects=20))
+        transform = torchio.RandomNoise(mean=(1, 1), std=(0, 0), p=0.5)
+        torch.manual_seed(0)
+        transformed = transform.transform_batch(batch)
+        difference = transformed['t1'][DATA] - batch['t1'][DATA]
+        applied = difference.reshape(20, -1).mean(1).round()
+        self.assertTensorAlmostEqual(
+            difference, applied.reshape(20, 1, 1, 1, 1).expand_as(difference))
+        self.assertTrue(torch.any(applied == 0))
+        self.assertTrue(torch.any(applied == 1))
+
+    def test_not_supported(self):
+        batch = collate_patches(self.get_subjects())
+        with self.assertRaises(NotImplementedError):
+            torchio.RandomMotion().transform_batch(batch)
@@ -0,0 +1,76 @@
+import torch
+import numpy as np
+import SimpleITK as sitk
+from torchio import Interpolation
+from torchio.transforms.resampling import (
+    resample,
+    get_voxel_coordinates,
+    get_grid_coordinates,
+    get_affine_coordinates,
+    get_sitk_transform_matrix,
+)
+from ..utils import TorchioTestCase
+
+
+class TestResampling(TorchioTestCase):
+    """Tests for `resampling` module."""
+    def test_identity(self):
+        tensor = torch.rand(2, 4, 5, 6)
+        coordinates = get_voxel_coordinates(tensor.shape[1:])
+        for interpolation in Interpolation.LINEAR, Interpolation.NEAREST:
+            resampled = resample(tensor, coordinates, interpolation)
+            self.assertTensorAlmostEqual(resampled, tensor)
+
+    def test_default_value(self):
+        tensor = torch.rand(2, 4, 5, 6)
+        coordinates = get_voxel_coordinates(tensor.shape[1:]) + 10
+        resampled = resample(
+            tensor,
+            coordinates,
+            Interpolation.LINEAR,
+            default_value=(1, 2),
+        )
+        self.assertTensorEqual(resampled[0], torch.ones(4, 5, 6))
+        self.assertTensorEqual(resampled[1], 2 * torch.ones(4, 5, 6))
+
+    def test_batch(self):
+        batch = torch.rand(3, 2, 4, 5, 6)
+        coordinates = get_voxel_coordinates(batch.shape[2:]) + 0.3
+        coordinates = torch.stack((coordinates, coordinates - 0.6, coordinates))
+        resampled = resample(batch, coordinates, Interpolation.LINEAR)
+        for tensor, grid, result in zip(batch, coordinates, resampled):
+            expected = resample(tensor, grid, Interpolation.LINEAR)
+            self.assertTensorAlmostEqual(result, expected)
+
+    def test_transform_matrix(self):
+        transform = sitk.Euler3DTransform()
+        transform.SetCenter((1, 2, 3))
+        transform.SetRotation(0.1, 0.2, 0.3)
+        transform.SetTranslation((4, 5, 6))
+        matrix = get_sitk_transform_matrix(transform)
+        point = np.array((7, 8, 9))
+        expected = transform.TransformPoint(point.tolist())
+        result = (matrix @ np.append(point, 1))[:3]
+        self.assertTensorAlmostEqual(result, expected)
+
+    def test_grid_coordinates(self):
+        shape = 4, 5, 6
+        matrix = np.array((
+            (0.9, 0.1, 0, 1.5),
+            (-0.2, 1.1, 0.3, -2),
+            (0, 0.1, 1.2, 0.5),
+            (0, 0, 0, 1),
+        ))
+        coordinates = get_grid_coordinates(shape, matrix)
+        self.assertEqual(coordinates.dtype, torch.float32)
+        self.assertEqual(coordinates.shape, (*shape, 3))
+        indices = get_voxel_coordinates(shape, dtype=torch.float64)
+        expected = indices @ matrix[:3, :3].T + matrix[:3, 3]
+        self.assertTensorAlmostEqual(coordinates, expected)
+
+    def test_wrong_interpolation(self):
+        tensor = torch.rand(1, 4, 5, 6)
+        coordinates = get_affine_coordinates(
+            tensor.shape[1:], np.eye(4), np.eye(4))
+        with self.assertRaises(ValueError):
+            resample(tensor, coordinates, Interpolation.BSPLINE)
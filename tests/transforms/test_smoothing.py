@@ -0,0 +1,28 @@
+import torch
+import numpy as np
+import scipy.ndimage as ndi
+from torchio.transforms.smoothing import gaussian_filter
+from ..utils import TorchioTestCase
+
+
+class TestSmoothing(TorchioTestCase):
+    """Tests for `smoothing` module."""
+    def test_same_as_scipy(self):
+        tensor = torch.rand(2, 10, 13, 7)
+        sigmas = 0.8, 2, 5
+        smoothed = gaussian_filter(tensor, sigmas)
+        for channel, result in zip(tensor, smoothed):
+            expected = ndi.gaussian_filter(channel.numpy(), sigmas)
+            self.assertTensorAlmostEqual(result, expected, decimal=5)
+
+    def test_channel_sigmas(self):
+        tensor = torch.rand(2, 10, 13, 7)
+        sigmas = np.array(((1, 0, 0.5), (0, 3, 0)))
+        smoothed = gaussian_filter(tensor, sigmas)
+        for channel, result, channel_sigmas in zip(tensor, smoothed, sigmas):
+            expected = ndi.gaussian_filter(channel.numpy(), channel_sigmas)
+            self.assertTensorAlmostEqual(result, expected, decimal=5)
+
+    def test_zero_sigma(self):
+        tensor = torch.rand(2, 10, 13, 7)
+        self.assertTensorEqual(gaussian_filter(tensor, (0, 0, 0)), tensor)
@@ -161,3 +161,38 @@ class TestTransform(TorchioTestCase):
     def test_abstract_transform(self):
         with self.assertRaises(TypeError):
             torchio.Transform()
+
+    def test_history_lazy(self):
+        transform = torchio.RandomNoise()
+        transformed = transform(self.sample_subject)
+        record = transformed._history[0][1]
+        self.assertIsInstance(record, torchio.transforms.transform.TransformRecord)
+        name, parameters = transformed.history[0]
+        self.assertEqual(name, 'RandomNoise')
+        self.assertIsInstance(parameters, dict)
+        self.assertNotIn('transform_params', parameters)
+        self.assertEqual(parameters['seed'], transform.seed)
+        self.assertIsInstance(parameters['std_range'], tuple)
+
+    def test_history_not_jsonable(self):
+        transform = torchio.Lambda(lambda x: x)
+        transformed = transform(self.sample_subject)
+        copied = copy.copy(transformed)
+        parameters = transformed.history[0][1]
+        self.assertIsInstance(parameters['function'], str)
+        self.assertEqual(copied.history, transformed.history)
+
+    def test_history_pickle(self):
+        import pickle
+        transformed = torchio.Lambda(lambda x: x)(self.sample_subject)
+        loaded = pickle.loads(pickle.dumps(transformed._history))
+        self.assertEqual(loaded, transformed.history)
+
+    def test_history_disabled(self):
+        transform = torchio.RandomNoise()
+        transform.record_history = False
+        transformed = transform(self.sample_subject)
+        self.assertEqual(transformed.history, [])
+        composed = torchio.Compose((transform, torchio.Crop(1)))
+        transformed = composed(self.sample_subject)
+        self.assertEqual(len(transformed.history), 1)
@@ -1,12 +1,22 @@
+import os
 import copy
+import enum
+import json
+import shutil
+import hashlib
+import inspect
 import collections
-from typing import Dict, Sequence, Optional, Callable
+from pathlib import Path
+from typing import Dict, List, Sequence, Optional, Callable, Tuple
 
+import torch
+import numpy as np
 from deprecated import deprecated
 from torch.utils.data import Dataset
 
 from ..torchio import DATA, AFFINE, TypePath
 from .io import write_image
+from .image import Image
 from .subject import Subject
 
 
@@ -26,6 +36,33 @@ class SubjectsDataset(Dataset):
             :class:`~torchio.data.subject.Subject`.
         transform: An instance of :py:class:`torchio.transforms.Transform`
             that will be applied to each subject.
+        load_getitem: Load all subject images before returning it in
+            :meth:`__getitem__`. Set it to ``False`` if some of the images
+            will not be needed during training, or if patches will be
+            extracted by a sampler that reads only the patch regions from
+            disk, e.g. using a :py:class:`~torchio.data.Queue` without
+            transforms.
+        cache_dir: If not ``None``, the transform is split at the first
+            random transform, e.g. an instance of
+            :py:class:`~torchio.transforms.RandomAffine`, the first
+            transform with probability lower than 1 or the first
+            :py:class:`~torchio.transforms.Compose` that contains random
+            transforms. The results of the
+            deterministic transforms before that point are stored in this
+            directory as uncompressed NumPy files, keyed by the paths and
+            modification times of the image files and the transforms
+            parameters. Later calls to :meth:`__getitem__` read the
+            preprocessed images from the cache and only apply the random
+            transforms. Subjects with images that are not stored in files, or
+            transforms with parameters that cannot be identified across runs,
+            such as lambda functions, are never cached.
+        shared_memory: If ``True``, all images are loaded when the dataset is
+            instantiated and their tensors are copied into one shared memory
+            arena per data type. Worker processes of a
+            :class:`~torch.utils.data.DataLoader` then read the same physical
+            memory instead of holding their own copies, so memory usage does
+            not grow with the number of workers. Memory-mapped images are
+            left as they are.
 
     Example:
         >>> from torchio import SubjectsDataset, ScalarImage, LabelMap, Subject
@@ -63,11 +100,24 @@ class SubjectsDataset(Dataset):
             self,
             subjects: Sequence[Subject],
             transform: Optional[Callable] = None,
+            load_getitem: bool = True,
+            cache_dir: Optional[TypePath] = None,
+            shared_memory: bool = False,
             ):
         self._parse_subjects_list(subjects)
         self.subjects = subjects
+        self.load_getitem = load_getitem
+        if cache_dir is not None:
+            cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir = cache_dir
         self._transform: Optional[Callable]
+        self._deterministic_transforms: List[Callable]
+        self._random_transform: Optional[Callable]
         self.set_transform(transform)
+        self.shared_memory = shared_memory
+        self._arenas: Dict[torch.dtype, torch.Tensor] = {}
+        if shared_memory:
+            self._share_memory()
 
     def __len__(self):
         return len(self.subjects)
@@ -76,12 +126,20 @@ class SubjectsDataset(Dataset):
         if not isinstance(index, int):
             raise ValueError(f'Index "{index}" must be int, not {type(index)}')
         subject = self.subjects[index]
-        subject = copy.deepcopy(subject)  # cheap since images not loaded yet
-        subject.load()
+        # Images are copied without their data, which is shared until a
+        # transform replaces it
+        subject = copy.copy(subject)
+        if self.cache_dir is not None and self._deterministic_transforms:
+            subject = self._get_preprocessed_subject(subject)
+            transform = self._random_transform
+        else:
+            if self.load_getitem:
+                subject.load()
+            transform = self._transform
 
         # Apply transform (this is usually the bottleneck)
-        if self._transform is not None:
-            subject = self._transform(subject)
+        if transform is not None:
+            subject = transform(subject)
         return subject
 
     def set_transform(self, transform: Optional[Callable]) -> None:
@@ -94,6 +152,144 @@ class SubjectsDataset(Dataset):
             raise ValueError(
                 f'The transform must be a callable object, not {transform}')
         self._transform = transform
+        split = self._split_transform(transform)
+        self._deterministic_transforms, self._random_transform = split
+
+    @staticmethod
+    def _split_transform(
+            transform: Optional[Callable],
+            ) -> Tuple[List[Callable], Optional[Callable]]:
+        """Split a transform at the first random transform."""
+        if transform is None:
+            return [], None
+        from ..transforms import Compose
+        fuse_spatial = fuse_kspace = False
+        if isinstance(transform, Compose) and transform.probability == 1:
+            transforms = list(transform.transform.transforms)
+            fuse_spatial = transform.fuse_spatial
+            fuse_kspace = transform.fuse_kspace
+        else:
+            transforms = [transform]
+        deterministic_transforms = []
+        for transform_ in transforms:
+            if _is_random(transform_):
+                break
+            deterministic_transforms.append(transform_)
+        random_transforms = transforms[len(deterministic_transforms):]
+        if random_transforms:
+            random_transform = Compose(
+                random_transforms,
+                fuse_spatial=fuse_spatial,
+                fuse_kspace=fuse_kspace,
+            )
+        else:
+            random_transform = None
+        return deterministic_transforms, random_transform
+
+    def _get_cache_key(self, subject: Subject) -> Optional[str]:
+        items = []
+        images_dict = subject.get_images_dict(intensity_only=False)
+        for image_name, image in sorted(images_dict.items()):
+            if image.path is None:
+                return None
+            paths = image.path if isinstance(image.path, list) else [image.path]
+            for path in paths:
+                if not path.is_file():  # e.g. DICOM directory
+                    return None
+                stat = path.stat()
+                items.append((str(path), stat.st_mtime_ns, stat.st_size))
+            attributes = {
+                key: value
+                for key, value in image.items()
+                if key not in (DATA, AFFINE)
+            }
+            items.append((image_name, image.__class__.__name__, attributes))
+        items.extend(self._deterministic_transforms)
+        try:
+            string = json.dumps(_get_stable_value(items), sort_keys=True)
+        except TypeError:  # the parameters cannot be identified across runs
+            return None
+        return hashlib.sha256(string.encode()).hexdigest()
+
+    def _get_preprocessed_subject(self, subject: Subject) -> Subject:
+        key = self._get_cache_key(subject)
+        if key is None:
+            subject.load()
+            for transform in self._deterministic_transforms:
+                subject = transform(subject)
+            return subject
+        cache_path = self.cache_dir / key
+        if cache_path.is_dir():
+            return self._read_cached_subject(subject, cache_path)
+        num_history = len(subject.history)
+        subject.load()
+        for transform in self._deterministic_transforms:
+            subject = transform(subject)
+        self._write_cached_subject(subject, cache_path, num_history)
+        return subject
+
+    @staticmethod
+    def _read_cached_subject(subject: Subject, cache_path: Path) -> Subject:
+        with open(cache_path / 'metadata.json') as f:
+            metadata = json.load(f)
+        images_dict = subject.get_images_dict(intensity_only=False)
+        for image_name, image in images_dict.items():
+            array = np.load(cache_path / f'{image_name}.npy', mmap_mode='c')
+            tensor = torch.from_numpy(array)
+            affine = np.array(metadata['affines'][image_name])
+            image.set_data(tensor, affine)
+        subject.history.extend(metadata['history'])
+        return subject
+
+    @staticmethod
+    def _write_cached_subject(
+            subject: Subject,
+            cache_path: Path,
+            num_history: int,
+            ) -> None:
+        # Write to a temporary directory first so that other workers never
+        # read incomplete results
+        temp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}')
+        temp_path.mkdir(parents=True, exist_ok=True)
+        affines = {}
+        images_dict = subject.get_images_dict(intensity_only=False)
+        for image_name, image in images_dict.items():
+            np.save(temp_path / f'{image_name}.npy', image.numpy())
+            affines[image_name] = image.affine.tolist()
+        metadata = dict(affines=affines, history=subject.history[num_history:])
+        with open(temp_path / 'metadata.json', 'w') as f:
+            json.dump(metadata, f, default=str)
+        try:
+            temp_path.rename(cache_path)
+        except OSError:  # another worker has written the same results
+            shutil.rmtree(temp_path)
+
+    def _share_memory(self) -> None:
+        """Move the tensors of all images into shared memory arenas."""
+        images = []
+        for subject in self.subjects:
+            subject.load()
+            for image in subject.get_images(intensity_only=False):
+                if image.mmap or not isinstance(image[DATA], torch.Tensor):
+                    continue
+                images.append(image)
+        sizes = collections.defaultdict(int)
+        for image in images:
+            sizes[image.data.dtype] += image.data.numel()
+        self._arenas = {
+            dtype: torch.empty(size, dtype=dtype).share_memory_()
+            for dtype, size in sizes.items()
+        }
+        offsets = collections.defaultdict(int)
+        for image in images:
+            tensor = image.data
+            dtype = tensor.dtype
+            offset = offsets[dtype]
+            numel = tensor.numel()
+            view = self._arenas[dtype][offset:offset + numel].view(tensor.shape)
+            view.copy_(tensor)
+            image[DATA] = view
+            offsets[dtype] += numel
 
     @staticmethod
     def _parse_subjects_list(subjects_list: Sequence[Subject]) -> None:
@@ -130,6 +326,58 @@ class SubjectsDataset(Dataset):
             write_image(tensor, affine, output_path)
 
 
+def _is_random(transform: Callable) -> bool:
+    """Return ``True`` if the output of a transform may change between
+    calls."""
+    from ..transforms import Transform, Compose
+    from ..transforms.augmentation import RandomTransform
+    if not isinstance(transform, Transform):
+        return True
+    if isinstance(transform, RandomTransform) or transform.probability < 1:
+        return True
+    if isinstance(transform, Compose):
+        return any(_is_random(t) for t in transform.transform.transforms)
+    return False
+
+
+def _get_stable_value(value):
+    """Convert a value into JSON-serializable data that is the same across
+    processes and runs.
+
+    Raises:
+        TypeError: If the value cannot be identified reliably, e.g. a lambda
+            function or an object that is not a transform.
+    """
+    from ..transforms import Transform, Compose
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (Path, enum.Enum)):
+        return str(value)
+    if isinstance(value, (np.ndarray, np.generic, torch.Tensor)):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_get_stable_value(item) for item in value]
+    if isinstance(value, Image):
+        if value.path is None:
+            raise TypeError(f'Image {value} is not stored in a file')
+        return _get_stable_value(value.path)
+    if isinstance(value, dict):
+        return {str(key): _get_stable_value(item) for key, item in value.items()}
+    if isinstance(value, Transform):
+        parameters = dict(value.__dict__)
+        parameters.pop('transform_params', None)
+        if isinstance(value, Compose):
+            parameters['transform'] = value.transform.transforms
+        return [value.name, _get_stable_value(parameters)]
+    function = getattr(value, '__func__', value)  # bound methods
+    if inspect.isfunction(function) or inspect.isbuiltin(function):
+        name = f'{function.__module__}.{function.__qualname__}'
+        if '<' not in name:  # lambda or local function
+            return name
+    message = f'Value {value} cannot be identified across processes'
+    raise TypeError(message)
+
+
 @deprecated(
     'ImagesDataset is deprecated in v0.18.0. Use SubjectsDataset instead.')
 class ImagesDataset(SubjectsDataset):
@@ -28,7 +28,13 @@ from ..torchio import (
     INTENSITY,
     LABEL,
 )
-from .io import read_image, write_image
+from .io import (
+    read_image,
+    read_shape,
+    read_affine,
+    read_region,
+    write_image,
+)
 
 
 PROTECTED_KEYS = DATA, AFFINE, TYPE, PATH, STEM
@@ -70,6 +76,12 @@ class Image(dict):
         affine: If :attr:`path` is not given, :attr:`affine` must be a
             :math:`4 \times 4` NumPy array. If ``None``, :attr:`affine` is an
             identity matrix.
+        mmap: If ``True``, uncompressed NIfTI and Analyze files are
+            memory-mapped instead of read into memory, and the tensor keeps
+            the data type stored on disk. Voxels are only read when accessed,
+            so cropping a patch does not load the whole volume. Regions
+            returned by :meth:`read_region` are converted to
+            :class:`torch.float32`. Other files are read as usual.
         check_nans: If ``True``, issues a warning if NaNs are found
             in the image. If ``False``, images will not be checked for the
             presence of NaNs.
@@ -108,10 +120,14 @@ class Image(dict):
             affine: Optional[TypeData] = None,
             check_nans: bool = False,  # removed by ITK by default
             channels_last: bool = False,
+            mmap: bool = False,
             **kwargs: Dict[str, Any],
             ):
         self.check_nans = check_nans
         self.channels_last = channels_last
+        self.mmap = mmap
+        self._header_shape = None
+        self._header_affine = None
 
         if type is None:
             warnings.warn(
@@ -178,14 +194,35 @@ class Image(dict):
 
     def __copy__(self):
         kwargs = dict(
-            tensor=self.data,
-            affine=self.affine,
             type=self.type,
             path=self.path,
+            channels_last=self.channels_last,
+            mmap=self.mmap,
         )
         for key, value in self.items():
             if key in PROTECTED_KEYS: continue
             kwargs[key] = value  # should I copy? deepcopy?
+        # Images that have not been loaded are copied structurally and
+        # loaded tensors are shared, as transforms never modify them in place
+        if not self._loaded or self._is_lazy():  # keep the copy lazy as well
+            if self.h5DS is not None:
+                kwargs['h5DS'] = self.h5DS
+                kwargs['lazypatch'] = self.lazypatch
+                kwargs['affine'] = self[AFFINE]
+            new_image = self.__class__(**kwargs)
+            new_image._header_shape = self._header_shape
+            new_image._header_affine = self._header_affine
+            return new_image
+        if self.mmap:
+            # Share the memory-mapped tensor instead of casting it to float32
+            new_image = self.__class__(**kwargs)
+            if self._loaded:
+                new_image[DATA] = self.data
+                new_image[AFFINE] = self.affine
+                new_image._loaded = True
+            return new_image
+        kwargs['tensor'] = self.data
+        kwargs['affine'] = self.affine
         return self.__class__(**kwargs)
 
     @property
@@ -200,7 +237,18 @@ class Image(dict):
 
     @property
     def affine(self) -> np.ndarray:
-        """Affine matrix to transform voxel indices into world coordinates."""
+        """Affine matrix to transform voxel indices into world coordinates.
+
+        If the image has not been loaded, the matrix is read from the header
+        when possible.
+        """
+        if AFFINE not in self and self._is_lazy():
+            if self._header_affine is None:
+                try:
+                    self._header_affine = read_affine(self.path)
+                except RuntimeError:  # e.g. 2D or 4D images
+                    return self[AFFINE]
+            return self._header_affine
         return self[AFFINE]
 
     @property
@@ -209,7 +257,23 @@ class Image(dict):
 
     @property
     def shape(self) -> Tuple[int, int, int, int]:
-        """Tensor shape as :math:`(C, W, H, D)`."""
+        """Tensor shape as :math:`(C, W, H, D)`.
+
+        If the image has not been loaded, the shape is read from the header
+        when possible.
+        """
+        if self._is_lazy():
+            if self.h5DS is not None:
+                shape = self.h5DS.shape
+                if len(shape) == 3:  # channel missing
+                    shape = 1, *shape
+                return tuple(shape)
+            if self._header_shape is None:
+                try:
+                    self._header_shape = read_shape(self.path)
+                except RuntimeError:  # e.g. 2D or 4D images
+                    return tuple(self.data.shape)
+            return self._header_shape
         return tuple(self.data.shape)
 
     @property
@@ -247,7 +311,13 @@ class Image(dict):
 
     @property
     def memory(self) -> float:
-        """Number of Bytes that the tensor takes in the RAM."""
+        """Number of Bytes that the tensor takes in the RAM.
+
+        If the image has not been loaded, 4 bytes per voxel are assumed.
+        """
+        if self._loaded:
+            tensor = self[DATA]
+            return tensor.element_size() * tensor.numel()
         return np.prod(self.shape) * 4  # float32, i.e. 4 bytes per voxel
 
     @property
@@ -426,13 +496,109 @@ class Image(dict):
         self[AFFINE] = affine
         self._loaded = True
 
+    def _is_lazy(self) -> bool:
+        """Return ``True`` if regions can be read without loading the image."""
+        if self.h5DS is not None:
+            tensor = dict.get(self, DATA)
+            return self.lazypatch and not isinstance(tensor, torch.Tensor)
+        if self._loaded or self.mmap or self.channels_last:
+            return False
+        return isinstance(self.path, Path) and self.path.is_file()
+
+    def read_region(
+            self,
+            index_ini: TypeTripletInt,
+            index_fin: TypeTripletInt,
+            ) -> Tuple[torch.Tensor, np.ndarray]:
+        r"""Read a region of the image.
+
+        If the image has not been loaded, only the region is read from disk,
+        when the file format allows it. Otherwise, the region is cropped from
+        the loaded tensor.
+
+        Args:
+            index_ini: Index of the first voxel of the region.
+            index_fin: Index of the voxel after the last voxel of the region.
+
+        Returns:
+            Tuple containing a 4D tensor with the region and the
+            :math:`4 \times 4` affine matrix of the region.
+        """
+        if not self._is_lazy():
+            i0, j0, k0 = index_ini
+            i1, j1, k1 = index_fin
+            tensor = self.data[:, i0:i1, j0:j1, k0:k1]
+            if self.mmap:  # copy the region from the file as float32
+                tensor = tensor.to(torch.float32, copy=True)
+            else:
+                tensor = tensor.clone()
+            affine = self._get_region_affine(self.affine, index_ini)
+        elif self.h5DS is not None:
+            i0, j0, k0 = index_ini
+            i1, j1, k1 = index_fin
+            region = self.h5DS[..., i0:i1, j0:j1, k0:k1]
+            tensor = torch.from_numpy(np.asarray(region))
+            if tensor.ndim == 3:  # channel missing
+                tensor = tensor.unsqueeze(0)
+            affine = self._get_region_affine(self[AFFINE], index_ini)
+        else:
+            try:
+                tensor, affine = read_region(self.path, index_ini, index_fin)
+            except RuntimeError:  # e.g. 2D images, read the whole file
+                self.load()
+                return self.read_region(index_ini, index_fin)
+            if self.check_nans and torch.isnan(tensor).any():
+                warnings.warn(f'NaNs found in file "{self.path}"')
+        return tensor, affine
+
+    @staticmethod
+    def _get_region_affine(
+            affine: np.ndarray,
+            index_ini: TypeTripletInt,
+            ) -> np.ndarray:
+        new_affine = affine.copy()
+        new_affine[:3, 3] = nib.affines.apply_affine(affine, index_ini)
+        return new_affine
+
+    def crop(
+            self,
+            index_ini: TypeTripletInt,
+            index_fin: TypeTripletInt,
+            ) -> None:
+        """Crop the image in place, reading only the region if possible.
+
+        Args:
+            index_ini: Index of the first voxel of the region.
+            index_fin: Index of the voxel after the last voxel of the region.
+        """
+        tensor, affine = self.read_region(index_ini, index_fin)
+        self.set_data(tensor, affine)
+
+    def set_data(
+            self,
+            tensor: torch.Tensor,
+            affine: Optional[np.ndarray] = None,
+            ) -> None:
+        r"""Store a tensor, and optionally an affine matrix, as image data.
+
+        Args:
+            tensor: 4D tensor with dimensions :math:`(C, W, H, D)`.
+            affine: :math:`4 \times 4` affine matrix. If ``None``, the current
+                matrix is kept.
+        """
+        if affine is None:
+            affine = self.affine
+        self[DATA] = tensor
+        self[AFFINE] = affine
+        self._loaded = True
+
     def read_and_check(self, path=None, h5DS=None):
         if h5DS:
             tensor, affine = torch.from_numpy(h5DS[()]), self[AFFINE]
             if len(tensor.shape) == 3: #channel missing
                 tensor = tensor.unsqueeze(0)
         else:
-            tensor, affine = read_image(path)
+            tensor, affine = read_image(path, mmap=self.mmap)
         tensor = self.parse_tensor_shape(tensor)
         if self.channels_last:
             tensor = tensor.permute(3, 0, 1, 2)
@@ -1,11 +1,17 @@
 import warnings
-from typing import Tuple
+from pathlib import Path
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
 import torch
 import numpy as np
-from ...torchio import TypeData, CHANNELS_DIMENSION
+from ...torchio import TypeData, TypePath, CHANNELS_DIMENSION
 from .grid_sampler import GridSampler
 
 
+OVERLAP_MODES = 'crop', 'average', 'gaussian', 'weighted'
+SLAB_SIZE = 2 ** 24  # number of values processed at once in out-of-core mode
+
+
 class GridAggregator:
     r"""Aggregate patches for dense inference.
 
@@ -17,8 +23,31 @@ class GridAggregator:
             extract the patches.
         overlap_mode: If ``'crop'``, the overlapping predictions will be
             cropped. If ``'average'``, the predictions in the overlapping areas
-            will be averaged with equal weights. See the
-            `grid aggregator tests`_ for a raw visualization of both modes.
+            will be averaged with equal weights. If ``'gaussian'``, the
+            predictions will be averaged using a Gaussian importance map with
+            standard deviations of :math:`1/8` of the patch size, so that the
+            voxels near the center of a patch, which have more context, have
+            larger weights than those at the border. If ``'weighted'``, the
+            weights given in :attr:`patch_weights` are used. See the
+            `grid aggregator tests`_ for a raw visualization of the modes.
+        patch_weights: Tensor or array with the spatial shape of the patches,
+            containing the strictly positive weights of each voxel in a patch.
+            Only used if :attr:`overlap_mode` is ``'weighted'``.
+        output_path: If not ``None``, the predictions are accumulated in a
+            NumPy ``.npy`` file memory-mapped at this path instead of in RAM,
+            so that large multi-class outputs can be aggregated on machines
+            with less memory. The tensor returned by
+            :meth:`get_output_tensor` is then backed by this file.
+        accumulation_dtype: Data type of the tensor in which predictions are
+            accumulated, e.g. :attr:`torch.float16` to use half the memory of
+            :attr:`torch.float32` predictions. If ``None``, the type of the
+            predictions is used.
+        argmax: If ``True``, only the index of the channel with the largest
+            value is returned, e.g. the label of a segmentation. In ``'crop'``
+            mode, it is computed as the batches are added, so only one
+            channel is stored. In the other modes, it is computed at the end,
+            one slab of the volume at a time, so the normalized
+            predictions are never allocated.
 
     .. _grid aggregator tests: https://github.com/fepegar/torchio/blob/master/tests/data/inference/test_aggregator.py
 
@@ -26,7 +55,15 @@ class GridAggregator:
         <https://niftynet.readthedocs.io/en/dev/window_sizes.html>`_ for more
         information about patch-based sampling.
     """
-    def __init__(self, sampler: GridSampler, overlap_mode: str = 'crop'):
+    def __init__(
+            self,
+            sampler: GridSampler,
+            overlap_mode: str = 'crop',
+            patch_weights: Optional[TypeData] = None,
+            output_path: Optional[TypePath] = None,
+            accumulation_dtype: Optional[torch.dtype] = None,
+            argmax: bool = False,
+            ):
         subject = sampler.subject
         self.volume_padded = sampler.padding_mode is not None
         self.spatial_shape = subject.spatial_shape
@@ -35,26 +72,95 @@ class GridAggregator:
         self.parse_overlap_mode(overlap_mode)
         self.overlap_mode = overlap_mode
         self._avgmask_tensor = None
+        self._patch_weights = self.parse_patch_weights(
+            patch_weights,
+            overlap_mode,
+            tuple(sampler.patch_size.tolist()),
+        )
+        self._weights_sum_tensor = None
+        self.output_path = None if output_path is None else Path(output_path)
+        self.accumulation_dtype = accumulation_dtype
+        self.argmax = argmax
+        self._normalized = False
 
     @staticmethod
     def parse_overlap_mode(overlap_mode):
-        if overlap_mode not in ('crop', 'average'):
+        if overlap_mode not in OVERLAP_MODES:
             message = (
-                f'Overlap mode must be "crop" or "average" but "{overlap_mode}"'
-                ' was passed'
+                f'Overlap mode must be one of {OVERLAP_MODES}'
+                f' but "{overlap_mode}" was passed'
             )
             raise ValueError(message)
 
+    @staticmethod
+    def parse_patch_weights(
+            patch_weights: Optional[TypeData],
+            overlap_mode: str,
+            patch_size: Tuple[int, int, int],
+            ) -> Optional[torch.Tensor]:
+        if overlap_mode == 'gaussian':
+            return get_gaussian_weights(patch_size)
+        if overlap_mode != 'weighted':
+            if patch_weights is not None:
+                message = (
+                    'Patch weights can only be used if the overlap mode is'
+                    f' "weighted", but it is "{overlap_mode}"'
+                )
+                raise ValueError(message)
+            return None
+        if patch_weights is None:
+            message = 'Patch weights must be given if overlap mode is "weighted"'
+            raise ValueError(message)
+        patch_weights = torch.as_tensor(patch_weights, dtype=torch.float32)
+        if tuple(patch_weights.shape) != patch_size:
+            message = (
+                f'The shape of the patch weights, {tuple(patch_weights.shape)},'
+                f' must be equal to the patch size, {patch_size}'
+            )
+            raise ValueError(message)
+        if (patch_weights <= 0).any():
+            message = 'All the patch weights must be greater than zero'
+            raise ValueError(message)
+        return patch_weights
+
     def crop_batch(
             self,
             batch: torch.Tensor,
             locations: np.ndarray,
             overlap: np.ndarray,
             ) -> Tuple[TypeData, np.ndarray]:
+        crop_locations, patch_indices_ini = self.get_crop_bounds(
+            locations,
+            overlap,
+        )
+        indices_ini, indices_fin = crop_locations[:, :3], crop_locations[:, 3:]
+        crop_shapes = indices_fin - indices_ini
+        cropped_patches = []
+        zipped = zip(batch, patch_indices_ini, crop_shapes)
+        for patch, left, crop_shape in zipped:
+            i_ini, j_ini, k_ini = left
+            i_fin, j_fin, k_fin = left + crop_shape
+            cropped_patch = patch[:, i_ini:i_fin, j_ini:j_fin, k_ini:k_fin]
+            cropped_patches.append(cropped_patch)
+        return cropped_patches, crop_locations
+
+    def get_crop_bounds(
+            self,
+            locations: np.ndarray,
+            overlap: np.ndarray,
+            ) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute the regions of the volume and the patches that are kept.
+
+        Returns:
+            Tuple containing the cropped locations in the volume, with shape
+            :math:`(B, 6)`, and the first index of the kept region in each
+            patch, with shape :math:`(B, 3)`.
+        """
         border = np.array(overlap) // 2  # overlap is even in grid sampler
         crop_locations = locations.astype(int).copy()
         indices_ini, indices_fin = crop_locations[:, :3], crop_locations[:, 3:]
         num_locations = len(crop_locations)
+        patch_shapes = indices_fin - indices_ini
 
         border_ini = np.tile(border, (num_locations, 1))
         border_fin = border_ini.copy()
@@ -73,35 +179,50 @@ class GridAggregator:
         indices_fin -= border_fin
 
         crop_shapes = indices_fin - indices_ini
-        patch_shape = batch.shape[2:]  # ignore batch and channels dim
-        cropped_patches = []
-        for patch, crop_shape in zip(batch, crop_shapes):
-            diff = patch_shape - crop_shape
-            left = (diff / 2).astype(int)
-            i_ini, j_ini, k_ini = left
-            i_fin, j_fin, k_fin = left + crop_shape
-            cropped_patch = patch[:, i_ini:i_fin, j_ini:j_fin, k_ini:k_fin]
-            cropped_patches.append(cropped_patch)
-        return cropped_patches, crop_locations
+        diff = patch_shapes - crop_shapes
+        patch_indices_ini = (diff / 2).astype(int)
+        return crop_locations, patch_indices_ini
 
     def initialize_output_tensor(self, batch: torch.Tensor) -> None:
         if self._output_tensor is not None:
             return
         num_channels = batch.shape[CHANNELS_DIMENSION]
-        self._output_tensor = torch.zeros(
-            num_channels,
-            *self.spatial_shape,
-            dtype=batch.dtype,
-        )
+        if self.argmax and self.overlap_mode == 'crop':
+            dtype = get_labels_dtype(num_channels)
+            num_channels = 1
+        elif self.accumulation_dtype is not None:
+            dtype = self.accumulation_dtype
+        else:
+            dtype = batch.dtype
+            if self._patch_weights is not None:  # weighted sums are floats
+                dtype = torch.promote_types(dtype, self._patch_weights.dtype)
+        shape = num_channels, *self.spatial_shape
+        if self.output_path is None:
+            self._output_tensor = torch.zeros(shape, dtype=dtype)
+        else:
+            self._output_tensor = get_memmap_tensor(
+                self.output_path,
+                shape,
+                dtype,
+            )
 
-    def initialize_avgmask_tensor(self, batch: torch.Tensor) -> None:
+    def initialize_avgmask_tensor(self) -> None:
         if self._avgmask_tensor is not None:
             return
-        num_channels = batch.shape[CHANNELS_DIMENSION]
+        # The number of patches is the same for all channels
         self._avgmask_tensor = torch.zeros(
-            num_channels,
+            1,
             *self.spatial_shape,
-            dtype=batch.dtype,
+            dtype=self._output_tensor.dtype,
+        )
+
+    def initialize_weights_sum_tensor(self) -> None:
+        if self._weights_sum_tensor is not None:
+            return
+        self._weights_sum_tensor = torch.zeros(
+            1,
+            *self.spatial_shape,
+            dtype=self._patch_weights.dtype,
         )
 
     def add_batch(
@@ -119,35 +240,122 @@ class GridAggregator:
                 extracted using ``batch[torchio.LOCATION]``.
         """
         batch = batch_tensor.cpu()
-        locations = locations.cpu().numpy()
+        locations = locations.cpu().numpy().astype(int)
         self.initialize_output_tensor(batch)
+        if self.argmax and self.overlap_mode == 'crop':
+            batch = batch.argmax(dim=CHANNELS_DIMENSION, keepdim=True)
+        num_channels = batch.shape[CHANNELS_DIMENSION]
+        patch_shape = batch.shape[2:]
+        output_dtype = self._output_tensor.dtype
+        # Patches and output volume are flattened so that all the voxels in
+        # the batch are written with a single indexing operation
+        flat_batch = batch.transpose(0, 1).reshape(num_channels, -1)
+        flat_output = self._output_tensor.view(num_channels, -1)
         if self.overlap_mode == 'crop':
-            cropped_patches, crop_locations = self.crop_batch(
-                batch,
+            crop_locations, patch_indices_ini = self.get_crop_bounds(
                 locations,
                 self.patch_overlap,
             )
-            for patch, crop_location in zip(cropped_patches, crop_locations):
-                i_ini, j_ini, k_ini, i_fin, j_fin, k_fin = crop_location
-                self._output_tensor[
-                    :,
-                    i_ini:i_fin,
-                    j_ini:j_fin,
-                    k_ini:k_fin] = patch
+            output_indices, batch_indices = self.get_flat_indices(
+                crop_locations,
+                patch_indices_ini,
+                patch_shape,
+            )
+            # The cropped regions may overlap at the borders of the volume. In
+            # that case, the last patch written to each voxel is kept, as in a
+            # loop over the patches
+            last = get_last_occurrences(output_indices)
+            output_indices = output_indices[last]
+            batch_indices = batch_indices[last]
+            values = flat_batch[:, batch_indices].to(output_dtype)
+            flat_output.index_copy_(1, output_indices, values)
         elif self.overlap_mode == 'average':
-            self.initialize_avgmask_tensor(batch)
-            for patch, location in zip(batch, locations):
-                i_ini, j_ini, k_ini, i_fin, j_fin, k_fin = location
-                self._output_tensor[
-                    :,
-                    i_ini:i_fin,
-                    j_ini:j_fin,
-                    k_ini:k_fin] += patch
-                self._avgmask_tensor[
-                    :,
-                    i_ini:i_fin,
-                    j_ini:j_fin,
-                    k_ini:k_fin] += 1
+            self.initialize_avgmask_tensor()
+            patch_indices_ini = np.zeros_like(locations[:, :3])
+            output_indices, _ = self.get_flat_indices(
+                locations,
+                patch_indices_ini,
+                patch_shape,
+            )
+            # All the patch voxels are used, in the order of the flat batch
+            values = flat_batch.to(output_dtype)
+            flat_output.index_add_(1, output_indices, values)
+            flat_avgmask = self._avgmask_tensor.view(1, -1)
+            ones = torch.ones(1, 1, dtype=flat_avgmask.dtype)
+            ones = ones.expand(1, len(output_indices))
+            flat_avgmask.index_add_(1, output_indices, ones)
+        else:  # weighted average
+            self.initialize_weights_sum_tensor()
+            patch_indices_ini = np.zeros_like(locations[:, :3])
+            output_indices, _ = self.get_flat_indices(
+                locations,
+                patch_indices_ini,
+                patch_shape,
+            )
+            weights = self._patch_weights.reshape(1, -1).repeat(1, len(batch))
+            values = (flat_batch * weights).to(output_dtype)
+            flat_output.index_add_(1, output_indices, values)
+            flat_weights_sum = self._weights_sum_tensor.view(1, -1)
+            flat_weights_sum.index_add_(1, output_indices, weights)
+
+    def get_flat_indices(
+            self,
+            locations: np.ndarray,
+            patch_indices_ini: np.ndarray,
+            patch_shape: Sequence[int],
+            ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Compute the flat indices of the patch voxels written to the output.
+
+        Args:
+            locations: Array with shape :math:`(B, 6)` defining the regions of
+                the output volume that are written.
+            patch_indices_ini: Array with shape :math:`(B, 3)` containing the
+                first index of the written region in each patch.
+            patch_shape: Spatial shape of the patches.
+
+        Returns:
+            Tuple of two 1D tensors containing the indices in the flattened
+            output volume and in the flattened batch of patches, in the same
+            order as the voxels would be written patch by patch.
+        """
+        output_strides = get_strides(self.spatial_shape)
+        patch_strides = get_strides(patch_shape)
+        output_ini = locations[:, :3] @ np.array(output_strides)
+        batch_ini = patch_indices_ini @ np.array(patch_strides)
+        batch_ini += np.arange(len(locations)) * int(np.prod(patch_shape))
+        shapes = locations[:, 3:] - locations[:, :3]
+
+        def get_indices(shape, mask=slice(None)):
+            # The offsets of the voxels with respect to the first one are
+            # computed once per shape
+            shape = tuple(shape.tolist())
+            output_offsets = get_offsets(shape, output_strides)
+            patch_offsets = get_offsets(shape, patch_strides)
+            output_indices = output_ini[mask, np.newaxis] + output_offsets
+            batch_indices = batch_ini[mask, np.newaxis] + patch_offsets
+            return output_indices, batch_indices
+
+        if (shapes == shapes[0]).all():  # most common case
+            output_indices, batch_indices = get_indices(shapes[0])
+            output_indices = output_indices.reshape(-1)
+            batch_indices = batch_indices.reshape(-1)
+        else:
+            num_voxels = shapes.prod(axis=1)
+            starts = np.cumsum(num_voxels) - num_voxels
+            output_indices = np.empty(num_voxels.sum(), dtype=np.int64)
+            batch_indices = np.empty_like(output_indices)
+            keys = np.ravel_multi_index(shapes.T, np.array(patch_shape) + 1)
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            for index in range(len(unique_keys)):
+                mask = inverse == index
+                output_group, batch_group = get_indices(shapes[mask][0], mask)
+                positions = np.arange(output_group.shape[1])
+                positions = starts[mask, np.newaxis] + positions
+                output_indices[positions] = output_group
+                batch_indices[positions] = batch_group
+        output_indices = torch.from_numpy(output_indices)
+        batch_indices = torch.from_numpy(batch_indices)
+        return output_indices, batch_indices
 
     def get_output_tensor(self) -> torch.Tensor:
         """Get the aggregated volume after dense inference."""
@@ -158,15 +366,149 @@ class GridAggregator:
             )
             warnings.warn(message)
             self._output_tensor = self._output_tensor.type(torch.int32)
-        if self.overlap_mode == 'average':
-            output = self._output_tensor / self._avgmask_tensor
-        else:
+        if self.overlap_mode == 'crop':
             output = self._output_tensor
+        elif self.argmax:
+            output = self.get_labels()
+        else:
+            output = self.get_normalized_output()
         if self.volume_padded:
-            from ...transforms import Crop
-            border = self.patch_overlap // 2
-            cropping = border.repeat(2)
-            crop = Crop(cropping)
-            return crop(output)
+            # Slicing does not copy the data, which might be memory-mapped
+            i, j, k = self.patch_overlap // 2
+            si, sj, sk = self.spatial_shape
+            return output[:, i:si - i, j:sj - j, k:sk - k]
         else:
             return output
+
+    def get_weights_sum_tensor(self) -> torch.Tensor:
+        if self.overlap_mode == 'average':
+            return self._avgmask_tensor
+        return self._weights_sum_tensor
+
+    def get_normalized_output(self) -> torch.Tensor:
+        """Divide the accumulated predictions by the sum of their weights."""
+        weights_sum = self.get_weights_sum_tensor()
+        in_place = (
+            self.output_path is not None
+            and self._output_tensor.is_floating_point()
+        )
+        if not in_place:
+            return self._output_tensor / weights_sum
+        # Normalize the memory-mapped tensor in place, slab by slab
+        if not self._normalized:
+            for slab in self.get_slabs():
+                self._output_tensor[:, slab] /= weights_sum[:, slab]
+            self._normalized = True
+        return self._output_tensor
+
+    def get_labels(self) -> torch.Tensor:
+        """Compute the argmax of the accumulated predictions.
+
+        Dividing by the sum of the weights does not change the channel with
+        the largest value, so the accumulated predictions are used directly.
+        """
+        num_channels = len(self._output_tensor)
+        labels = torch.empty(
+            1,
+            *self.spatial_shape,
+            dtype=get_labels_dtype(num_channels),
+        )
+        for slab in self.get_slabs():
+            slab_labels = self._output_tensor[:, slab].argmax(dim=0)
+            labels[0, slab] = slab_labels.to(labels.dtype)
+        return labels
+
+    def get_slabs(self):
+        """Yield slices along the first spatial axis of the output."""
+        values_per_slice = self._output_tensor[:, 0].numel()
+        step = max(1, SLAB_SIZE // values_per_slice)
+        for index_ini in range(0, self.spatial_shape[0], step):
+            yield slice(index_ini, index_ini + step)
+
+
+def get_strides(shape: Sequence[int]) -> Tuple[int, int, int]:
+    """Return the strides of a C-contiguous array with the given shape."""
+    _, si, sj = shape
+    return si * sj, sj, 1
+
+
+@lru_cache(maxsize=32)
+def get_offsets(
+        shape: Tuple[int, int, int],
+        strides: Tuple[int, int, int],
+        ) -> np.ndarray:
+    """Flat offsets of the voxels in a region with respect to the first one.
+
+    The returned array is cached and must not be modified.
+    """
+    indices = np.unravel_index(np.arange(np.prod(shape)), shape)
+    offsets = np.stack(indices, axis=1) @ np.array(strides)
+    offsets.flags.writeable = False
+    return offsets
+
+
+def get_last_occurrences(indices: torch.Tensor) -> torch.Tensor:
+    """Return a mask of the last occurrence of each value in a 1D tensor."""
+    # A stable sort keeps the occurrences of each value in their original
+    # order, so the last one of each group is the last occurrence
+    values = indices.numpy()
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+    is_last = np.ones(len(values), dtype=bool)
+    is_last[:-1] = sorted_values[1:] != sorted_values[:-1]
+    mask = np.zeros(len(values), dtype=bool)
+    mask[order[is_last]] = True
+    return torch.from_numpy(mask)
+
+
+@lru_cache(maxsize=8)
+def get_gaussian_weights(
+        patch_size: Tuple[int, int, int],
+        sigma_scale: float = 1 / 8,
+        ) -> torch.Tensor:
+    """Gaussian importance map used to blend overlapping patches.
+
+    The map is the product of one Gaussian per axis, centered on the patch,
+    with a standard deviation of ``sigma_scale`` times the patch size. Its
+    maximum is one. The returned tensor is cached and must not be modified.
+    """
+    weights = np.ones(patch_size)
+    for axis, size in enumerate(patch_size):
+        center = (size - 1) / 2
+        sigma = size * sigma_scale
+        x = np.arange(size)
+        profile = np.exp(-(x - center) ** 2 / (2 * sigma ** 2))
+        view_shape = [1, 1, 1]
+        view_shape[axis] = size
+        weights = weights * (profile / profile.max()).reshape(view_shape)
+    return torch.from_numpy(weights).float()
+
+
+def get_labels_dtype(num_channels: int) -> torch.dtype:
+    """Return the smallest integer type that can store the channel indices."""
+    if num_channels <= 256:
+        return torch.uint8
+    if num_channels <= 2 ** 15:
+        return torch.int16
+    return torch.int32
+
+
+def get_memmap_tensor(
+        path: Path,
+        shape: Sequence[int],
+        dtype: torch.dtype,
+        ) -> torch.Tensor:
+    """Create a tensor of zeros backed by a memory-mapped ``.npy`` file."""
+    try:
+        numpy_dtype = torch.empty(0, dtype=dtype).numpy().dtype
+    except TypeError as error:
+        message = f'Type {dtype} cannot be used for a memory-mapped output'
+        raise ValueError(message) from error
+    path.parent.mkdir(exist_ok=True, parents=True)
+    array = np.lib.format.open_memmap(
+        path,
+        mode='w+',
+        dtype=numpy_dtype,
+        shape=tuple(shape),
+    )
+    return torch.from_numpy(array)
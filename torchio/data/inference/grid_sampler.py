@@ -1,10 +1,14 @@
-from typing import Union
+import copy
+from typing import Union, Sequence
 
+import torch
 import numpy as np
 from torch.utils.data import Dataset
+from torch.utils.data.dataloader import default_collate
 
 from ...utils import to_tuple
-from ...torchio import LOCATION, TypeTuple, TypeTripletInt
+from ...torchio import DATA, AFFINE, LOCATION, TypeTuple, TypeTripletInt
+from ..image import Image
 from ..subject import Subject
 from ..sampler.sampler import PatchSampler
 
@@ -34,6 +38,32 @@ class GridSampler(PatchSampler, Dataset):
             :py:class:`~torchio.data.GridAggregator`, it will crop the output
             to its original size.
 
+    Indexing the sampler with an integer returns a patch whose images are
+    views of the (possibly padded) subject images, so no data is copied and
+    no :py:class:`~torchio.transforms.Crop` is added to the patch history.
+    Indexing it with a sequence of integers returns a whole batch, in which
+    the patches of each image are gathered into a preallocated 5D tensor.
+    The batch has the same structure as the one obtained collating the
+    corresponding patches, so it can be used with a
+    :py:class:`torch.utils.data.BatchSampler`:
+
+    >>> import torch
+    >>> import torchio as tio
+    >>> sampler = tio.inference.GridSampler(subject, 64, 4)
+    >>> batch_sampler = torch.utils.data.BatchSampler(
+    ...     torch.utils.data.SequentialSampler(sampler),
+    ...     batch_size=8,
+    ...     drop_last=False,
+    ... )
+    >>> loader = torch.utils.data.DataLoader(
+    ...     sampler,
+    ...     sampler=batch_sampler,
+    ...     batch_size=None,
+    ... )
+    >>> for batch in loader:
+    ...     inputs = batch['t1'][tio.DATA]
+    ...     locations = batch[tio.LOCATION]
+
     .. note:: Adapted from NiftyNet. See `this NiftyNet tutorial
         <https://niftynet.readthedocs.io/en/dev/window_sizes.html>`_ for more
         information about patch based sampling. Note that
@@ -65,12 +95,81 @@ class GridSampler(PatchSampler, Dataset):
         return len(self.locations)
 
     def __getitem__(self, index):
+        if np.ndim(index) > 0:
+            return self.get_batch(index)
+        return self.get_patch(int(index))
+
+    def get_patch(self, index: int) -> Subject:
+        """Return the patch at the given index of the grid.
+
+        Images that have been loaded are not copied, as the patch images are
+        views of the subject images.
+        """
         # Assume 3D
         location = self.locations[index]
-        index_ini = location[:3]
-        cropped_subject = self.crop(self.subject, index_ini, self.patch_size)
-        cropped_subject[LOCATION] = location
-        return cropped_subject
+        index_ini, index_fin = location[:3], location[3:]
+        patch = copy.copy(self.subject)
+        for image in patch.get_images(intensity_only=False):
+            if image._is_lazy():
+                tensor, affine = image.read_region(index_ini, index_fin)
+            else:
+                i0, j0, k0 = index_ini
+                i1, j1, k1 = index_fin
+                tensor = image[DATA][:, i0:i1, j0:j1, k0:k1]
+                affine = image._get_region_affine(image[AFFINE], index_ini)
+            image.set_data(tensor, affine)
+        patch[LOCATION] = location
+        return patch
+
+    def get_batch(self, indices: Sequence[int]) -> dict:
+        """Return a batch with the patches at the given indices of the grid.
+
+        The batch is a dictionary with the same structure as the one obtained
+        when the patches are collated by a
+        :py:class:`~torch.utils.data.DataLoader`. For each image, the
+        patches are copied into a tensor of shape :math:`(B, C, w, h, d)`.
+        """
+        indices = np.asarray(indices, dtype=int)
+        locations = self.locations[indices]
+        batch = {}
+        for key, value in self.subject.items():
+            if isinstance(value, Image):
+                batch[key] = self.get_image_batch(value, locations)
+            else:
+                batch[key] = default_collate(len(locations) * [value])
+        batch[LOCATION] = torch.from_numpy(locations)
+        return batch
+
+    def get_image_batch(self, image: Image, locations: np.ndarray) -> dict:
+        batch_size = len(locations)
+        indices_ini = locations[:, :3]
+        metadata = {
+            key: value
+            for key, value in image.items()
+            if key not in (DATA, AFFINE)
+        }
+        image_batch = default_collate(batch_size * [metadata])
+
+        if image._is_lazy():
+            regions = [
+                image.read_region(location[:3], location[3:])[0]
+                for location in locations
+            ]
+            tensor = torch.stack(regions)
+        else:
+            data = image[DATA]
+            shape = batch_size, data.shape[0], *self.patch_size.tolist()
+            tensor = torch.empty(shape, dtype=data.dtype)
+            for patch, location in zip(tensor, locations.tolist()):
+                i0, j0, k0, i1, j1, k1 = location
+                patch.copy_(data[:, i0:i1, j0:j1, k0:k1])
+        image_batch[DATA] = tensor
+
+        affine = image.affine  # read from the header if the image is lazy
+        affines = np.repeat(affine[np.newaxis], batch_size, axis=0)
+        affines[:, :3, 3] = indices_ini @ affine[:3, :3].T + affine[:3, 3]
+        image_batch[AFFINE] = torch.from_numpy(affines)
+        return image_batch
 
     @staticmethod
     def parse_sizes(
@@ -5,14 +5,22 @@ import torch
 import numpy as np
 import nibabel as nib
 import SimpleITK as sitk
-from .. import TypePath, TypeData
-from ..utils import nib_to_sitk, sitk_to_nib
+from .. import TypePath, TypeData, TypeTripletInt
+from ..utils import nib_to_sitk, sitk_to_nib, get_ras_affine_from_sitk
 
 
 FLIPXY = np.diag([-1, -1, 1, 1])
 
 
-def read_image(path: TypePath) -> Tuple[torch.Tensor, np.ndarray]:
+def read_image(
+        path: TypePath,
+        mmap: bool = False,
+        ) -> Tuple[torch.Tensor, np.ndarray]:
+    if mmap:
+        try:
+            return _read_nibabel_mmap(path)
+        except (RuntimeError, TypeError, nib.loadsave.ImageFileError):
+            pass  # the file cannot be memory-mapped, read it as usual
     try:
         result = _read_sitk(path)
     except RuntimeError:  # try with NiBabel
@@ -34,18 +42,148 @@ def _read_nibabel(path: TypePath) -> Tuple[torch.Tensor, np.ndarray]:
     return tensor, affine
 
 
+def _read_nibabel_mmap(path: TypePath) -> Tuple[torch.Tensor, np.ndarray]:
+    """Memory-map an uncompressed NIfTI or Analyze file.
+
+    The returned tensor shares memory with the file, so voxels are only read
+    from disk when they are accessed. The data type is the one stored on disk.
+    The affine matrix is read as in :func:`read_affine`, so that it matches
+    the one returned when the file is not memory-mapped.
+    """
+    img = nib.load(str(path), mmap='c')
+    proxy = img.dataobj
+    if not nib.is_proxy(proxy):
+        raise RuntimeError(f'Data in "{path}" is not an array proxy')
+    if proxy.slope != 1 or proxy.inter != 0:
+        raise RuntimeError(f'Data in "{path}" needs to be scaled')
+    array = proxy.get_unscaled()
+    if not isinstance(array, np.memmap):
+        raise RuntimeError(f'File "{path}" cannot be memory-mapped')
+    if not array.dtype.isnative:
+        raise RuntimeError(f'Byte order of data in "{path}" is not native')
+    if array.ndim == 3:
+        array = array[np.newaxis]
+    elif array.ndim == 5:
+        array = array[..., 0, :]
+        array = array.transpose(3, 0, 1, 2)
+    tensor = torch.from_numpy(array)
+    return tensor, read_affine(path)
+
+
 def _read_sitk(path: TypePath) -> Tuple[torch.Tensor, np.ndarray]:
     if Path(path).is_dir():  # assume DICOM
         image = _read_dicom(path)
     else:
         image = sitk.ReadImage(str(path))
-    data, affine = sitk_to_nib(image, keepdim=True)
-    if data.dtype != np.float32:
-        data = data.astype(np.float32)
+    data, affine = sitk_to_nib(image, keepdim=True, dtype=np.float32)
+    tensor = torch.from_numpy(data)
+    return tensor, affine
+
+
+def read_shape(path: TypePath) -> Tuple[int, int, int, int]:
+    """Read the shape :math:`(C, W, H, D)` of a 3D image from its header."""
+    try:
+        reader = sitk.ImageFileReader()
+        reader.SetFileName(str(path))
+        reader.ReadImageInformation()
+        if reader.GetDimension() != 3:
+            raise RuntimeError(f'Image "{path}" is not 3D')
+        shape = reader.GetNumberOfComponents(), *reader.GetSize()
+    except RuntimeError:  # try with NiBabel
+        try:
+            shape = nib.load(str(path)).shape
+        except nib.loadsave.ImageFileError:
+            raise RuntimeError(f'File "{path}" not understood')
+        if len(shape) == 3:
+            shape = 1, *shape
+        elif len(shape) == 5 and shape[3] == 1:
+            shape = shape[4], *shape[:3]
+        else:
+            raise RuntimeError(f'Shape of image "{path}" not understood')
+    return tuple(int(n) for n in shape)
+
+
+def read_affine(path: TypePath) -> np.ndarray:
+    """Read the affine matrix of a 3D image from its header."""
+    try:
+        reader = sitk.ImageFileReader()
+        reader.SetFileName(str(path))
+        reader.ReadImageInformation()
+        if reader.GetDimension() != 3:
+            raise RuntimeError(f'Image "{path}" is not 3D')
+        affine = get_ras_affine_from_sitk(reader)
+    except RuntimeError:  # try with NiBabel
+        try:
+            affine = nib.load(str(path)).affine
+        except nib.loadsave.ImageFileError:
+            raise RuntimeError(f'File "{path}" not understood')
+    return affine
+
+
+def read_region(
+        path: TypePath,
+        index_ini: TypeTripletInt,
+        index_fin: TypeTripletInt,
+        ) -> Tuple[torch.Tensor, np.ndarray]:
+    """Read only a region of a 3D image.
+
+    Args:
+        path: Path to the image file.
+        index_ini: Index of the first voxel of the region.
+        index_fin: Index of the voxel after the last voxel of the region.
+    """
+    index_ini = [int(n) for n in index_ini]
+    index_fin = [int(n) for n in index_fin]
+    try:
+        result = _read_sitk_region(path, index_ini, index_fin)
+    except RuntimeError:  # try with NiBabel
+        try:
+            result = _read_nibabel_region(path, index_ini, index_fin)
+        except nib.loadsave.ImageFileError:
+            raise RuntimeError(f'File "{path}" not understood')
+    return result
+
+
+def _read_sitk_region(
+        path: TypePath,
+        index_ini: TypeTripletInt,
+        index_fin: TypeTripletInt,
+        ) -> Tuple[torch.Tensor, np.ndarray]:
+    reader = sitk.ImageFileReader()
+    reader.SetFileName(str(path))
+    reader.ReadImageInformation()
+    if reader.GetDimension() != 3:
+        raise RuntimeError(f'Image "{path}" is not 3D')
+    size = np.array(index_fin) - np.array(index_ini)
+    reader.SetExtractIndex(index_ini)
+    reader.SetExtractSize(size.tolist())
+    image = reader.Execute()
+    data, affine = sitk_to_nib(image, keepdim=True, dtype=np.float32)
     tensor = torch.from_numpy(data)
     return tensor, affine
 
 
+def _read_nibabel_region(
+        path: TypePath,
+        index_ini: TypeTripletInt,
+        index_fin: TypeTripletInt,
+        ) -> Tuple[torch.Tensor, np.ndarray]:
+    img = nib.load(str(path))
+    i0, j0, k0 = index_ini
+    i1, j1, k1 = index_fin
+    if img.ndim == 3:
+        data = img.dataobj[i0:i1, j0:j1, k0:k1][np.newaxis]
+    elif img.ndim == 5:
+        data = img.dataobj[i0:i1, j0:j1, k0:k1, 0, :]
+        data = data.transpose(3, 0, 1, 2)
+    else:
+        raise RuntimeError(f'Shape of image "{path}" not understood')
+    tensor = torch.from_numpy(np.asarray(data, dtype=np.float32))
+    affine = img.affine.copy()
+    affine[:3, 3] = nib.affines.apply_affine(img.affine, index_ini)
+    return tensor, affine
+
+
 def _read_dicom(directory: TypePath):
     directory = Path(directory)
     if not directory.is_dir():  # unreachable if called from _read_sitk
@@ -1,11 +1,19 @@
+import time
 import random
 import warnings
+import threading
 from itertools import islice
-from typing import List, Iterator
+from typing import Dict, List, Tuple, Iterator, Optional
 
+import torch
+import humanize
+import numpy as np
 from tqdm import trange
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, Sampler
+from torch.utils.data.dataloader import default_collate
 
+from ..torchio import DATA, AFFINE
+from .image import Image
 from .subject import Subject
 from .sampler import PatchSampler
 from .dataset import SubjectsDataset
@@ -33,6 +41,47 @@ class Queue(Dataset):
         shuffle_patches: If ``True``, patches are shuffled after filling the
             queue.
         verbose: If ``True``, some debugging messages are printed.
+        fill_in_background: If ``True``, a background thread fills a second
+            buffer of patches while patches are being popped from the first
+            one. When the first buffer is empty, the buffers are swapped, so
+            training only waits if the next buffer is not ready yet. Note
+            that up to twice :attr:`max_length` patches may be stored in
+            memory.
+        sample_in_workers: If ``True``, patches are extracted by the workers
+            that load and transform the subjects, instead of in the main
+            process. Patches are sent to the main process through shared
+            memory, so the queue only needs to gather them. This is
+            recommended if sampling is expensive, e.g. if many patches are
+            extracted from each volume or a
+            :class:`~torchio.data.WeightedSampler` is used.
+        subject_sampler: Sampler of subject indices used by the subjects
+            loader, such as :class:`torch.utils.data.DistributedSampler`.
+            If the sampler has a ``set_epoch`` method, it is called every
+            time all the subjects have been processed, so that subjects can
+            be shuffled consistently across processes. If a sampler is given,
+            :attr:`shuffle_subjects` is ignored and the length of the queue
+            is computed using the number of subjects drawn by the sampler.
+        max_memory: Maximum number of bytes used to store patches. If given,
+            the subjects loaded to fill the queue are limited so that their
+            patches fit in this budget, which is estimated from the memory
+            of the patches sampled so far. If :attr:`fill_in_background` is
+            ``True``, half of the budget is used for each buffer. The queue
+            length is still limited by :attr:`max_length`.
+        contiguous_storage: If ``True``, the image data of the patches sampled
+            at each fill are copied into one preallocated tensor per image, of
+            shape :math:`(N, C, W, H, D)`. Patches are shuffled before being
+            stored, so a batch of patches is a slice of these tensors and no
+            stacking is needed. All patches must have the same shape.
+        pin_memory: If ``True`` and :attr:`contiguous_storage` is ``True``,
+            the patches are stored in page-locked memory, so that batches can
+            be copied asynchronously to the GPU. Ignored if CUDA is not
+            available.
+
+    The total time in seconds that the queue spent blocked waiting for
+    patches is stored in :attr:`blocked_time`. The number of bytes taken by
+    the stored patches is given by :attr:`memory`, and the time spent
+    filling the queue and the number of patches sampled are stored in
+    :attr:`fill_time` and :attr:`num_filled_patches`.
 
     This sketch can be used to experiment and understand how the queue works.
     In this case, :attr:`shuffle_subjects` is ``False``
@@ -44,6 +93,50 @@ class Queue(Dataset):
             <iframe style="width: 640px; height: 360px; overflow: hidden;" scrolling="no" frameborder="0" src="https://editor.p5js.org/embed/DZwjZzkkV"></iframe>
         </embed>
 
+    When training with
+    :class:`~torch.nn.parallel.DistributedDataParallel`, a
+    :class:`~torch.utils.data.DistributedSampler` can be used so that
+    each process loads a different subset of the subjects:
+
+    >>> from torch.utils.data import DistributedSampler
+    >>> subject_sampler = DistributedSampler(
+    ...     subjects_dataset,
+    ...     num_replicas=torch.distributed.get_world_size(),
+    ...     rank=torch.distributed.get_rank(),
+    ...     shuffle=True,
+    ... )
+    >>> patches_queue = tio.Queue(
+    ...     subjects_dataset,
+    ...     queue_length,
+    ...     samples_per_volume,
+    ...     sampler,
+    ...     subject_sampler=subject_sampler,
+    ... )
+
+    The queue can also be indexed with a sequence of indices to obtain a
+    collated batch of patches, e.g. using a
+    :class:`~torch.utils.data.BatchSampler`. This is the most efficient way of
+    using the queue if :attr:`contiguous_storage` is ``True``:
+
+    >>> from torch.utils.data import BatchSampler, SequentialSampler
+    >>> patches_queue = tio.Queue(
+    ...     subjects_dataset,
+    ...     queue_length,
+    ...     samples_per_volume,
+    ...     sampler,
+    ...     contiguous_storage=True,
+    ... )
+    >>> batch_sampler = BatchSampler(
+    ...     SequentialSampler(patches_queue),
+    ...     batch_size=16,
+    ...     drop_last=False,
+    ... )
+    >>> patches_loader = DataLoader(
+    ...     patches_queue,
+    ...     sampler=batch_sampler,
+    ...     batch_size=None,
+    ... )
+
     .. note:: :attr:`num_workers` refers to the number of workers used to
         load and transform the volumes. Multiprocessing is not needed to pop
         patches from the queue.
@@ -86,6 +179,12 @@ class Queue(Dataset):
             shuffle_subjects: bool = True,
             shuffle_patches: bool = True,
             verbose: bool = False,
+            fill_in_background: bool = False,
+            sample_in_workers: bool = False,
+            subject_sampler: Optional[Sampler] = None,
+            max_memory: Optional[int] = None,
+            contiguous_storage: bool = False,
+            pin_memory: bool = False,
             ):
         self.subjects_dataset = subjects_dataset
         self.max_length = max_length
@@ -95,22 +194,64 @@ class Queue(Dataset):
         self.sampler = sampler
         self.num_workers = num_workers
         self.verbose = verbose
+        self.fill_in_background = fill_in_background
+        self.sample_in_workers = sample_in_workers
+        self.subject_sampler = subject_sampler
+        self.max_memory = max_memory
+        self.contiguous_storage = contiguous_storage
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.epoch = 0
         self.subjects_iterable = self.get_subjects_iterable()
         self.patches_list: List[dict] = []
         self.num_sampled_patches = 0
+        self.blocked_time = 0
+        self.fill_time = 0
+        self.num_filled_patches = 0
+        self.num_filled_subjects = 0
+        self.filled_memory = 0
+        self._memory = 0
+        self._next_memory = 0
+        self._next_patches_list: List[dict] = []
+        self._fill_thread = None
+        self._fill_exception = None
 
     def __len__(self):
         return self.iterations_per_epoch
 
-    def __getitem__(self, _):
+    def __getitem__(self, index):
+        if np.ndim(index) > 0:
+            return self.get_batch(len(index))
         # There are probably more elegant ways of doing this
         if not self.patches_list:
-            self._print('Patches list is empty.')
-            self.fill()
+            self.wait_for_patches()
         sample_patch = self.patches_list.pop()
+        self._memory -= get_subject_memory(sample_patch)
         self.num_sampled_patches += 1
         return sample_patch
 
+    def get_batch(self, batch_size: int) -> dict:
+        """Pop a batch of patches, collated as in a
+        :class:`~torch.utils.data.DataLoader`."""
+        if not self.patches_list:
+            self.wait_for_patches()
+        fits = batch_size <= self.num_patches
+        if self.contiguous_storage and fits:
+            batch, memory = self.patches_list.pop_batch(batch_size)
+            self._memory -= memory
+            self.num_sampled_patches += batch_size
+            return batch
+        patches = [self[0] for _ in range(batch_size)]
+        return collate_patches(patches)
+
+    def wait_for_patches(self) -> None:
+        self._print('Patches list is empty.')
+        start = time.perf_counter()
+        if self.fill_in_background:
+            self.swap_buffers()
+        else:
+            self.fill()
+        self.blocked_time += time.perf_counter() - start
+
     def __repr__(self):
         attributes = [
             f'max_length={self.max_length}',
@@ -119,6 +260,9 @@ class Queue(Dataset):
             f'samples_per_volume={self.samples_per_volume}',
             f'num_sampled_patches={self.num_sampled_patches}',
             f'iterations_per_epoch={self.iterations_per_epoch}',
+            f'blocked_time={self.blocked_time:.2f}',
+            f'memory={humanize.naturalsize(self.memory, binary=True)}',
+            f'patches_per_second={self.patches_per_second:.1f}',
         ]
         attributes_string = ', '.join(attributes)
         return f'Queue({attributes_string})'
@@ -129,6 +273,8 @@ class Queue(Dataset):
 
     @property
     def num_subjects(self) -> int:
+        if self.subject_sampler is not None:
+            return len(self.subject_sampler)
         return len(self.subjects_dataset)
 
     @property
@@ -139,7 +285,69 @@ class Queue(Dataset):
     def iterations_per_epoch(self) -> int:
         return self.num_subjects * self.samples_per_volume
 
+    @property
+    def memory(self) -> int:
+        """Number of bytes taken by the patches stored in the queue."""
+        return self._memory + self._next_memory
+
+    @property
+    def patches_per_second(self) -> float:
+        """Number of patches sampled per second spent filling the queue."""
+        if self.fill_time == 0:
+            return 0
+        return self.num_filled_patches / self.fill_time
+
     def fill(self) -> None:
+        patches = self.sample_patches()
+        self._memory += get_patches_memory(patches)
+        if self.shuffle_patches:
+            random.shuffle(patches)
+        self.add_patches(patches)
+
+    def add_patches(self, patches: List[Subject]) -> None:
+        if self.contiguous_storage:
+            patches = list(self.patches_list) + patches
+            self.patches_list = PatchesStorage(patches, self.pin_memory)
+        else:
+            self.patches_list.extend(patches)
+
+    def swap_buffers(self) -> None:
+        """Wait for the background buffer and use it as the queue.
+
+        A new background fill is started right after swapping.
+        """
+        if self._fill_thread is None:
+            self._start_fill_thread()
+        self._fill_thread.join()
+        self._fill_thread = None
+        if self._fill_exception is not None:
+            exception, self._fill_exception = self._fill_exception, None
+            raise exception
+        self.add_patches(self._next_patches_list)
+        self._next_patches_list = []
+        self._memory += self._next_memory
+        self._next_memory = 0
+        self._start_fill_thread()
+
+    def _start_fill_thread(self) -> None:
+        self._fill_thread = threading.Thread(
+            target=self._fill_next_buffer,
+            daemon=True,
+        )
+        self._fill_thread.start()
+
+    def _fill_next_buffer(self) -> None:
+        # Exceptions are raised in the main thread when the buffers are swapped
+        try:
+            patches = self.sample_patches()
+            if self.shuffle_patches:
+                random.shuffle(patches)
+            self._next_patches_list = patches
+            self._next_memory = get_patches_memory(patches)
+        except Exception as exception:
+            self._fill_exception = exception
+
+    def sample_patches(self) -> List[dict]:
         assert self.sampler is not None
         if self.max_length % self.samples_per_volume != 0:
             message = (
@@ -155,38 +363,234 @@ class Queue(Dataset):
         num_subjects_for_queue = min(
             self.num_subjects, max_num_subjects_for_queue)
 
+        max_fill_memory = self.max_memory
+        if max_fill_memory is not None and self.fill_in_background:
+            max_fill_memory /= 2
+
         self._print(f'Filling queue from {num_subjects_for_queue} subjects...')
         if self.verbose:
             iterable = trange(num_subjects_for_queue, leave=False)
         else:
             iterable = range(num_subjects_for_queue)
+        start = time.perf_counter()
+        patches_list = []
+        fill_memory = 0
         for _ in iterable:
-            subject = self.get_next_subject()
-            iterable = self.sampler(subject)
-            patches = list(islice(iterable, self.samples_per_volume))
-            self.patches_list.extend(patches)
-        if self.shuffle_patches:
-            random.shuffle(self.patches_list)
+            if max_fill_memory is not None and patches_list:
+                memory_per_subject = (
+                    self.filled_memory / self.num_filled_subjects)
+                if fill_memory + memory_per_subject > max_fill_memory:
+                    self._print('Memory budget reached')
+                    break
+            patches = self.get_next_patches()
+            patches_memory = get_patches_memory(patches)
+            fill_memory += patches_memory
+            self.filled_memory += patches_memory
+            self.num_filled_subjects += 1
+            self.num_filled_patches += len(patches)
+            patches_list.extend(patches)
+        self.fill_time += time.perf_counter() - start
+        return patches_list
+
+    def get_next_patches(self) -> List[Subject]:
+        if self.sample_in_workers:
+            return self.get_next_item()
+        subject = self.get_next_subject()
+        return extract_patches(self.sampler, subject, self.samples_per_volume)
 
     def get_next_subject(self) -> Subject:
+        return self.get_next_item()
+
+    def get_next_item(self):
         # A StopIteration exception is expected when the queue is empty
         try:
-            subject = next(self.subjects_iterable)
+            item = next(self.subjects_iterable)
         except StopIteration as exception:
             self._print('Queue is empty:', exception)
             self.subjects_iterable = self.get_subjects_iterable()
-            subject = next(self.subjects_iterable)
-        return subject
+            item = next(self.subjects_iterable)
+        return item
 
     def get_subjects_iterable(self) -> Iterator:
         # I need a DataLoader to handle parallelism
-        # But this loader is always expected to yield single subject samples
+        # But this loader is always expected to yield single subject samples,
+        # or the list of patches extracted from a single subject
         self._print(
             '\nCreating subjects loader with', self.num_workers, 'workers')
+        if self.sample_in_workers:
+            dataset = PatchesDataset(
+                self.subjects_dataset,
+                self.sampler,
+                self.samples_per_volume,
+            )
+        else:
+            dataset = self.subjects_dataset
+        if self.subject_sampler is None:
+            shuffle = self.shuffle_subjects
+        else:
+            shuffle = False  # the sampler is in charge of shuffling
+            if hasattr(self.subject_sampler, 'set_epoch'):
+                self.subject_sampler.set_epoch(self.epoch)
+        self.epoch += 1
         subjects_loader = DataLoader(
-            self.subjects_dataset,
+            dataset,
             num_workers=self.num_workers,
             collate_fn=lambda x: x[0],
-            shuffle=self.shuffle_subjects,
+            shuffle=shuffle,
+            sampler=self.subject_sampler,
         )
         return iter(subjects_loader)
+
+
+class PatchesDataset(Dataset):
+    """Dataset that returns the patches sampled from each subject.
+
+    Args:
+        subjects_dataset: Instance of
+            :class:`~torchio.data.dataset.SubjectsDataset`.
+        sampler: A sampler used to extract patches from the volumes.
+        samples_per_volume: Number of patches to extract from each volume.
+    """
+    def __init__(
+            self,
+            subjects_dataset: SubjectsDataset,
+            sampler: PatchSampler,
+            samples_per_volume: int,
+            ):
+        self.subjects_dataset = subjects_dataset
+        self.sampler = sampler
+        self.samples_per_volume = samples_per_volume
+
+    def __len__(self):
+        return len(self.subjects_dataset)
+
+    def __getitem__(self, index: int) -> List[Subject]:
+        subject = self.subjects_dataset[index]
+        return extract_patches(self.sampler, subject, self.samples_per_volume)
+
+
+def extract_patches(
+        sampler: PatchSampler,
+        subject: Subject,
+        num_patches: int,
+        ) -> List[Subject]:
+    iterable = sampler(subject, num_patches)
+    return list(islice(iterable, num_patches))
+
+
+class PatchesStorage:
+    """Patches whose image data are stored in preallocated tensors.
+
+    The data of each patch image is a view of a tensor of shape
+    :math:`(N, C, W, H, D)` that contains the data of all patches. As in a
+    list, patches are popped from the end.
+
+    Args:
+        patches: List of patches with the same images and shapes.
+        pin_memory: If ``True``, the tensors are allocated in page-locked
+            memory.
+    """
+    def __init__(self, patches: List[Subject], pin_memory: bool = False):
+        self.patches = list(patches)
+        self.tensors = {}
+        if not patches:
+            return
+        first_patch = patches[0]
+        for name in first_patch.get_images_dict(intensity_only=False):
+            tensors = [patch[name][DATA] for patch in patches]
+            first_tensor = tensors[0]
+            for tensor in tensors[1:]:
+                same_type = tensor.dtype == first_tensor.dtype
+                if tensor.shape != first_tensor.shape or not same_type:
+                    message = (
+                        'All patches must have the same shape and type to be'
+                        f' stored contiguously, but image "{name}" has shapes'
+                        f' {tuple(first_tensor.shape)} and {tuple(tensor.shape)}'
+                        f' and types {first_tensor.dtype} and {tensor.dtype}'
+                    )
+                    raise ValueError(message)
+            storage = torch.empty(
+                (len(tensors), *first_tensor.shape),
+                dtype=first_tensor.dtype,
+                pin_memory=pin_memory,
+            )
+            torch.stack(tensors, out=storage)
+            for patch, tensor in zip(patches, storage):
+                patch[name].set_data(tensor)
+            self.tensors[name] = storage
+
+    def __len__(self):
+        return len(self.patches)
+
+    def __iter__(self):
+        return iter(self.patches)
+
+    def pop(self) -> Subject:
+        return self.patches.pop()
+
+    def pop_batch(self, batch_size: int) -> Tuple[dict, int]:
+        """Pop the last patches, collated as in a
+        :class:`~torch.utils.data.DataLoader`.
+
+        The image data in the batch are views of the stored tensors.
+
+        Returns:
+            Tuple with the batch and the number of bytes of its image data.
+        """
+        end = len(self.patches)
+        start = end - batch_size
+        patches = self.patches[start:]
+        del self.patches[start:]
+        tensors = {
+            name: tensor[start:end]
+            for name, tensor in self.tensors.items()
+        }
+        batch = collate_patches(patches, tensors)
+        memory = sum(t.element_size() * t.numel() for t in tensors.values())
+        return batch, memory
+
+
+def collate_patches(
+        patches: List[Subject],
+        tensors: Optional[Dict[str, torch.Tensor]] = None,
+        ) -> dict:
+    """Collate patches into a dictionary, as in a
+    :class:`~torch.utils.data.DataLoader`.
+
+    Args:
+        patches: List of patches.
+        tensors: Optional dictionary with the batched data of each image. If
+            ``None``, the data of the patches are stacked.
+    """
+    batch = {}
+    for key, value in patches[0].items():
+        if not isinstance(value, Image):
+            batch[key] = default_collate([patch[key] for patch in patches])
+            continue
+        metadata = [
+            {
+                name: image_value
+                for name, image_value in patch[key].items()
+                if name not in (DATA, AFFINE)
+            }
+            for patch in patches
+        ]
+        image_batch = default_collate(metadata)
+        if tensors is None:
+            tensor = torch.stack([patch[key][DATA] for patch in patches])
+        else:
+            tensor = tensors[key]
+        image_batch[DATA] = tensor
+        affines = np.stack([patch[key][AFFINE] for patch in patches])
+        image_batch[AFFINE] = torch.from_numpy(affines)
+        batch[key] = image_batch
+    return batch
+
+
+def get_subject_memory(subject: Subject) -> int:
+    images = subject.get_images(intensity_only=False)
+    return sum(image.memory for image in images)
+
+
+def get_patches_memory(patches: List[Subject]) -> int:
+    return sum(get_subject_memory(patch) for patch in patches)
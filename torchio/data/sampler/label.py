@@ -1,12 +1,46 @@
-from typing import Dict, Optional
+import os
+import zipfile
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple, NamedTuple
 
 import torch
+import numpy as np
 
+from ...data.image import Image
 from ...data.subject import Subject
+from ...utils import get_stem
 from ...torchio import TypePatchSize, DATA, TYPE, LABEL
 from .weighted import WeightedSampler
 
 
+class LabelIndex(NamedTuple):
+    """Voxels of each label in a label map.
+
+    Attributes:
+        labels: Sorted labels present in the label map. For label maps with
+            multiple channels, the labels are the channel indices.
+        counts: Number of voxels of each label.
+        indices: Flat indices of the voxels, grouped by label.
+        shape: Spatial shape of the label map.
+        multichannel: ``True`` if the label map has multiple channels.
+    """
+    labels: np.ndarray
+    counts: np.ndarray
+    indices: np.ndarray
+    shape: Tuple[int, int, int]
+    multichannel: bool
+
+
+class LabelTable(NamedTuple):
+    """Voxels that can be sampled for each label, with the label weights."""
+    weights: torch.Tensor
+    offsets: np.ndarray
+    counts: np.ndarray
+    indices: np.ndarray
+    shape: Tuple[int, int, int]
+
+
 class LabelSampler(WeightedSampler):
     r"""Extract random patches with labeled voxels at their center.
 
@@ -31,6 +65,18 @@ class LabelSampler(WeightedSampler):
             sampler whose patches centers will have 50% probability of being
             taken from a non zero value of channel ``1``, 25% from channel
             ``2`` and 25% from channel ``3``.
+        cache_size: See :py:class:`~torchio.data.WeightedSampler`.
+        persist_index: If ``True``, the indices of the voxels of each label
+            are saved next to the label map file, in a file named
+            ``<stem>_label_index.npz``, and read from there the next time the
+            subject is sampled, unless the label map file is newer. Indices
+            are only saved if the label map has not been transformed. If the
+            file cannot be written or read, e.g. in read-only directories,
+            the indices are computed in memory.
+
+    The voxels of each label are found in a single pass through the label map,
+    and patch centers are drawn in two stages: first the label, then one of
+    its voxels.
 
     Example:
         >>> import torchio as tio
@@ -55,24 +101,26 @@ class LabelSampler(WeightedSampler):
             patch_size: TypePatchSize,
             label_name: Optional[str] = None,
             label_probabilities: Optional[Dict[int, float]] = None,
+            cache_size: int = 0,
+            persist_index: bool = False,
             ):
-        super().__init__(patch_size, probability_map=label_name)
+        super().__init__(
+            patch_size,
+            probability_map=label_name,
+            cache_size=cache_size,
+        )
         self.label_probabilities_dict = label_probabilities
+        self.persist_index = persist_index
 
-    def get_probability_map(self, subject: Subject) -> torch.Tensor:
+    def get_probability_map_image(self, subject: Subject) -> Image:
         if self.probability_map_name is None:
             for image in subject.get_images(intensity_only=False):
                 if image[TYPE] == LABEL:
-                    label_map_tensor = image[DATA]
-                    break
-        elif self.probability_map_name in subject:
-            label_map_tensor = subject[self.probability_map_name][DATA]
-        else:
-            message = (
-                f'Image "{self.probability_map_name}"'
-                f' not found in subject subject: {subject}'
-            )
-            raise KeyError(message)
+                    return image
+        return super().get_probability_map_image(subject)
+
+    def get_probability_map(self, subject: Subject) -> torch.Tensor:
+        label_map_tensor = self.get_probability_map_image(subject)[DATA]
         if self.label_probabilities_dict is None:
             return label_map_tensor > 0
         probability_map = self.get_probabilities_from_label_map(
@@ -108,3 +156,197 @@ class LabelSampler(WeightedSampler):
         if multichannel:
             probability_map = probability_map.sum(dim=0, keepdim=True)
         return probability_map
+
+    def compute_sampling_table(self, subject: Subject) -> LabelTable:
+        label_index = self.get_label_index(subject)
+        # Only voxels that can be the center of a patch are considered
+        index_ini, index_fin = self.get_centers_bounds(label_index.shape)
+        i0, j0, k0 = index_ini.tolist()
+        i1, j1, k1 = index_fin.tolist()
+        is_center = np.zeros(label_index.shape, dtype=bool)
+        is_center[i0:i1, j0:j1, k0:k1] = True
+        is_valid = is_center.ravel()[label_index.indices]
+        offsets = np.cumsum(label_index.counts) - label_index.counts
+        valid_counts = np.add.reduceat(is_valid, offsets)
+        valid_offsets = np.cumsum(valid_counts) - valid_counts
+
+        # The probability of each voxel is the probability of its label
+        # divided by the number of voxels of that label, as in
+        # get_probabilities_from_label_map
+        probabilities = self.get_label_probabilities(label_index)
+        weights = probabilities * valid_counts / label_index.counts
+        if weights.sum() == 0:
+            message = (
+                'Empty probability map found'
+                f' ({self.probability_map_name})'
+            )
+            raise RuntimeError(message)
+        return LabelTable(
+            torch.from_numpy(weights),
+            valid_offsets,
+            valid_counts,
+            label_index.indices[is_valid],
+            label_index.shape,
+        )
+
+    def get_label_probabilities(self, label_index: LabelIndex) -> np.ndarray:
+        labels, counts = label_index.labels, label_index.counts
+        probabilities_dict = self.label_probabilities_dict
+        if probabilities_dict is None:
+            # Binarized label map, in which all voxels have the same
+            # probability. Only the first channel is used in multichannel maps
+            if label_index.multichannel:
+                probabilities_dict = {0: 1}
+            else:
+                probabilities_dict = {
+                    label: count
+                    for label, count in zip(labels.tolist(), counts.tolist())
+                    if label > 0
+                }
+        probabilities = [
+            probabilities_dict.get(label, 0)
+            for label in labels.tolist()
+        ]
+        return np.array(probabilities, dtype=np.float64)
+
+    @staticmethod
+    def sample_centers(table: LabelTable, num_samples: int) -> np.ndarray:
+        labels = torch.multinomial(table.weights, num_samples, replacement=True)
+        labels = labels.numpy()
+        random_numbers = torch.rand(num_samples, dtype=torch.float64).numpy()
+        counts = table.counts[labels]
+        positions = np.minimum(random_numbers * counts, counts - 1)
+        positions = table.offsets[labels] + positions.astype(int)
+        centers = np.unravel_index(table.indices[positions], table.shape)
+        return np.stack(centers, axis=1)
+
+    def get_label_index(self, subject: Subject) -> LabelIndex:
+        image = self.get_probability_map_image(subject)
+        index_path = None
+        if self.persist_index and not subject.history:
+            index_path = get_label_index_path(image.path)
+        if index_path is not None:
+            label_index = read_label_index(index_path, image.path)
+            if label_index is not None:
+                return label_index
+        label_index = get_label_index(image[DATA])
+        if index_path is not None:
+            save_label_index(label_index, index_path)
+        return label_index
+
+
+def get_label_index(label_map: torch.Tensor) -> LabelIndex:
+    """Find the voxels of each label in a label map.
+
+    For single-channel label maps, the voxels are sorted by label with a
+    stable sort, so the volume is traversed only once.
+    """
+    data = label_map.numpy()
+    shape = data.shape[1:]
+    num_voxels = int(np.prod(shape))
+    index_dtype = np.int32 if num_voxels < 2**31 else np.int64
+    multichannel = len(data) > 1
+    if multichannel:
+        channels_indices = [np.flatnonzero(channel) for channel in data]
+        labels = np.arange(len(data))
+        counts = np.array([len(indices) for indices in channels_indices])
+        indices = np.concatenate(channels_indices).astype(index_dtype)
+        present = counts > 0
+        return LabelIndex(
+            labels[present],
+            counts[present],
+            indices,
+            shape,
+            multichannel,
+        )
+    flat = data.ravel()
+    if flat.dtype == bool:
+        flat = flat.view(np.uint8)
+    elif not np.issubdtype(flat.dtype, np.integer):
+        integers = flat.astype(np.int64)
+        if np.array_equal(integers, flat):
+            flat = integers
+    if np.issubdtype(flat.dtype, np.integer):
+        minimum = int(flat.min())
+        labels_range = int(flat.max()) - minimum + 1
+    else:  # labels that are not integers
+        labels_range = None
+    if labels_range is not None and labels_range <= 2**16:
+        # Stable sorting of 16-bit integers uses radix sort
+        keys = (flat - minimum).astype(np.uint16)
+        counts = np.bincount(keys, minlength=labels_range)
+        labels = np.flatnonzero(counts) + minimum
+        counts = counts[counts > 0]
+    else:
+        labels, keys, counts = np.unique(
+            flat,
+            return_inverse=True,
+            return_counts=True,
+        )
+    indices = np.argsort(keys, kind='stable').astype(index_dtype)
+    return LabelIndex(labels, counts, indices, shape, multichannel)
+
+
+def get_label_index_path(path) -> Optional[Path]:
+    if not isinstance(path, (str, Path)):
+        return None
+    path = Path(path)
+    if not path.is_file():
+        return None
+    return path.parent / f'{get_stem(path)}_label_index.npz'
+
+
+def read_label_index(path: Path, label_path: Path) -> Optional[LabelIndex]:
+    """Read a persisted label index.
+
+    Returns ``None`` if the file cannot be read, is corrupt or is older than
+    the label map file.
+    """
+    try:
+        if path.stat().st_mtime < label_path.stat().st_mtime:
+            return None
+        label_index = load_label_index(path)
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+    num_voxels = int(np.prod(label_index.shape))
+    is_valid = (
+        len(label_index.shape) == 3
+        and len(label_index.labels) == len(label_index.counts)
+        and label_index.counts.sum() == len(label_index.indices)
+        and np.all(label_index.indices < num_voxels)
+    )
+    return label_index if is_valid else None
+
+
+def save_label_index(label_index: LabelIndex, path: Path) -> None:
+    """Save a label index, if possible.
+
+    The index is written to a temporary file that is then renamed, so that
+    other processes never read an incomplete file. Errors, e.g. in read-only
+    directories, are ignored, as the index can always be computed again.
+    """
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+                dir=path.parent,
+                prefix=f'.{path.stem}.',
+                suffix='.npz',
+                delete=False,
+                ) as f:
+            temp_path = Path(f.name)
+            np.savez(f, **label_index._asdict())
+        os.replace(temp_path, path)
+    except OSError:
+        if temp_path is not None and temp_path.is_file():
+            temp_path.unlink()
+
+
+def load_label_index(path: Path) -> LabelIndex:
+    with np.load(path) as npz:
+        return LabelIndex(
+            npz['labels'],
+            npz['counts'],
+            npz['indices'],
+            tuple(npz['shape'].tolist()),
+            bool(npz['multichannel']),
+        )
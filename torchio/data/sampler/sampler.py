@@ -59,7 +59,11 @@ class PatchSampler:
         crop_fin = (shape - index_fin).tolist()
         start = ()
         cropping = sum(zip(crop_ini, crop_fin), start)
-        return Crop(cropping)
+        transform = Crop(cropping)
+        # Patches are extracted many times per subject, so their crops are
+        # not added to the history
+        transform.record_history = False
+        return transform
 
 
 class RandomSampler(PatchSampler):
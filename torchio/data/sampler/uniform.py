@@ -2,7 +2,7 @@ import torch
 from ...data.subject import Subject
 from ...torchio import TypePatchSize
 from .sampler import RandomSampler
-from typing import Generator
+from typing import Optional, Generator
 import numpy as np
 
 
@@ -18,7 +18,11 @@ class UniformSampler(RandomSampler):
     def get_probability_map(self, subject: Subject) -> torch.Tensor:
         return torch.ones(1, *subject.spatial_shape)
 
-    def __call__(self, subject: Subject) -> Generator[Subject, None, None]:
+    def __call__(
+            self,
+            subject: Subject,
+            num_patches: Optional[int] = None,
+            ) -> Generator[Subject, None, None]:
         subject.check_consistent_spatial_shape()
 
         if np.any(self.patch_size > subject.spatial_shape):
@@ -29,7 +33,10 @@ class UniformSampler(RandomSampler):
             raise RuntimeError(message)
 
         valid_range = subject.spatial_shape - self.patch_size
-        while True:
+        patches_left = num_patches if num_patches is not None else True
+        while patches_left:
             index_ini = [torch.randint(x + 1, (1,)).item() for x in valid_range]
             index_ini_array = np.asarray(index_ini)
             yield self.extract_patch(subject, index_ini_array)
+            if num_patches is not None:
+                patches_left -= 1
@@ -1,13 +1,31 @@
-from typing import Optional, Tuple, Generator
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional, Tuple, Generator, Hashable, NamedTuple
 
 import torch
 import numpy as np
 
 from ...torchio import TypePatchSize
+from ..image import Image
 from ..subject import Subject
 from .sampler import RandomSampler
 
 
+class AliasTable(NamedTuple):
+    """Sparse representation of a probability map used for sampling.
+
+    Attributes:
+        indices: Flat indices of the voxels with nonzero probability.
+        probabilities: Probability of keeping each column of the table.
+        aliases: Position in :py:attr:`indices` of the alias of each column.
+        shape: Spatial shape of the probability map.
+    """
+    indices: np.ndarray
+    probabilities: np.ndarray
+    aliases: np.ndarray
+    shape: Tuple[int, int, int]
+
+
 class WeightedSampler(RandomSampler):
     r"""Randomly extract patches from a volume given a probability map.
 
@@ -22,6 +40,15 @@ class WeightedSampler(RandomSampler):
         patch_size: See :py:class:`~torchio.data.PatchSampler`.
         probability_map: Name of the image in the input subject that will be
             used as a sampling probability map.
+        cache_size: Maximum number of sampling tables that will be kept in
+            memory. Only the voxels with nonzero probability are stored in a
+            table, with the `alias method
+            <https://en.wikipedia.org/wiki/Alias_method>`_ representation
+            used to draw them in constant time. Tables are indexed by the
+            path of the probability map and the history of the subject, so
+            probability maps that have not been read from a file are never
+            cached. If ``0``, the table is computed every time the sampler is
+            called.
 
     Raises:
         RuntimeError: If the probability map is empty.
@@ -50,10 +77,12 @@ class WeightedSampler(RandomSampler):
             self,
             patch_size: TypePatchSize,
             probability_map: str,
+            cache_size: int = 0,
             ):
         super().__init__(patch_size)
         self.probability_map_name = probability_map
-        self.cdf = None
+        self.cache_size = cache_size
+        self._tables = OrderedDict()
 
     def __call__(
             self,
@@ -67,25 +96,36 @@ class WeightedSampler(RandomSampler):
                 f' larger than image size {tuple(subject.spatial_shape)}'
             )
             raise RuntimeError(message)
-        probability_map = self.get_probability_map(subject)
-        probability_map = self.process_probability_map(probability_map)
-        cdf = self.get_cumulative_distribution_function(probability_map)
+        table = self.get_sampling_table(subject)
+        if num_patches is None:
+            while True:
+                yield from self.extract_patches(subject, table, 1)
+        else:
+            yield from self.extract_patches(subject, table, num_patches)
+
+    def extract_patches(
+            self,
+            subject: Subject,
+            table: NamedTuple,
+            num_patches: int,
+            ) -> Generator[Subject, None, None]:
+        centers = self.sample_centers(table, num_patches)
+        # See self.get_centers_bounds
+        indices_ini = centers - self.patch_size // 2
+        for index_ini in indices_ini:
+            yield self.extract_patch(subject, index_ini)
 
-        patches_left = num_patches if num_patches is not None else True
-        while patches_left:
-            yield self.extract_patch(subject, probability_map, cdf)
-            if num_patches is not None:
-                patches_left -= 1
+    def get_probability_map_image(self, subject: Subject) -> Image:
+        if self.probability_map_name in subject:
+            return subject[self.probability_map_name]
+        message = (
+            f'Image "{self.probability_map_name}"'
+            f' not found in subject subject: {subject}'
+        )
+        raise KeyError(message)
 
     def get_probability_map(self, subject: Subject) -> torch.Tensor:
-        if self.probability_map_name in subject:
-            data = subject[self.probability_map_name].data
-        else:
-            message = (
-                f'Image "{self.probability_map_name}"'
-                f' not found in subject subject: {subject}'
-            )
-            raise KeyError(message)
+        data = self.get_probability_map_image(subject).data
         if torch.any(data < 0):
             message = (
                 'Negative values found'
@@ -94,31 +134,41 @@ class WeightedSampler(RandomSampler):
             raise ValueError(message)
         return data
 
-    def process_probability_map(
+    def get_cache_key(self, subject: Subject) -> Optional[Hashable]:
+        path = self.get_probability_map_image(subject).path
+        if not isinstance(path, (str, Path)):
+            return None
+        # The history is part of the key as transforms might have modified
+        # the probability map after reading it
+        return str(path), repr(subject.history)
+
+    def get_sampling_table(self, subject: Subject) -> NamedTuple:
+        key = None
+        if self.cache_size > 0:
+            key = self.get_cache_key(subject)
+        if key is not None and key in self._tables:
+            self._tables.move_to_end(key)
+            return self._tables[key]
+        table = self.compute_sampling_table(subject)
+        if key is not None:
+            self._tables[key] = table
+            if len(self._tables) > self.cache_size:
+                self._tables.popitem(last=False)
+        return table
+
+    def compute_sampling_table(self, subject: Subject) -> AliasTable:
+        probability_map = self.get_probability_map(subject)
+        return self.process_probability_map(probability_map)
+
+    def get_centers_bounds(
             self,
-            probability_map: torch.Tensor,
-            ) -> np.ndarray:
-        # Using float32 can create cdf with maximum very far from 1, e.g. 0.92!
-        data = probability_map[0].numpy().astype(np.float64)
-        assert data.ndim == 3
-        self.clear_probability_borders(data, self.patch_size)
-        total = data.sum()
-        if total == 0:
-            message = (
-                'Empty probability map found'
-                f' ({self.probability_map_name})'
-            )
-            raise RuntimeError(message)
-        data /= total  # normalize probabilities
-        return data
+            shape: Tuple[int, int, int],
+            ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the bounds of the voxels that can be the center of a patch.
 
-    @staticmethod
-    def clear_probability_borders(
-            probability_map: np.ndarray,
-            patch_size: TypePatchSize,
-            ) -> None:
-        # Set probability to 0 on voxels that wouldn't possibly be sampled given
-        # the current patch size
+        Voxels closer to the borders would not possibly be sampled given the
+        current patch size.
+        """
         # We will arbitrarily define the center of an array with even length
         # using the // Python operator
         # For example, the center of an array (3, 4) will be on (1, 2)
@@ -129,7 +179,7 @@ class WeightedSampler(RandomSampler):
         #  . . . .        . . . .
         #
         #
-        #    Prob. map      After preprocessing
+        #    Prob. map      Valid centers
         #
         #  x x x x x x x       . . . . . . .
         #  x x x x x x x       . . x x x x .
@@ -139,97 +189,92 @@ class WeightedSampler(RandomSampler):
         #  x x x x x x x       . . . . . . .
         #
         # The dots represent removed probabilities, x mark possible locations
-        crop_ini = patch_size // 2
-        crop_fin = (patch_size - 1) // 2
-        crop_i, crop_j, crop_k = crop_ini
-        probability_map[:crop_i, :, :] = 0
-        probability_map[:, :crop_j, :] = 0
-        probability_map[:, :, :crop_k] = 0
-
-        # The call tolist() is very important. Using np.uint16 as negative index
-        # will not work because e.g. -np.uint16(2) == 65534
-        crop_i, crop_j, crop_k = crop_fin.tolist()
-        if crop_i:
-            probability_map[-crop_i:, :, :] = 0
-        if crop_j:
-            probability_map[:, -crop_j:, :] = 0
-        if crop_k:
-            probability_map[:, :, -crop_k:] = 0
-
-    @staticmethod
-    def get_cumulative_distribution_function(
-            probability_map: np.ndarray,
-            ) -> Tuple[np.ndarray, np.ndarray]:
-        """Return the cumulative distribution function of a probability map."""
-        flat_map = probability_map.flatten()
-        flat_map_normalized = flat_map / flat_map.sum()
-        cdf = np.cumsum(flat_map_normalized)
-        return cdf
+        index_ini = self.patch_size // 2
+        index_fin = np.array(shape) - (self.patch_size - 1) // 2
+        return index_ini.astype(int), index_fin.astype(int)
 
-    def extract_patch(
-            self,
-            subject: Subject,
-            probability_map: np.ndarray,
-            cdf: np.ndarray
-            ) -> Subject:
-        index_ini = self.get_random_index_ini(probability_map, cdf)
-        cropped_subject = self.crop(subject, index_ini, self.patch_size)
-        cropped_subject['index_ini'] = index_ini.astype(int)
-        return cropped_subject
-
-    def get_random_index_ini(
+    def process_probability_map(
             self,
-            probability_map: np.ndarray,
-            cdf: np.ndarray
-            ) -> np.ndarray:
-        center = self.sample_probability_map(probability_map, cdf)
-        assert np.all(center >= 0)
-        # See self.clear_probability_borders
-        index_ini = center - self.patch_size // 2
-        assert np.all(index_ini >= 0)
-        return index_ini
-
-    @classmethod
-    def sample_probability_map(
-            cls,
-            probability_map: np.ndarray,
-            cdf: np.ndarray
+            probability_map: torch.Tensor,
+            ) -> AliasTable:
+        data = probability_map[0].numpy()
+        assert data.ndim == 3
+        # Only voxels that can be the center of a patch are considered
+        crop_ini, index_fin = self.get_centers_bounds(data.shape)
+        i0, j0, k0 = crop_ini.tolist()
+        i1, j1, k1 = index_fin.tolist()
+        valid = data[i0:i1, j0:j1, k0:k1]
+        nonzero = np.nonzero(valid)
+        # Using float32 can create cdf with maximum very far from 1, e.g. 0.92!
+        weights = valid[nonzero].astype(np.float64)
+        total = weights.sum()
+        if total == 0:
+            message = (
+                'Empty probability map found'
+                f' ({self.probability_map_name})'
+            )
+            raise RuntimeError(message)
+        centers = np.add(nonzero, crop_ini[:, np.newaxis])
+        indices = np.ravel_multi_index(centers, data.shape)
+        probabilities, aliases = get_alias_table(weights)
+        return AliasTable(indices, probabilities, aliases, data.shape)
+
+    @staticmethod
+    def sample_centers(
+            table: AliasTable,
+            num_samples: int,
             ) -> np.ndarray:
-        """Inverse transform sampling.
-
-        Example:
-            >>> probability_map = np.array(
-            ...    ((0,0,1,1,5,2,1,1,0),
-            ...     (2,2,2,2,2,2,2,2,2)))
-            >>> probability_map
-            array([[0, 0, 1, 1, 5, 2, 1, 1, 0],
-                   [2, 2, 2, 2, 2, 2, 2, 2, 2]])
-            >>> histogram = np.zeros_like(probability_map)
-            >>> for _ in range(100000):
-            ...     histogram[WeightedSampler.sample_probability_map(probability_map, cdf)] += 1  # doctest:+SKIP
-            ...
-            >>> histogram  # doctest:+SKIP
-            array([[    0,     0,  3479,  3478, 17121,  7023,  3355,  3378,     0],
-                   [ 6808,  6804,  6942,  6809,  6946,  6988,  7002,  6826,  7041]])
+        """Draw voxels from a sampling table.
 
+        Returns:
+            Array of shape :math:`(N, 3)` with the indices of the drawn
+            voxels.
         """
-        # Get first value larger than random number
-        random_number = torch.rand(1).item()
-        # If probability map is float32, cdf.max() can be far from 1, e.g. 0.92
-        if random_number > cdf.max():
-            cdf_index = -1
-        else:  # proceed as usual
-            cdf_index = np.searchsorted(cdf, random_number)
-
-        random_location_index = cdf_index
-        center = np.unravel_index(
-            random_location_index,
-            probability_map.shape
-        )
+        num_columns = len(table.indices)
+        random_numbers = torch.rand(2, num_samples, dtype=torch.float64)
+        columns = (random_numbers[0].numpy() * num_columns).astype(int)
+        columns = np.minimum(columns, num_columns - 1)
+        keep = random_numbers[1].numpy() < table.probabilities[columns]
+        positions = np.where(keep, columns, table.aliases[columns])
+        flat_indices = table.indices[positions]
+        centers = np.unravel_index(flat_indices, table.shape)
+        return np.stack(centers, axis=1)
+
 
-        i, j, k = center
-        probability = probability_map[i, j, k]
-        assert probability > 0
+def get_alias_table(weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Build the alias table of a discrete distribution.
 
-        center = np.array(center).astype(int)
-        return center
+    This is a vectorized version of Vose's algorithm. At each iteration, all
+    the columns with probability smaller than one are filled with the
+    columns with larger probability, which might become small themselves.
+
+    Args:
+        weights: 1D array of nonnegative, unnormalized weights.
+
+    Returns:
+        Tuple with the probabilities of keeping each column and the index of
+        its alias.
+    """
+    num_columns = len(weights)
+    scaled = weights * (num_columns / weights.sum())
+    probabilities = np.ones(num_columns)
+    aliases = np.arange(num_columns)
+    small = np.flatnonzero(scaled < 1)
+    large = np.flatnonzero(scaled >= 1)
+    while len(small) and len(large):
+        deficits = np.cumsum(1 - scaled[small])
+        excesses = np.cumsum(scaled[large] - 1)
+        donors = np.searchsorted(excesses, deficits)
+        donors = large[np.minimum(donors, len(large) - 1)]
+        probabilities[small] = scaled[small]
+        aliases[small] = donors
+        donated = np.bincount(
+            donors,
+            weights=1 - scaled[small],
+            minlength=num_columns,
+        )
+        scaled[large] -= donated[large]
+        is_small = scaled[large] < 1
+        small = large[is_small]
+        large = large[~is_small]
+    return probabilities, aliases
@@ -64,13 +64,34 @@ class Subject(dict):
             else:
                 value = copy.deepcopy(value)
             result_dict[key] = value
-        new = Subject(result_dict)
-        new.history = self.history[:]
+        # Bypass __init__ so that subclasses such as datasets are preserved
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        dict.update(new, result_dict)
+        new.update_attributes()
+        new._history = self._history[:]
         return new
 
     def __len__(self):
         return len(self.get_images(intensity_only=False))
 
+    @property
+    def history(self) -> List[Tuple[str, dict]]:
+        """List of transforms applied to the subject and their parameters.
+
+        The parameters are recorded lazily by the transforms and converted to
+        JSON-compatible dictionaries the first time the history is read.
+        """
+        history = self._history
+        for i, (name, parameters) in enumerate(history):
+            if not isinstance(parameters, dict):
+                history[i] = name, parameters.to_dict()
+        return history
+
+    @history.setter
+    def history(self, history: List[Tuple[str, dict]]) -> None:
+        self._history = history
+
     @staticmethod
     def _parse_images(images: List[Tuple[str, Image]]) -> None:
         # Check that it's not empty
@@ -147,7 +168,7 @@ class Subject(dict):
             transform: 'Transform',
             parameters_dict: dict,
             ) -> None:
-        self.history.append((transform.name, parameters_dict))
+        self._history.append((transform.name, parameters_dict))
 
     def load(self):
         """Load images in subject."""
@@ -1,4 +1,4 @@
-from typing import Union, Sequence, List
+from typing import Callable, Union, Sequence, List, Optional
 
 import json
 import torch
@@ -7,8 +7,16 @@ import numpy as np
 from torchvision.transforms import Compose as PyTorchCompose
 
 from ...data.subject import Subject
-from .. import Transform
+from ...torchio import DATA, AFFINE, TYPE, INTENSITY
+from ...utils import gen_seed
+from .. import Transform, SpatialTransform
+from ..resampling import VoxelMapping, resample, compose_voxel_mappings
 from . import RandomTransform, Interpolation
+from .intensity.kspace_transform import KSpaceTransform, add_kspace_artifacts
+
+
+SPATIAL = 'spatial'
+KSPACE = 'kspace'
 
 
 class Compose(Transform):
@@ -18,16 +26,244 @@ class Compose(Transform):
         transforms: Sequence of instances of
             :py:class:`~torchio.transforms.transform.Transform`.
         p: Probability that this transform will be applied.
+        fuse_spatial: If ``True``, consecutive spatial transforms that can be
+            expressed as a mapping between voxel indices, such as
+            :py:class:`~torchio.transforms.RandomAffine`,
+            :py:class:`~torchio.transforms.RandomElasticDeformation`,
+            :py:class:`~torchio.transforms.Resample` or
+            :py:class:`~torchio.transforms.CropOrPad`, are composed so that
+            each image is resampled only once, using
+            :func:`torch.nn.functional.grid_sample`. Intensity images are
+            interpolated as specified by the first transform of each
+            sequence, and label maps use nearest neighbor interpolation.
+            Points that fall outside the input grid of a transform are filled
+            as specified by that transform. The parameters of each transform
+            are still stored in the subject history. Transforms are
+            applied one by one if the images in the subject do not share the
+            same spatial shape and affine matrix.
+        fuse_kspace: If ``True``, consecutive transforms that simulate
+            artifacts in :math:`k`-space, i.e.
+            :py:class:`~torchio.transforms.RandomMotion`,
+            :py:class:`~torchio.transforms.RandomGhosting` and
+            :py:class:`~torchio.transforms.RandomSpike`, are applied computing
+            a single forward and inverse Fourier transform per channel. The
+            parameters of each transform are still stored in the subject
+            history.
 
     .. note::
         This is a thin wrapper of :py:class:`torchvision.transforms.Compose`.
     """
-    def __init__(self, transforms: Sequence[Transform], p: float = 1):
+    def __init__(
+            self,
+            transforms: Sequence[Transform],
+            p: float = 1,
+            fuse_spatial: bool = False,
+            fuse_kspace: bool = False,
+            ):
         super().__init__(p=p)
         self.transform = PyTorchCompose(transforms)
+        self.fuse_spatial = fuse_spatial
+        self.fuse_kspace = fuse_kspace
 
     def apply_transform(self, subject: Subject):
-        return self.transform(subject)
+        if not self.fuse_spatial and not self.fuse_kspace:
+            return self.transform(subject)
+        fusable = []
+        fusion = None
+        for transform in self.transform.transforms:
+            transform_fusion = self.get_fusion(transform)
+            if transform_fusion is not None and transform_fusion == fusion:
+                fusable.append(transform)
+                continue
+            subject = self.apply_fusion(subject, fusable, fusion)
+            fusion = transform_fusion
+            if fusion is None:
+                fusable = []
+                subject = transform(subject)
+            else:
+                fusable = [transform]
+        return self.apply_fusion(subject, fusable, fusion)
+
+    def get_fusion(self, transform: Transform) -> Optional[str]:
+        is_spatial = (
+            self.fuse_spatial
+            and isinstance(transform, SpatialTransform)
+            and transform.is_fusable()
+        )
+        if is_spatial:
+            return SPATIAL
+        if self.fuse_kspace and isinstance(transform, KSpaceTransform):
+            return KSPACE
+        return None
+
+    def apply_fusion(
+            self,
+            subject: Subject,
+            transforms: List[Transform],
+            fusion: Optional[str],
+            ) -> Subject:
+        if fusion == KSPACE:
+            return self.apply_kspace_fused(subject, transforms)
+        return self.apply_fused(subject, transforms)
+
+    def apply_batch_transform(self, batch: dict) -> dict:
+        for transform in self.transform.transforms:
+            batch = transform.transform_batch(batch)
+        return batch
+
+    def apply_fused(
+            self,
+            subject: Subject,
+            transforms: List[SpatialTransform],
+            ) -> Subject:
+        """Apply a sequence of spatial transforms with one resampling."""
+        if len(transforms) < 2 or not self.has_shared_grid(subject):
+            for transform in transforms:
+                subject = transform(subject)
+            return subject
+
+        first_image = subject.get_first_image()
+        shape, affine = first_image.spatial_shape, first_image[AFFINE]
+        applied = []
+        mappings = []
+        for transform in transforms:
+            mapping = self.get_voxel_mapping(transform, shape, affine)
+            if mapping is None:  # not applied because of its probability
+                continue
+            applied.append(transform)
+            mappings.append(mapping)
+            shape, affine = mapping.shape, mapping.affine
+        if not mappings:
+            return subject
+
+        coordinates, masks = compose_voxel_mappings(mappings)
+        interpolation = self.get_interpolation(applied)
+        for image in subject.get_images(intensity_only=False):
+            tensor = image[DATA]
+            if image[TYPE] == INTENSITY:
+                image_interpolation = interpolation
+            else:
+                image_interpolation = Interpolation.NEAREST
+            default_value = self.get_default_value(mappings[0], tensor)
+            resampled = resample(
+                tensor,
+                coordinates,
+                image_interpolation,
+                default_value=default_value,
+            )
+            # Points outside the input grid of each transform are filled as
+            # that transform would fill them, so later transforms take
+            # precedence over earlier ones
+            for mapping, mask in zip(mappings[1:], masks[1:]):
+                if mask is None:
+                    continue
+                default_value = self.get_default_value(mapping, tensor)
+                default_value = default_value.reshape(-1, 1, 1, 1)
+                resampled = torch.where(mask, resampled, default_value)
+            image[DATA] = resampled
+            image[AFFINE] = mappings[-1].affine
+        for transform, mapping in zip(applied, mappings):
+            if not transform.record_history:
+                continue
+            for sub_transform in mapping.sub_transforms:
+                sub_transform._store_params()
+                subject.add_transform(
+                    sub_transform,
+                    sub_transform.transform_params,
+                )
+            subject.add_transform(transform, transform.transform_params)
+        return subject
+
+    def apply_kspace_fused(
+            self,
+            subject: Subject,
+            transforms: List[KSpaceTransform],
+            ) -> Subject:
+        """Apply a sequence of k-space transforms with one Fourier transform
+        per channel."""
+        if len(transforms) < 2:
+            for transform in transforms:
+                subject = transform(subject)
+            return subject
+
+        images = subject.get_images(intensity_only=True)
+        applied = []
+        parameters = []
+        for transform in transforms:
+            images_parameters = self.sample_parameters(
+                transform,
+                lambda: [transform.get_kspace_params(im) for im in images],
+            )
+            if images_parameters is None:  # not applied
+                continue
+            applied.append(transform)
+            parameters.append(images_parameters)
+        for i, image in enumerate(images):
+            image_parameters = [p[i] for p in parameters]
+            image[DATA] = add_kspace_artifacts(image, applied, image_parameters)
+        for transform in applied:
+            if transform.record_history:
+                subject.add_transform(transform, transform.transform_params)
+        return subject
+
+    @staticmethod
+    def get_voxel_mapping(
+            transform: SpatialTransform,
+            shape,
+            affine,
+            ) -> Optional[VoxelMapping]:
+        return Compose.sample_parameters(
+            transform,
+            lambda: transform.get_voxel_mapping(shape, affine),
+        )
+
+    @staticmethod
+    def sample_parameters(transform: Transform, function: Callable):
+        """Return the result of the function, or ``None`` if the transform is
+        not applied because of its probability."""
+        # Follow the same steps as Transform.__call__ so that the random
+        # parameters and the history match those of the unfused transforms
+        is_random = isinstance(transform, RandomTransform)
+        if is_random:
+            seed = gen_seed()
+            torch_rng_state = torch.random.get_rng_state()
+            torch.manual_seed(seed=seed)
+            transform.seed = seed
+        if transform.record_history:
+            transform._store_params()
+        result = None
+        if torch.rand(1).item() <= transform.probability:
+            result = function()
+        if is_random:
+            torch.random.set_rng_state(torch_rng_state)
+        return result
+
+    @staticmethod
+    def has_shared_grid(subject: Subject) -> bool:
+        images = subject.get_images(intensity_only=False)
+        first_image = images[0]
+        for image in images[1:]:
+            if image.spatial_shape != first_image.spatial_shape:
+                return False
+            if not np.allclose(image[AFFINE], first_image[AFFINE]):
+                return False
+        return True
+
+    @staticmethod
+    def get_interpolation(transforms: List[SpatialTransform]) -> Interpolation:
+        for transform in transforms:
+            interpolation = getattr(transform, 'interpolation', None)
+            if interpolation is not None:
+                return interpolation
+        return Interpolation.LINEAR
+
+    @staticmethod
+    def get_default_value(
+            mapping: VoxelMapping,
+            tensor: torch.Tensor,
+            ) -> torch.Tensor:
+        """Return the default value of a mapping for each channel."""
+        return SpatialTransform.get_batch_default_value(mapping, tensor)
 
 
 class OneOf(RandomTransform):
@@ -0,0 +1,113 @@
+from typing import Any, List, Optional, Sequence
+
+import torch
+import numpy as np
+
+from ....torchio import DATA
+from ....data.image import Image
+from ....data.subject import Subject
+from ... import IntensityTransform
+from .. import RandomTransform
+from ..random_transform import SPATIAL_AXES
+
+
+class KSpaceTransform(RandomTransform, IntensityTransform):
+    """Base class for transforms that simulate MRI artifacts in k-space.
+
+    Subclasses sample the parameters of each channel in
+    :meth:`get_kspace_params` and modify the spectrum of the channel in
+    :meth:`transform_spectrum`. This allows
+    :py:class:`~torchio.transforms.Compose` to apply a sequence of
+    :math:`k`-space transforms computing a single forward and inverse Fourier
+    transform per channel.
+    """
+    def apply_transform(self, subject: Subject) -> Subject:
+        for image in self.get_images(subject):
+            parameters = self.get_kspace_params(image)
+            image[DATA] = add_kspace_artifacts(image, [self], [parameters])
+        return subject
+
+    def get_kspace_params(self, image: Image) -> List[Any]:
+        """Sample the parameters for each channel of an image."""
+        raise NotImplementedError
+
+    def has_artifact(self, parameters: Any) -> bool:
+        """Return ``False`` if the parameters leave the spectrum unchanged."""
+        return True
+
+    def transform_spectrum(
+            self,
+            spectrum: np.ndarray,
+            parameters: Any,
+            array: Optional[np.ndarray] = None,
+            ) -> np.ndarray:
+        """Add the artifact to a centered spectrum.
+
+        Args:
+            spectrum: Spectrum of one channel, as returned by
+                :meth:`fourier_transform`. It may be modified in place.
+            parameters: Parameters of the channel, as returned by
+                :meth:`get_kspace_params`.
+            array: Channel in image space, if it is available without
+                computing the inverse transform of the spectrum.
+        """
+        raise NotImplementedError
+
+
+def add_kspace_artifacts(
+        image: Image,
+        transforms: Sequence[KSpaceTransform],
+        parameters: Sequence[List[Any]],
+        ) -> torch.Tensor:
+    """Apply a sequence of :math:`k`-space transforms to an image.
+
+    Each channel is transformed to :math:`k`-space once, modified by all the
+    transforms and transformed back once.
+
+    Args:
+        image: Intensity image.
+        transforms: Transforms in the order in which they are applied.
+        parameters: Parameters of each transform for each channel of the
+            image.
+    """
+    channels = []
+    for channel_index, tensor in enumerate(image[DATA]):
+        channel_transforms = []
+        for transform, transform_parameters in zip(transforms, parameters):
+            channel_parameters = transform_parameters[channel_index]
+            if transform.has_artifact(channel_parameters):
+                channel_transforms.append((transform, channel_parameters))
+        if not channel_transforms:
+            channels.append(tensor)
+            continue
+        array = tensor.numpy()
+        spectrum = RandomTransform.fourier_transform(array)
+        for transform, channel_parameters in channel_transforms:
+            if array is None:
+                # Each transform returns a real image, so the imaginary part
+                # generated by the previous one is discarded
+                spectrum = get_real_spectrum(spectrum)
+            spectrum = transform.transform_spectrum(
+                spectrum,
+                channel_parameters,
+                array=array,
+            )
+            array = None  # the spectrum does not match the input anymore
+        result = np.real(RandomTransform.inv_fourier_transform(spectrum))
+        channels.append(torch.from_numpy(result.astype(np.float32)))
+    return torch.stack(channels)
+
+
+def get_real_spectrum(spectrum: np.ndarray) -> np.ndarray:
+    r"""Compute the centered spectrum of the real part of an image.
+
+    The spectrum of the real part is the Hermitian part of the spectrum,
+    :math:`\frac{1}{2}(F(k) + \overline{F(-k)})`, so no Fourier transforms are
+    needed.
+    """
+    reflected = np.flip(spectrum, axis=SPATIAL_AXES)
+    # After fftshift, the frequency zero is at index n // 2, so the reflection
+    # must be shifted by one voxel along axes of even length
+    shifts = [1 - size % 2 for size in spectrum.shape[-3:]]
+    reflected = np.roll(reflected, shifts, axis=SPATIAL_AXES)
+    return (spectrum + reflected.conj()) / 2
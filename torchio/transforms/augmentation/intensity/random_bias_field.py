@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Union, Tuple, Optional, List
 import numpy as np
 import torch
@@ -58,6 +59,17 @@ class RandomBiasField(RandomTransform, IntensityTransform):
             image_dict[DATA] = image_dict[DATA] * torch.from_numpy(bias_field)
         return subject
 
+    def apply_batch_transform(self, batch: dict) -> dict:
+        for image_dict in self.get_batch_images_dict(batch).values():
+            data = image_dict[DATA]
+            num_coefficients = len(list(self.get_exponents(self.order)))
+            coefficients = torch.empty(len(data), num_coefficients)
+            coefficients.uniform_(*self.coefficients_range)
+            bias_fields = self.generate_bias_fields(
+                data.shape[2:], self.order, coefficients)
+            image_dict[DATA] = data * bias_fields[:, np.newaxis]
+        return batch
+
     @staticmethod
     def get_params(
             order: int,
@@ -81,33 +93,52 @@ class RandomBiasField(RandomTransform, IntensityTransform):
             ) -> np.ndarray:
         # Create the bias field map using a linear combination of polynomial
         # functions and the coefficients previously sampled
-        shape = np.array(data.shape[1:])  # first axis is channels
-        half_shape = shape / 2
+        shape = data.shape[1:]  # first axis is channels
+        coefficients = torch.as_tensor(np.asarray(coefficients)[np.newaxis])
+        bias_field = RandomBiasField.generate_bias_fields(
+            shape, order, coefficients)
+        return bias_field[0].numpy()
 
-        ranges = [np.arange(-n, n) for n in half_shape]
+    @staticmethod
+    def generate_bias_fields(
+            shape: Tuple[int, int, int],
+            order: int,
+            coefficients: torch.Tensor,
+            ) -> torch.Tensor:
+        """Create one bias field for each row of coefficients.
 
-        bias_field = np.zeros(shape)
-        x_mesh, y_mesh, z_mesh = np.asarray(np.meshgrid(*ranges))
+        The polynomials are separable, so they are evaluated one axis at a
+        time from the polynomials of the normalized coordinates along each
+        axis, in single precision.
 
-        x_mesh /= x_mesh.max()
-        y_mesh /= y_mesh.max()
-        z_mesh /= z_mesh.max()
+        Args:
+            shape: Spatial shape :math:`(W, H, D)` of the bias fields.
+            order: Order of the basis polynomial functions.
+            coefficients: Tensor of shape :math:`(B, N)`, where :math:`N` is
+                the number of basis functions.
 
-        i = 0
+        Returns:
+            Tensor of shape :math:`(B, W, H, D)`.
+        """
+        coefficients = torch.as_tensor(coefficients, dtype=torch.float32)
+        num_orders = order + 1
+        dense_shape = len(coefficients), num_orders, num_orders, num_orders
+        dense = torch.zeros(dense_shape)
+        exponents = torch.tensor(list(RandomBiasField.get_exponents(order)))
+        x_orders, y_orders, z_orders = exponents.T
+        dense[:, x_orders, y_orders, z_orders] = coefficients
+        x, y, z = (get_polynomials(size, order) for size in shape)
+        bias_field = torch.einsum('nabc,kc->nabk', dense, z)
+        bias_field = torch.einsum('nabk,jb->najk', bias_field, y)
+        bias_field = torch.einsum('najk,ia->nijk', bias_field, x)
+        return bias_field.exp_()
+
+    @staticmethod
+    def get_exponents(order: int):
         for x_order in range(order + 1):
             for y_order in range(order + 1 - x_order):
                 for z_order in range(order + 1 - (x_order + y_order)):
-                    random_coefficient = coefficients[i]
-                    new_map = (
-                        random_coefficient
-                        * x_mesh ** x_order
-                        * y_mesh ** y_order
-                        * z_mesh ** z_order
-                    )
-                    bias_field += np.transpose(new_map, (1, 0, 2))  # why?
-                    i += 1
-        bias_field = np.exp(bias_field).astype(np.float32)
-        return bias_field
+                    yield x_order, y_order, z_order
 
     @staticmethod
     def parse_order(order):
@@ -116,3 +147,17 @@ class RandomBiasField(RandomTransform, IntensityTransform):
         if order < 0:
             raise ValueError(f'Ordre must be a positive int, not {order}')
         return order
+
+
+@lru_cache(maxsize=16)
+def get_polynomials(size: int, order: int) -> torch.Tensor:
+    r"""Powers of the normalized coordinates along one axis.
+
+    The returned tensor has shape :math:`(\text{size}, \text{order} + 1)`.
+    It is cached and must not be modified.
+    """
+    half_size = size / 2
+    coordinates = np.arange(-half_size, half_size)
+    coordinates /= coordinates.max()
+    powers = coordinates[:, np.newaxis] ** np.arange(order + 1)
+    return torch.from_numpy(powers).float()
@@ -1,10 +1,10 @@
 from typing import Union, Tuple, Optional, List
 import torch
 import numpy as np
-import scipy.ndimage as ndi
 from ....torchio import DATA, TypeData, TypeTripletFloat, TypeSextetFloat
 from ....data.subject import Subject
 from ... import IntensityTransform
+from ...smoothing import gaussian_filter
 from .. import RandomTransform
 
 
@@ -36,21 +36,10 @@ class RandomBlur(RandomTransform, IntensityTransform):
         self.std_ranges = self.parse_params(std, None, 'std', min_constraint=0)
 
     def apply_transform(self, subject: Subject) -> Subject:
-        random_parameters_images_dict = {}
-        for image_name, image in self.get_images_dict(subject).items():
-            transformed_tensors = []
-            for channel_idx, tensor in enumerate(image[DATA]):
-                std = self.get_params(self.std_ranges)
-                random_parameters_dict = {'std': std}
-                key = f'{image_name}_channel_{channel_idx}'
-                random_parameters_images_dict[key] = random_parameters_dict
-                transformed_tensor = blur(
-                    tensor,
-                    image.spacing,
-                    std,
-                )
-                transformed_tensors.append(transformed_tensor)
-            image[DATA] = torch.stack(transformed_tensors)
+        for image in self.get_images(subject):
+            stds = [self.get_params(self.std_ranges) for _ in image[DATA]]
+            stds_voxel = np.array(stds) / np.array(image.spacing)
+            image[DATA] = gaussian_filter(image[DATA], stds_voxel)
         return subject
 
     def get_params(self, std_ranges: TypeSextetFloat) -> TypeTripletFloat:
@@ -61,10 +50,9 @@ class RandomBlur(RandomTransform, IntensityTransform):
 def blur(
         data: TypeData,
         spacing: TypeTripletFloat,
-        std_voxel: TypeTripletFloat,
+        std_physical: TypeTripletFloat,
         ) -> torch.Tensor:
     assert data.ndim == 3
-    std_physical = np.array(std_voxel) / np.array(spacing)
-    blurred = ndi.gaussian_filter(data, std_physical)
-    tensor = torch.from_numpy(blurred)
-    return tensor
+    std_voxel = np.array(std_physical) / np.array(spacing)
+    tensor = torch.as_tensor(data)[np.newaxis]
+    return gaussian_filter(tensor, std_voxel)[0]
@@ -57,21 +57,31 @@ class RandomGamma(RandomTransform, IntensityTransform):
             gamma = self.get_params(self.log_gamma_range)
             random_parameters_dict = {'gamma': gamma}
             random_parameters_images_dict[image_name] = random_parameters_dict
-            if torch.any(image_dict[DATA] < 0):
-                message = (
-                    'Negative values found in input tensor. See the'
-                    ' documentation for more details on the implemented'
-                    ' workaround:'
-                    ' https://torchio.readthedocs.io/transforms/augmentation.html#randomgamma'
-                )
-                warnings.warn(message)
-                data = image_dict[DATA]
-                image_dict[DATA] = data.sign() * data.abs() ** gamma
-            else:
-                image_dict[DATA] = image_dict[DATA] ** gamma
+            image_dict[DATA] = power(image_dict[DATA], gamma)
         return subject
 
+    def apply_batch_transform(self, batch: dict) -> dict:
+        for image_dict in self.get_batch_images_dict(batch).values():
+            data = image_dict[DATA]
+            shape = len(data), 1, 1, 1, 1
+            gamma = torch.empty(shape).uniform_(*self.log_gamma_range).exp()
+            image_dict[DATA] = power(data, gamma)
+        return batch
+
     @staticmethod
     def get_params(log_gamma_range: Tuple[float, float]) -> torch.Tensor:
         gamma = torch.FloatTensor(1).uniform_(*log_gamma_range).exp()
         return gamma
+
+
+def power(tensor: torch.Tensor, gamma: torch.Tensor) -> torch.Tensor:
+    if torch.any(tensor < 0):
+        message = (
+            'Negative values found in input tensor. See the'
+            ' documentation for more details on the implemented'
+            ' workaround:'
+            ' https://torchio.readthedocs.io/transforms/augmentation.html#randomgamma'
+        )
+        warnings.warn(message)
+        return tensor.sign() * tensor.abs() ** gamma
+    return tensor ** gamma
@@ -2,12 +2,12 @@ from typing import Tuple, Optional, Union, List
 import torch
 import numpy as np
 from ....torchio import DATA
+from ....data.image import Image
 from ....data.subject import Subject
-from ... import IntensityTransform
-from .. import RandomTransform
+from .kspace_transform import KSpaceTransform
 
 
-class RandomGhosting(RandomTransform, IntensityTransform):
+class RandomGhosting(KSpaceTransform):
     r"""Add random MRI ghosting artifact.
 
     Discrete "ghost" artifacts may occur along the phase-encode direction
@@ -83,37 +83,20 @@ class RandomGhosting(RandomTransform, IntensityTransform):
         return restore
 
     def apply_transform(self, subject: Subject) -> Subject:
-        random_parameters_images_dict = {}
         if any(isinstance(n, str) for n in self.axes):
             subject.check_consistent_orientation()
-        for image_name, image in self.get_images_dict(subject).items():
-            transformed_tensors = []
-            is_2d = image.is_2d()
-            axes = [a for a in self.axes if a != 2] if is_2d else self.axes
-            for channel_idx, tensor in enumerate(image[DATA]):
-                params = self.get_params(
-                    self.num_ghosts_range,
-                    axes,
-                    self.intensity_range,
-                )
-                num_ghosts_param, axis_param, intensity_param = params
-                random_parameters_dict = {
-                    'axis': axis_param,
-                    'num_ghosts': num_ghosts_param,
-                    'intensity': intensity_param,
-                }
-                key = f'{image_name}_channel_{channel_idx}'
-                random_parameters_images_dict[key] = random_parameters_dict
-                transformed_tensor = self.add_artifact(
-                    tensor,
-                    num_ghosts_param,
-                    axis_param,
-                    intensity_param,
-                    self.restore,
-                )
-                transformed_tensors.append(transformed_tensor)
-            image[DATA] = torch.stack(transformed_tensors)
-        return subject
+        return super().apply_transform(subject)
+
+    def get_kspace_params(self, image: Image) -> List[Tuple]:
+        axes = [a for a in self.axes if a != 2] if image.is_2d() else self.axes
+        return [
+            self.get_params(self.num_ghosts_range, axes, self.intensity_range)
+            for _ in image[DATA]
+        ]
+
+    def has_artifact(self, parameters: Tuple) -> bool:
+        num_ghosts, _, intensity = parameters
+        return bool(num_ghosts and intensity)
 
     @staticmethod
     def get_params(
@@ -127,23 +110,16 @@ class RandomGhosting(RandomTransform, IntensityTransform):
         intensity = torch.FloatTensor(1).uniform_(*intensity_range).item()
         return num_ghosts, axis, intensity
 
-    def add_artifact(
+    def transform_spectrum(
             self,
-            tensor: torch.Tensor,
-            num_ghosts: int,
-            axis: int,
-            intensity: float,
-            restore_center: float,
-            ):
-        if not num_ghosts or not intensity:
-            return tensor
-
-        array = tensor.numpy()
-        spectrum = self.fourier_transform(array)
-
-        shape = np.array(array.shape)
-        ri, rj, rk = np.round(restore_center * shape).astype(np.uint16)
-        mi, mj, mk = np.array(array.shape) // 2
+            spectrum: np.ndarray,
+            parameters: Tuple,
+            array: Optional[np.ndarray] = None,
+            ) -> np.ndarray:
+        num_ghosts, axis, intensity = parameters
+        shape = np.array(spectrum.shape)
+        ri, rj, rk = np.round(self.restore * shape).astype(np.uint16)
+        mi, mj, mk = shape // 2
 
         # Variable "planes" is the part of the spectrum that will be modified
         if axis == 0:
@@ -166,7 +142,4 @@ class RandomGhosting(RandomTransform, IntensityTransform):
             spectrum[:, mj, :] = restore
         elif axis == 2:
             spectrum[:, :, mk] = restore
-
-        array_ghosts = self.inv_fourier_transform(spectrum)
-        array_ghosts = np.real(array_ghosts)
-        return torch.from_numpy(array_ghosts)
+        return spectrum
@@ -191,7 +191,8 @@ class RandomLabelsToImage(RandomTransform, IntensityTransform):
         random_parameters_images_dict = {'mean': [], 'std': []}
         original_image = subject.get(self.image_key)
 
-        label_map = subject[self.label_key][DATA]
+        # Clone as the label map is modified in place below
+        label_map = subject[self.label_key][DATA].clone()
         affine = subject[self.label_key][AFFINE]
 
         spatial_shape = label_map.shape[1:]
@@ -12,14 +12,19 @@ import torch
 import numpy as np
 import SimpleITK as sitk
 from ....utils import nib_to_sitk
-from ....torchio import DATA, AFFINE
-from ....data.subject import Subject
+from ....torchio import DATA, AFFINE, TypeTripletFloat
+from ....data.image import Image
 from .. import Interpolation, get_sitk_interpolator
-from ... import IntensityTransform
-from .. import RandomTransform
+from ...resampling import (
+    FLIP_XY_4,
+    resample,
+    get_affine_coordinates,
+    get_sitk_transform_matrix,
+)
+from .kspace_transform import KSpaceTransform
 
 
-class RandomMotion(RandomTransform, IntensityTransform):
+class RandomMotion(KSpaceTransform):
     r"""Add random MRI motion artifact.
 
     Magnetic resonance images suffer from motion artifacts when the subject
@@ -45,6 +50,11 @@ class RandomMotion(RandomTransform, IntensityTransform):
         num_transforms: Number of simulated movements.
             Larger values generate more distorted images.
         image_interpolation: See :ref:`Interpolation`.
+        backend: If ``'sitk'``, the moved images are computed using
+            SimpleITK. If ``'torch'``, they are computed with
+            :func:`torch.nn.functional.grid_sample`, without converting each
+            channel to a :class:`SimpleITK.Image`. Only ``'linear'`` and
+            ``'nearest'`` interpolation are supported by the torch backend.
         p: Probability that this transform will be applied.
         seed: See :py:class:`~torchio.transforms.augmentation.RandomTransform`.
         keys: See :py:class:`~torchio.transforms.Transform`.
@@ -58,6 +68,7 @@ class RandomMotion(RandomTransform, IntensityTransform):
             translation: float = 10,  # in mm
             num_transforms: int = 2,
             image_interpolation: str = 'linear',
+            backend: str = 'sitk',
             p: float = 1,
             keys: Optional[List[str]] = None,
             ):
@@ -72,46 +83,65 @@ class RandomMotion(RandomTransform, IntensityTransform):
             raise ValueError(message)
         self.num_transforms = num_transforms
         self.interpolation = self.parse_interpolation(image_interpolation)
+        self.backend = self.parse_backend(backend, self.interpolation)
 
-    def apply_transform(self, subject: Subject) -> Subject:
-        random_parameters_images_dict = {}
-        for image_name, image in self.get_images_dict(subject).items():
-            result_arrays = []
-            for channel_idx, data in enumerate(image[DATA]):
-                params = self.get_params(
-                    self.degrees_range,
-                    self.translation_range,
-                    self.num_transforms,
-                    is_2d=image.is_2d(),
-                )
-                times_params, degrees_params, translation_params = params
-                random_parameters_dict = {
-                    'times': times_params,
-                    'degrees': degrees_params,
-                    'translation': translation_params,
-                }
-                key = f'{image_name}_channel_{channel_idx}'
-                random_parameters_images_dict[key] = random_parameters_dict
-                sitk_image = nib_to_sitk(
-                    data[np.newaxis],
-                    image[AFFINE],
-                    force_3d=True,
-                )
-                transforms = self.get_rigid_transforms(
-                    degrees_params,
-                    translation_params,
-                    sitk_image,
-                )
-                data = self.add_artifact(
-                    sitk_image,
-                    transforms,
-                    times_params,
-                    self.interpolation,
-                )
-                result_arrays.append(data)
-            result = np.stack(result_arrays)
-            image[DATA] = torch.from_numpy(result)
-        return subject
+    def get_kspace_params(self, image: Image) -> List[Tuple]:
+        parameters = []
+        for _ in image[DATA]:
+            params = self.get_params(
+                self.degrees_range,
+                self.translation_range,
+                self.num_transforms,
+                is_2d=image.is_2d(),
+            )
+            parameters.append((*params, image[AFFINE]))
+        return parameters
+
+    def transform_spectrum(
+            self,
+            spectrum: np.ndarray,
+            parameters: Tuple,
+            array: Optional[np.ndarray] = None,
+            ) -> np.ndarray:
+        times_params, degrees_params, translation_params, affine = parameters
+        if array is None:
+            array = np.real(self.inv_fourier_transform(spectrum))
+            array = array.astype(np.float32)
+        if self.backend == 'torch':
+            center_lps = self.get_center_lps(array.shape, affine)
+            transforms = self.get_rigid_transforms_around(
+                degrees_params,
+                translation_params,
+                center_lps,
+            )
+            arrays = self.resample_arrays_torch(
+                torch.from_numpy(array),
+                affine,
+                transforms,
+                self.interpolation,
+            )
+        else:
+            sitk_image = nib_to_sitk(
+                torch.from_numpy(array)[np.newaxis],
+                affine,
+                force_3d=True,
+            )
+            transforms = self.get_rigid_transforms(
+                degrees_params,
+                translation_params,
+                sitk_image,
+            )
+            images = self.resample_images(
+                sitk_image,
+                transforms,
+                self.interpolation,
+            )
+            arrays = [sitk.GetArrayViewFromImage(im) for im in images[1:]]
+            arrays = [array.transpose() for array in arrays]  # ITK to NumPy
+        # The spectrum of the first (identity) position is already known
+        spectra = [spectrum]
+        spectra.extend(self.fourier_transform(array) for array in arrays)
+        return self.combine_spectra(spectra, times_params)
 
     @staticmethod
     def get_params(
@@ -145,6 +175,27 @@ class RandomMotion(RandomTransform, IntensityTransform):
             ) -> List[sitk.Euler3DTransform]:
         center_ijk = np.array(image.GetSize()) / 2
         center_lps = image.TransformContinuousIndexToPhysicalPoint(center_ijk)
+        return self.get_rigid_transforms_around(
+            degrees_params,
+            translation_params,
+            center_lps,
+        )
+
+    @staticmethod
+    def get_center_lps(
+            shape: Tuple[int, int, int],
+            affine: np.ndarray,
+            ) -> TypeTripletFloat:
+        center_ijk = np.array(shape) / 2
+        center_lps = FLIP_XY_4 @ affine @ np.append(center_ijk, 1)
+        return tuple(center_lps[:3].tolist())
+
+    def get_rigid_transforms_around(
+            self,
+            degrees_params: np.ndarray,
+            translation_params: np.ndarray,
+            center_lps: TypeTripletFloat,
+            ) -> List[sitk.Euler3DTransform]:
         identity = np.eye(4)
         matrices = [identity]
         for degrees, translation in zip(degrees_params, translation_params):
@@ -205,17 +256,36 @@ class RandomMotion(RandomTransform, IntensityTransform):
             index = num_spectra - 1
         spectra[0], spectra[index] = spectra[index], spectra[0]
 
-    def add_artifact(
-            self,
-            image: sitk.Image,
+    @staticmethod
+    def resample_arrays_torch(
+            tensor: torch.Tensor,
+            affine: np.ndarray,
             transforms: List[sitk.Euler3DTransform],
-            times: np.ndarray,
             interpolation: Interpolation,
-            ):
-        images = self.resample_images(image, transforms, interpolation)
-        arrays = [sitk.GetArrayViewFromImage(im) for im in images]
-        arrays = [array.transpose() for array in arrays]  # ITK to NumPy
-        spectra = [self.fourier_transform(array) for array in arrays]
+            ) -> List[np.ndarray]:
+        default_value = tensor.min().item()
+        arrays = []
+        for transform in transforms[1:]:  # first is identity
+            coordinates = get_affine_coordinates(
+                tensor.shape,
+                affine,
+                affine,
+                transform_matrix=get_sitk_transform_matrix(transform),
+            )
+            resampled = resample(
+                tensor[np.newaxis],
+                coordinates,
+                interpolation,
+                default_value=default_value,
+            )
+            arrays.append(resampled[0].numpy())
+        return arrays
+
+    def combine_spectra(
+            self,
+            spectra: List[np.ndarray],
+            times: np.ndarray,
+            ) -> np.ndarray:
         self.sort_spectra(spectra, times)
         result_spectrum = np.empty_like(spectra[0])
         last_index = result_spectrum.shape[2]
@@ -225,8 +295,7 @@ class RandomMotion(RandomTransform, IntensityTransform):
         for spectrum, fin in zip(spectra, indices):
             result_spectrum[..., ini:fin] = spectrum[..., ini:fin]
             ini = fin
-        result_image = np.real(self.inv_fourier_transform(result_spectrum))
-        return result_image.astype(np.float32)
+        return result_spectrum
 
 
 def get_params_array(nums_range: Tuple[float, float], num_transforms: int):
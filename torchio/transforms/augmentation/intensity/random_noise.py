@@ -48,6 +48,15 @@ class RandomNoise(RandomTransform, IntensityTransform):
             image_dict[DATA] = add_noise(image_dict[DATA], mean, std)
         return subject
 
+    def apply_batch_transform(self, batch: dict) -> dict:
+        for image_dict in self.get_batch_images_dict(batch).values():
+            data = image_dict[DATA]
+            shape = len(data), 1, 1, 1, 1
+            mean = torch.empty(shape).uniform_(*self.mean_range)
+            std = torch.empty(shape).uniform_(*self.std_range)
+            image_dict[DATA] = add_noise(data, mean, std)
+        return batch
+
     @staticmethod
     def get_params(
             mean_range: Tuple[float, float],
@@ -58,7 +67,11 @@ class RandomNoise(RandomTransform, IntensityTransform):
         return mean, std
 
 
-def add_noise(tensor: torch.Tensor, mean: float, std: float) -> torch.Tensor:
+def add_noise(
+        tensor: torch.Tensor,
+        mean: Union[float, torch.Tensor],
+        std: Union[float, torch.Tensor],
+        ) -> torch.Tensor:
     noise = torch.randn(*tensor.shape) * std + mean
     tensor = tensor + noise
     return tensor
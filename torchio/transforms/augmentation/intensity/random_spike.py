@@ -2,12 +2,11 @@ from typing import Tuple, Optional, Union, List
 import torch
 import numpy as np
 from ....torchio import DATA
-from ....data.subject import Subject
-from ... import IntensityTransform
-from .. import RandomTransform
+from ....data.image import Image
+from .kspace_transform import KSpaceTransform
 
 
-class RandomSpike(RandomTransform, IntensityTransform):
+class RandomSpike(KSpaceTransform):
     r"""Add random MRI spike artifacts.
 
     Also known as `Herringbone artifact
@@ -49,30 +48,15 @@ class RandomSpike(RandomTransform, IntensityTransform):
         self.num_spikes_range = self.parse_range(
             num_spikes, 'num_spikes', min_constraint=0, type_constraint=int)
 
-    def apply_transform(self, subject: Subject) -> Subject:
-        random_parameters_images_dict = {}
-        for image_name, image in self.get_images_dict(subject).items():
-            transformed_tensors = []
-            for channel_idx, channel in enumerate(image[DATA]):
-                params = self.get_params(
-                    self.num_spikes_range,
-                    self.intensity_range,
-                )
-                spikes_positions_param, intensity_param = params
-                random_parameters_dict = {
-                    'intensity': intensity_param,
-                    'spikes_positions': spikes_positions_param,
-                }
-                key = f'{image_name}_channel_{channel_idx}'
-                random_parameters_images_dict[key] = random_parameters_dict
-                transformed_tensor = self.add_artifact(
-                    channel,
-                    spikes_positions_param,
-                    intensity_param,
-                )
-                transformed_tensors.append(transformed_tensor)
-            image[DATA] = torch.stack(transformed_tensors)
-        return subject
+    def get_kspace_params(self, image: Image) -> List[Tuple]:
+        return [
+            self.get_params(self.num_spikes_range, self.intensity_range)
+            for _ in image[DATA]
+        ]
+
+    def has_artifact(self, parameters: Tuple) -> bool:
+        spikes_positions, intensity_factor = parameters
+        return bool(len(spikes_positions) and intensity_factor)
 
     @staticmethod
     def get_params(
@@ -85,14 +69,13 @@ class RandomSpike(RandomTransform, IntensityTransform):
         spikes_positions = torch.rand(num_spikes_param, 3).numpy()
         return spikes_positions, intensity_param.item()
 
-    def add_artifact(
+    def transform_spectrum(
             self,
-            tensor: torch.Tensor,
-            spikes_positions: np.ndarray,
-            intensity_factor: float,
-            ):
-        array = np.asarray(tensor)
-        spectrum = self.fourier_transform(array)
+            spectrum: np.ndarray,
+            parameters: Tuple,
+            array: Optional[np.ndarray] = None,
+            ) -> np.ndarray:
+        spikes_positions, intensity_factor = parameters
         shape = np.array(spectrum.shape)
         mid_shape = shape // 2
         indices = np.floor(spikes_positions * shape).astype(int)
@@ -106,5 +89,4 @@ class RandomSpike(RandomTransform, IntensityTransform):
             # scans. Therefore the next two lines have been removed.
             # #i, j, k = mid_shape - diff
             # #spectrum[i, j, k] = spectrum.max() * intensity_factor
-        result = np.real(self.inv_fourier_transform(spectrum))
-        return torch.from_numpy(result.astype(np.float32))
+        return spectrum
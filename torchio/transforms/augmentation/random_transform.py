@@ -6,12 +6,16 @@ from typing import Optional, Tuple, List
 
 import torch
 import numpy as np
+import scipy.fft as fft
 
 from ...utils import gen_seed
 from ... import TypeRangeFloat
 from .. import Transform, TypeTransformInput
 
 
+SPATIAL_AXES = -3, -2, -1
+
+
 class RandomTransform(Transform):
     """Base class for stochastic augmentation transforms.
 
@@ -78,13 +82,24 @@ class RandomTransform(Transform):
         return torch.Tensor(results)
 
     @staticmethod
-    def fourier_transform(array: np.ndarray):
-        transformed = np.fft.fftn(array)
-        fshift = np.fft.fftshift(transformed)
+    def fourier_transform(array: np.ndarray) -> np.ndarray:
+        """Compute the centered spectrum of the last three dimensions.
+
+        Single precision is used and the computation is distributed across
+        all the available CPUs.
+        """
+        array = np.asarray(array, dtype=np.float32)
+        transformed = fft.fftn(array, axes=SPATIAL_AXES, workers=-1)
+        fshift = fft.fftshift(transformed, axes=SPATIAL_AXES)
         return fshift
 
     @staticmethod
-    def inv_fourier_transform(fshift: np.ndarray):
-        f_ishift = np.fft.ifftshift(fshift)
-        img_back = np.fft.ifftn(f_ishift)
+    def inv_fourier_transform(fshift: np.ndarray) -> np.ndarray:
+        f_ishift = fft.ifftshift(fshift, axes=SPATIAL_AXES)
+        img_back = fft.ifftn(
+            f_ishift,
+            axes=SPATIAL_AXES,
+            workers=-1,
+            overwrite_x=True,
+        )
         return img_back
@@ -12,9 +12,19 @@ from ....torchio import (
     TYPE,
     TypeRangeFloat,
     TypeSextetFloat,
+    TypeTripletInt,
     TypeTripletFloat,
 )
 from ... import SpatialTransform
+from ...resampling import (
+    VoxelMapping,
+    TORCH_INTERPOLATIONS,
+    get_lps_affine,
+    get_center_lps,
+    resample_tensors,
+    get_affine_coordinates,
+    get_sitk_transform_matrix,
+)
 from .. import Interpolation, get_sitk_interpolator
 from .. import RandomTransform
 
@@ -74,6 +84,11 @@ class RandomAffine(RandomTransform, SpatialTransform):
             `Otsu threshold <https://ieeexplore.ieee.org/document/4310076>`_.
             If it is a number, that value will be used.
         image_interpolation: See :ref:`Interpolation`.
+        backend: If ``'sitk'``, each channel is resampled using SimpleITK.
+            If ``'torch'``, all the channels of the images that share an
+            affine matrix are resampled at once using
+            :func:`torch.nn.functional.grid_sample`. Only ``'linear'`` and
+            ``'nearest'`` interpolation are supported by the torch backend.
         p: Probability that this transform will be applied.
         seed: See :py:class:`~torchio.transforms.augmentation.RandomTransform`.
         keys: See :py:class:`~torchio.transforms.Transform`.
@@ -104,6 +119,7 @@ class RandomAffine(RandomTransform, SpatialTransform):
             center: str = 'image',
             default_pad_value: Union[str, float] = 'otsu',
             image_interpolation: str = 'linear',
+            backend: str = 'sitk',
             p: float = 1,
             keys: Optional[List[str]] = None,
             ):
@@ -122,6 +138,7 @@ class RandomAffine(RandomTransform, SpatialTransform):
         self.use_image_center = center == 'image'
         self.default_pad_value = self.parse_default_value(default_pad_value)
         self.interpolation = self.parse_interpolation(image_interpolation)
+        self.backend = self.parse_backend(backend, self.interpolation)
 
     @staticmethod
     def parse_scales_isotropic(scales, isotropic):
@@ -185,6 +202,44 @@ class RandomAffine(RandomTransform, SpatialTransform):
             transform.SetCenter(center_lps)
         return transform
 
+    def get_affine_transform(
+            self,
+            scaling_params: List[float],
+            rotation_params: List[float],
+            translation_params: List[float],
+            center_lps: Optional[TypeTripletFloat] = None,
+            ) -> sitk.Transform:
+        scaling_transform = self.get_scaling_transform(
+            scaling_params,
+            center_lps=center_lps,
+        )
+        rotation_transform = self.get_rotation_transform(
+            rotation_params,
+            translation_params,
+            center_lps=center_lps,
+        )
+
+        sitk_major_version = get_major_sitk_version()
+        if sitk_major_version == 1:
+            transform = sitk.Transform(3, sitk.sitkComposite)
+            transform.AddTransform(scaling_transform)
+            transform.AddTransform(rotation_transform)
+        elif sitk_major_version == 2:
+            transforms = [scaling_transform, rotation_transform]
+            transform = sitk.CompositeTransform(transforms)
+        return transform
+
+    def get_default_value(self, tensor: torch.Tensor) -> float:
+        if self.default_pad_value == 'minimum':
+            default_value = tensor.min().item()
+        elif self.default_pad_value == 'mean':
+            default_value = get_borders_mean(tensor.numpy(), filter_otsu=False)
+        elif self.default_pad_value == 'otsu':
+            default_value = get_borders_mean(tensor.numpy(), filter_otsu=True)
+        else:
+            default_value = self.default_pad_value
+        return float(default_value)
+
     def apply_transform(self, subject: Subject) -> Subject:
         subject.check_consistent_spatial_shape()
         scaling_params, rotation_params, translation_params = self.get_params(
@@ -193,6 +248,14 @@ class RandomAffine(RandomTransform, SpatialTransform):
             self.translation,
             self.isotropic,
         )
+        if self.backend == 'torch':
+            self.apply_affine_transform_torch(
+                subject,
+                scaling_params,
+                rotation_params,
+                translation_params,
+            )
+            return subject
         for image in self.get_images(subject):
             if image[TYPE] != INTENSITY:
                 interpolation = Interpolation.NEAREST
@@ -228,6 +291,100 @@ class RandomAffine(RandomTransform, SpatialTransform):
         }
         return subject
 
+    def is_fusable(self) -> bool:
+        return self.interpolation in TORCH_INTERPOLATIONS
+
+    def get_voxel_mapping(
+            self,
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            ) -> VoxelMapping:
+        scaling_params, rotation_params, translation_params = self.get_params(
+            self.scales,
+            self.degrees,
+            self.translation,
+            self.isotropic,
+        )
+        if shape[-1] == 1:  # 2D
+            scaling_params[2] = 1
+            rotation_params[:-1] = 0
+        center = get_center_lps(shape, affine) if self.use_image_center else None
+        transform = self.get_affine_transform(
+            scaling_params.tolist(),
+            rotation_params.tolist(),
+            translation_params.tolist(),
+            center_lps=center,
+        )
+        lps_affine = get_lps_affine(affine)
+        matrix = (
+            np.linalg.inv(lps_affine)
+            @ get_sitk_transform_matrix(transform)
+            @ lps_affine
+        )
+
+        def get_default_values(tensor):
+            return [self.get_default_value(channel) for channel in tensor]
+
+        return VoxelMapping(
+            shape,
+            affine,
+            matrix=matrix,
+            default_value=get_default_values,
+        )
+
+    def apply_affine_transform_torch(
+            self,
+            subject: Subject,
+            scaling_params: torch.Tensor,
+            rotation_params: torch.Tensor,
+            translation_params: torch.Tensor,
+            ) -> None:
+        # Images sharing interpolation and affine are resampled in one call
+        groups = {}
+        for image in self.get_images(subject):
+            if image[TYPE] != INTENSITY:
+                interpolation = Interpolation.NEAREST
+            else:
+                interpolation = self.interpolation
+            if image.is_2d():
+                scaling_params[2] = 1
+                rotation_params[:-1] = 0
+            key = interpolation, image[AFFINE].tobytes()
+            groups.setdefault(key, []).append(image)
+
+        for (interpolation, _), images in groups.items():
+            reference = images[0]
+            if self.use_image_center:
+                center = reference.get_center(lps=True)
+            else:
+                center = None
+            transform = self.get_affine_transform(
+                scaling_params.tolist(),
+                rotation_params.tolist(),
+                translation_params.tolist(),
+                center_lps=center,
+            )
+            matrix = get_sitk_transform_matrix(transform)
+            coordinates = get_affine_coordinates(
+                reference.spatial_shape,
+                reference[AFFINE],
+                reference[AFFINE],
+                transform_matrix=matrix,
+            )
+            tensors = [image[DATA] for image in images]
+            default_values = [
+                [self.get_default_value(channel) for channel in tensor]
+                for tensor in tensors
+            ]
+            resampled = resample_tensors(
+                tensors,
+                coordinates,
+                interpolation,
+                default_values,
+            )
+            for image, tensor in zip(images, resampled):
+                image[DATA] = tensor
+
     def apply_affine_transform(
             self,
             tensor: torch.Tensor,
@@ -243,33 +400,13 @@ class RandomAffine(RandomTransform, SpatialTransform):
         image = nib_to_sitk(tensor[np.newaxis], affine, force_3d=True)
         floating = reference = image
 
-        scaling_transform = self.get_scaling_transform(
+        transform = self.get_affine_transform(
             scaling_params,
-            center_lps=center_lps,
-        )
-        rotation_transform = self.get_rotation_transform(
             rotation_params,
             translation_params,
             center_lps=center_lps,
         )
-
-        sitk_major_version = get_major_sitk_version()
-        if sitk_major_version == 1:
-            transform = sitk.Transform(3, sitk.sitkComposite)
-            transform.AddTransform(scaling_transform)
-            transform.AddTransform(rotation_transform)
-        elif sitk_major_version == 2:
-            transforms = [scaling_transform, rotation_transform]
-            transform = sitk.CompositeTransform(transforms)
-
-        if self.default_pad_value == 'minimum':
-            default_value = tensor.min().item()
-        elif self.default_pad_value == 'mean':
-            default_value = get_borders_mean(image, filter_otsu=False)
-        elif self.default_pad_value == 'otsu':
-            default_value = get_borders_mean(image, filter_otsu=True)
-        else:
-            default_value = self.default_pad_value
+        default_value = self.get_default_value(tensor)
 
         resampler = sitk.ResampleImageFilter()
         resampler.SetInterpolator(get_sitk_interpolator(interpolation))
@@ -285,9 +422,8 @@ class RandomAffine(RandomTransform, SpatialTransform):
         return tensor
 
 # flake8: noqa: E201, E203, E243
-def get_borders_mean(image, filter_otsu=True):
+def get_borders_mean(array, filter_otsu=True):
     # pylint: disable=bad-whitespace
-    array = sitk.GetArrayViewFromImage(image)
     borders_tuple = (
         array[ 0,  :,  :],
         array[-1,  :,  :],
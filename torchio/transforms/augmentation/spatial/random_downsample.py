@@ -18,6 +18,9 @@ class RandomDownsample(RandomTransform, SpatialTransform):
         axes: Axis or tuple of axes along which the image will be downsampled.
         downsampling: Downsampling factor :math:`m \gt 1`. If a tuple
             :math:`(a, b)` is provided then :math:`m \sim \mathcal{U}(a, b)`.
+        antialias: If ``True``, intensity images are smoothed with a Gaussian
+            filter before being downsampled. See
+            :py:class:`~torchio.transforms.Resample`.
         p: Probability that this transform will be applied.
         seed: See :py:class:`~torchio.transforms.augmentation.RandomTransform`.
         keys: See :py:class:`~torchio.transforms.Transform`.
@@ -37,6 +40,7 @@ class RandomDownsample(RandomTransform, SpatialTransform):
             self,
             axes: Union[int, Tuple[int, ...]] = (0, 1, 2),
             downsampling: TypeRangeFloat = (1.5, 5),
+            antialias: bool = False,
             p: float = 1,
             keys: Optional[List[str]] = None,
             ):
@@ -44,6 +48,7 @@ class RandomDownsample(RandomTransform, SpatialTransform):
         self.axes = self.parse_axes(axes)
         self.downsampling_range = self.parse_range(
             downsampling, 'downsampling', min_constraint=1)
+        self.antialias = antialias
 
     @staticmethod
     def get_params(
@@ -72,6 +77,7 @@ class RandomDownsample(RandomTransform, SpatialTransform):
         transform = Resample(
             tuple(target_spacing),
             image_interpolation='nearest',
+            antialias=self.antialias,
         )
         subject = transform(subject)
         return subject
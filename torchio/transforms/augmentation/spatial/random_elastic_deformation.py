@@ -9,6 +9,15 @@ from ....utils import to_tuple, nib_to_sitk
 from ....torchio import INTENSITY, DATA, AFFINE, TYPE, TypeTripletInt
 from .. import Interpolation, get_sitk_interpolator
 from ... import SpatialTransform
+from ...resampling import (
+    VoxelMapping,
+    TORCH_INTERPOLATIONS,
+    resample,
+    resample_tensors,
+    get_sitk_reference,
+    get_voxel_coordinates,
+    get_field_coordinates,
+)
 from .. import RandomTransform
 
 
@@ -53,6 +62,13 @@ class RandomElasticDeformation(RandomTransform, SpatialTransform):
             The value of the dense displacement at each voxel is always
             interpolated with cubic B-splines from the values at the control
             points of the coarse grid.
+        backend: If ``'sitk'``, each channel is resampled using SimpleITK.
+            If ``'torch'``, the dense displacement field is computed once with
+            :func:`SimpleITK.TransformToDisplacementField` and all the
+            channels of the images that share an affine matrix are resampled
+            at once using :func:`torch.nn.functional.grid_sample`. Only
+            ``'linear'`` and ``'nearest'`` interpolation are supported by the
+            torch backend.
         p: Probability that this transform will be applied.
         seed: See :py:class:`~torchio.transforms.augmentation.RandomTransform`.
         keys: See :py:class:`~torchio.transforms.Transform`.
@@ -115,6 +131,7 @@ class RandomElasticDeformation(RandomTransform, SpatialTransform):
             max_displacement: Union[float, Tuple[float, float, float]] = 7.5,
             locked_borders: int = 2,
             image_interpolation: str = 'linear',
+            backend: str = 'sitk',
             p: float = 1,
             keys: Optional[List[str]] = None,
             ):
@@ -135,6 +152,7 @@ class RandomElasticDeformation(RandomTransform, SpatialTransform):
             )
             raise ValueError(message)
         self.interpolation = self.parse_interpolation(image_interpolation)
+        self.backend = self.parse_backend(backend, self.interpolation)
 
     @staticmethod
     def parse_control_points(
@@ -220,6 +238,9 @@ class RandomElasticDeformation(RandomTransform, SpatialTransform):
             self.max_displacement,
             self.num_locked_borders,
         )
+        if self.backend == 'torch':
+            self.apply_bspline_transform_torch(subject, bspline_params)
+            return subject
         for image in self.get_images(subject):
             if image[TYPE] != INTENSITY:
                 interpolation = Interpolation.NEAREST
@@ -236,6 +257,121 @@ class RandomElasticDeformation(RandomTransform, SpatialTransform):
         random_parameters_dict = {'coarse_grid': bspline_params}
         return subject
 
+    def is_fusable(self) -> bool:
+        return self.interpolation in TORCH_INTERPOLATIONS
+
+    def get_voxel_mapping(
+            self,
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            ) -> VoxelMapping:
+        bspline_params = self.get_params(
+            self.num_control_points,
+            self.max_displacement,
+            self.num_locked_borders,
+        )
+        if shape[-1] == 1:  # 2D
+            bspline_params[..., -1] = 0  # no displacement in IS axis
+        image = get_sitk_reference(shape, affine)
+        bspline_transform = self.get_bspline_transform(
+            image,
+            self.num_control_points,
+            bspline_params,
+        )
+        self.parse_free_form_transform(
+            bspline_transform, self.max_displacement)
+        displacement_field = sitk.TransformToDisplacementField(
+            bspline_transform,
+            sitk.sitkVectorFloat64,
+            image.GetSize(),
+            image.GetOrigin(),
+            image.GetSpacing(),
+            image.GetDirection(),
+        )
+        coordinates = get_field_coordinates(displacement_field, affine)
+        displacement = coordinates - get_voxel_coordinates(
+            shape, dtype=coordinates.dtype)
+        displacement = displacement.permute(3, 0, 1, 2)  # (3, W, H, D)
+
+        def map_coordinates(coordinates):
+            # Displacement values are clamped at the borders of the grid
+            interpolated = resample(
+                displacement,
+                coordinates,
+                Interpolation.LINEAR,
+                default_value=None,
+            )
+            return coordinates + interpolated.permute(1, 2, 3, 0)
+
+        def get_default_values(tensor):
+            return tensor.flatten(start_dim=1).min(dim=1)[0]
+
+        return VoxelMapping(
+            shape,
+            affine,
+            function=map_coordinates,
+            default_value=get_default_values,
+        )
+
+    def apply_bspline_transform_torch(
+            self,
+            subject: Subject,
+            bspline_params: np.ndarray,
+            ) -> None:
+        # Images sharing interpolation and affine are resampled in one call
+        groups = {}
+        for image in self.get_images(subject):
+            if image[TYPE] != INTENSITY:
+                interpolation = Interpolation.NEAREST
+            else:
+                interpolation = self.interpolation
+            if image.is_2d():
+                bspline_params[..., -1] = 0  # no displacement in IS axis
+            key = interpolation, image[AFFINE].tobytes()
+            groups.setdefault(key, []).append(image)
+
+        fields = {}
+        for (interpolation, affine_key), images in groups.items():
+            reference = images[0]
+            if affine_key not in fields:
+                image = nib_to_sitk(
+                    reference[DATA][:1],
+                    reference[AFFINE],
+                    force_3d=True,
+                )
+                bspline_transform = self.get_bspline_transform(
+                    image,
+                    self.num_control_points,
+                    bspline_params,
+                )
+                self.parse_free_form_transform(
+                    bspline_transform, self.max_displacement)
+                displacement_field = sitk.TransformToDisplacementField(
+                    bspline_transform,
+                    sitk.sitkVectorFloat64,
+                    image.GetSize(),
+                    image.GetOrigin(),
+                    image.GetSpacing(),
+                    image.GetDirection(),
+                )
+                fields[affine_key] = get_field_coordinates(
+                    displacement_field,
+                    reference[AFFINE],
+                )
+            tensors = [image[DATA] for image in images]
+            default_values = [
+                tensor.flatten(start_dim=1).min(dim=1)[0]
+                for tensor in tensors
+            ]
+            resampled = resample_tensors(
+                tensors,
+                fields[affine_key],
+                interpolation,
+                default_values,
+            )
+            for image, tensor in zip(images, resampled):
+                image[DATA] = tensor
+
     def apply_bspline_transform(
             self,
             tensor: torch.Tensor,
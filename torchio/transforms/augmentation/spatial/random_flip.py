@@ -56,11 +56,7 @@ class RandomFlip(RandomTransform, SpatialTransform):
         if any(isinstance(n, str) for n in axes):
             sample.check_consistent_orientation()
             image = sample.get_first_image()
-<<<<<<< HEAD
-            axes = sorted([3 + image.axis_name_to_index(n) for n in axes])
-=======
             axes = sorted(3 + image.axis_name_to_index(n) for n in axes)
->>>>>>> 3f98bcf00e4d004418f21f0cdb5282bee77fada3
         for i in range(3):
             if i not in axes:
                 axes_to_flip_hot[i] = False
@@ -1,4 +1,4 @@
-from .transform import Transform
+from .transform import Transform, get_batch_images_dict
 
 
 class IntensityTransform(Transform):
@@ -10,3 +10,7 @@ class IntensityTransform(Transform):
     @staticmethod
     def get_images_dict(sample):
         return sample.get_images_dict(intensity_only=True)
+
+    @staticmethod
+    def get_batch_images_dict(batch):
+        return get_batch_images_dict(batch, intensity_only=True)
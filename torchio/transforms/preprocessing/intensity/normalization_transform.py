@@ -65,6 +65,9 @@ class NormalizationTransform(IntensityTransform):
 
     def apply_transform(self, subject: Subject) -> Subject:
         for image_name, image_dict in self.get_images_dict(subject).items():
+            # e.g. memory-mapped images keep the integer type stored on disk
+            if not image_dict[DATA].is_floating_point():
+                image_dict[DATA] = image_dict[DATA].float()
             mask = self.get_mask(subject, image_dict[DATA])
             self.apply_normalization(subject, image_name, mask)
         return subject
@@ -78,6 +81,36 @@ class NormalizationTransform(IntensityTransform):
         # There must be a nicer way of doing this
         raise NotImplementedError
 
+    def get_batch_mask(
+            self,
+            batch: dict,
+            tensor: torch.Tensor,
+            ) -> Optional[torch.Tensor]:
+        """Return the masks for a batch, or ``None`` if all values are used."""
+        if self.mask_name is not None:
+            return batch[self.mask_name][DATA].bool()
+        if self.masking_method is self.ones:
+            return None
+        return torch.stack([self.masking_method(sample) for sample in tensor])
+
+    def apply_batch_transform(self, batch: dict) -> dict:
+        images_dict = self.get_batch_images_dict(batch)
+        for image_name, image_dict in images_dict.items():
+            if not image_dict[DATA].is_floating_point():
+                image_dict[DATA] = image_dict[DATA].float()
+            mask = self.get_batch_mask(batch, image_dict[DATA])
+            self.apply_batch_normalization(batch, image_name, mask)
+        return batch
+
+    def apply_batch_normalization(
+            self,
+            batch: dict,
+            image_name: str,
+            mask: Optional[torch.Tensor],
+            ) -> None:
+        message = f'{self.name} does not support batches'
+        raise NotImplementedError(message)
+
     @staticmethod
     def ones(tensor: torch.Tensor) -> torch.Tensor:
         return torch.ones_like(tensor, dtype=torch.bool)
@@ -80,6 +80,56 @@ class RescaleIntensity(NormalizationTransform):
         array += self.out_min  # [out_min, out_max]
         return torch.from_numpy(array)
 
+    def apply_batch_normalization(
+            self,
+            batch: dict,
+            image_name: str,
+            mask: Optional[torch.Tensor],
+            ) -> None:
+        image_dict = batch[image_name]
+        image_dict[DATA] = self.rescale_batch(
+            image_dict[DATA], mask, image_name)
+
+    def rescale_batch(
+            self,
+            tensor: torch.Tensor,
+            mask: Optional[torch.Tensor],
+            image_name: str,
+            ) -> torch.Tensor:
+        batch_size = len(tensor)
+        shape = batch_size, 1, 1, 1, 1
+        if mask is None and tuple(self.percentiles) == (0, 100):
+            values = tensor.reshape(batch_size, -1)
+            low, high = values.min(1).values, values.max(1).values
+        else:
+            if mask is None:
+                mask = torch.ones_like(tensor, dtype=torch.bool)
+            mask = mask.expand_as(tensor)
+            cutoffs = [
+                np.percentile(sample[sample_mask].numpy(), self.percentiles)
+                for sample, sample_mask in zip(tensor, mask)
+            ]
+            low, high = torch.as_tensor(np.array(cutoffs)).T
+        low = low.to(tensor.dtype).reshape(shape)
+        high = high.to(tensor.dtype).reshape(shape)
+        rescaled = torch.min(torch.max(tensor, low), high)
+        values = rescaled.reshape(batch_size, -1)
+        rescaled = rescaled - values.min(1).values.reshape(shape)  # [0, max]
+        maximum = rescaled.reshape(batch_size, -1).max(1).values.reshape(shape)
+        is_zero = maximum == 0
+        if torch.any(is_zero):
+            indices = is_zero.flatten().nonzero()[:, 0].tolist()
+            message = (
+                f'Rescaling image "{image_name}" of samples {indices}'
+                ' not possible due to division by zero'
+            )
+            warnings.warn(message)
+        rescaled /= torch.where(is_zero, torch.ones_like(maximum), maximum)
+        out_range = self.out_max - self.out_min
+        rescaled *= out_range  # [0, out_range]
+        rescaled += self.out_min  # [out_min, out_max]
+        return torch.where(is_zero, tensor.to(rescaled.dtype), rescaled)
+
 
 @deprecated('Rescale is deprecated. Use RescaleIntensity instead')
 class Rescale(RescaleIntensity):
@@ -41,6 +41,33 @@ class ZNormalization(NormalizationTransform):
             raise RuntimeError(message)
         image[DATA] = standardized
 
+    def apply_batch_normalization(
+            self,
+            batch: dict,
+            image_name: str,
+            mask: Optional[torch.Tensor],
+            ) -> None:
+        image = batch[image_name]
+        tensor = image[DATA]
+        values = tensor.reshape(len(tensor), -1)
+        if mask is None:
+            mean, std = values.mean(1), values.std(1)
+        else:
+            mask = mask.expand_as(tensor).reshape(len(tensor), -1)
+            num_values = mask.sum(1)
+            mean = (values * mask).sum(1) / num_values
+            squares = ((values - mean[:, None]) * mask) ** 2
+            std = (squares.sum(1) / (num_values - 1)).sqrt()
+        if torch.any(std == 0):
+            indices = (std == 0).nonzero()[:, 0].tolist()
+            message = (
+                'Standard deviation is 0 for masked values'
+                f' in image "{image_name}" of samples {indices}'
+            )
+            raise RuntimeError(message)
+        shape = len(tensor), 1, 1, 1, 1
+        image[DATA] = (tensor - mean.reshape(shape)) / std.reshape(shape)
+
     @staticmethod
     def znorm(tensor: torch.Tensor, mask: torch.Tensor) -> torch.Tensor:
         tensor = tensor.clone()
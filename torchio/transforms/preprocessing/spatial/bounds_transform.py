@@ -2,6 +2,7 @@ from typing import Union, Tuple, List, Optional
 import numpy as np
 from ....torchio import TypeTripletInt
 from ... import SpatialTransform
+from ...resampling import VoxelMapping
 
 
 TypeSixBounds = Tuple[int, int, int, int, int, int]
@@ -34,6 +35,20 @@ class BoundsTransform(SpatialTransform):
     def bounds_function(self):
         raise NotImplementedError
 
+    @staticmethod
+    def get_translation_mapping(
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            offset: TypeTripletInt,
+            new_shape: TypeTripletInt,
+            **kwargs,
+            ) -> VoxelMapping:
+        """Return the mapping of a grid whose first voxel is at ``offset``."""
+        matrix = np.eye(4)
+        matrix[:3, 3] = offset
+        new_affine = affine @ matrix
+        return VoxelMapping(new_shape, new_affine, matrix=matrix, **kwargs)
+
     @staticmethod
     def parse_bounds(bounds_parameters: TypeBounds) -> TypeSixBounds:
         try:
@@ -1,7 +1,7 @@
 import numpy as np
-import nibabel as nib
-from ....torchio import DATA, AFFINE
 from ....data.subject import Subject
+from ....torchio import TypeTripletInt
+from ...resampling import VoxelMapping
 from .bounds_transform import BoundsTransform
 
 
@@ -30,11 +30,18 @@ class Crop(BoundsTransform):
         index_ini = low
         index_fin = np.array(sample.spatial_shape) - high
         for image in self.get_images(sample):
-            new_origin = nib.affines.apply_affine(image.affine, index_ini)
-            new_affine = image.affine.copy()
-            new_affine[:3, 3] = new_origin
-            i0, j0, k0 = index_ini
-            i1, j1, k1 = index_fin
-            image[DATA] = image[DATA][:, i0:i1, j0:j1, k0:k1].clone()
-            image[AFFINE] = new_affine
+            image.crop(index_ini, index_fin)
         return sample
+
+    def is_fusable(self) -> bool:
+        return True
+
+    def get_voxel_mapping(
+            self,
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            ) -> VoxelMapping:
+        low = np.array(self.bounds_parameters[::2])
+        high = np.array(self.bounds_parameters[1::2])
+        new_shape = np.array(shape) - low - high
+        return self.get_translation_mapping(shape, affine, low, new_shape)
@@ -8,6 +8,7 @@ from .pad import Pad
 from .crop import Crop
 from .bounds_transform import BoundsTransform, TypeTripletInt, TypeSixBounds
 from ....data.subject import Subject
+from ...resampling import VoxelMapping
 from ....utils import round_up
 
 
@@ -215,6 +216,39 @@ class CropOrPad(BoundsTransform):
         cropping_params = tuple(cropping.tolist()) if cropping.any() else None
         return padding_params, cropping_params
 
+    def is_fusable(self) -> bool:
+        padding_mode, _ = Pad.parse_padding_mode(self.padding_mode)
+        return self.mask_name is None and padding_mode == 'constant'
+
+    def get_voxel_mapping(
+            self,
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            ) -> VoxelMapping:
+        target_shape = np.array(self.bounds_parameters[::2])
+        padding_params, cropping_params = (
+            self._compute_cropping_padding_from_shapes(
+                np.array(shape), target_shape)
+        )
+        offset = np.zeros(3, dtype=int)
+        sub_transforms = []
+        if padding_params is not None:
+            offset -= np.array(padding_params[::2])
+            sub_transforms.append(
+                Pad(padding_params, padding_mode=self.padding_mode))
+        if cropping_params is not None:
+            offset += np.array(cropping_params[::2])
+            sub_transforms.append(Crop(cropping_params))
+        _, fill = Pad.parse_padding_mode(self.padding_mode)
+        return self.get_translation_mapping(
+            shape,
+            affine,
+            offset,
+            target_shape,
+            default_value=0 if fill is None else fill,
+            sub_transforms=sub_transforms,
+        )
+
     def apply_transform(self, subject: Subject) -> Subject:
         padding_params, cropping_params = self.compute_crop_or_pad(subject)
         padding_kwargs = dict(
@@ -5,8 +5,9 @@ import numpy as np
 import nibabel as nib
 import torch
 
-from ....torchio import DATA, AFFINE
+from ....torchio import DATA, AFFINE, TypeTripletInt
 from ....data.subject import Subject
+from ...resampling import VoxelMapping
 from .bounds_transform import BoundsTransform, TypeBounds
 
 
@@ -90,3 +91,22 @@ class Pad(BoundsTransform):
             image[DATA] = torch.from_numpy(padded)
             image[AFFINE] = new_affine
         return subject
+
+    def is_fusable(self) -> bool:
+        return self.padding_mode == 'constant'
+
+    def get_voxel_mapping(
+            self,
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            ) -> VoxelMapping:
+        low = np.array(self.bounds_parameters[::2])
+        high = np.array(self.bounds_parameters[1::2])
+        new_shape = np.array(shape) + low + high
+        return self.get_translation_mapping(
+            shape,
+            affine,
+            -low,
+            new_shape,
+            default_value=0 if self.fill is None else self.fill,
+        )
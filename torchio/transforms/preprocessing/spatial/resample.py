@@ -8,10 +8,24 @@ import SimpleITK as sitk
 
 from ....data.subject import Subject
 from ....data.image import Image, ScalarImage
-from ....torchio import DATA, AFFINE, TYPE, INTENSITY, TypeTripletFloat
-from ....utils import sitk_to_nib
+from ....torchio import (
+    DATA,
+    AFFINE,
+    TYPE,
+    INTENSITY,
+    TypeTripletInt,
+    TypeTripletFloat,
+)
+from ....utils import sitk_to_nib, get_rotation_and_spacing_from_affine
 from ... import SpatialTransform
 from ... import Interpolation, get_sitk_interpolator
+from ...smoothing import gaussian_filter
+from ...resampling import (
+    VoxelMapping,
+    TORCH_INTERPOLATIONS,
+    resample,
+    get_affine_coordinates,
+)
 
 
 TypeSpacing = Union[float, Tuple[float, float, float]]
@@ -40,6 +54,15 @@ class Resample(SpatialTransform):
             Using a member of :py:class:`torchio.Interpolation` is still
             supported for backward compatibility,
             but will be removed in a future version.
+        backend: If ``'sitk'``, images are resampled using SimpleITK.
+            If ``'torch'``, all the channels of each image are resampled at
+            once using :func:`torch.nn.functional.grid_sample`. Only
+            ``'linear'`` and ``'nearest'`` interpolation are supported by the
+            torch backend.
+        antialias: If ``True``, intensity images are smoothed with a Gaussian
+            filter before being downsampled, to reduce aliasing. The standard
+            deviation of the filter along each axis is computed from the
+            downsampling factor as in :meth:`get_sigma`.
         p: Probability that this transform will be applied.
         keys: See :py:class:`~torchio.transforms.Transform`.
 
@@ -61,13 +84,17 @@ class Resample(SpatialTransform):
             target: Union[TypeSpacing, str, Path],
             image_interpolation: str = 'linear',
             pre_affine_name: Optional[str] = None,
+            backend: str = 'sitk',
+            antialias: bool = False,
             p: float = 1,
             keys: Optional[List[str]] = None,
             ):
         super().__init__(p=p, keys=keys)
         self.reference_image, self.target_spacing = self.parse_target(target)
         self.interpolation = self.parse_interpolation(image_interpolation)
+        self.backend = self.parse_backend(backend, self.interpolation)
         self.affine_name = pre_affine_name
+        self.antialias = antialias
 
     def parse_target(
             self,
@@ -164,21 +191,24 @@ class Resample(SpatialTransform):
                     matrix = matrix.numpy()
                 image[AFFINE] = matrix @ image[AFFINE]
 
+            reference = self.get_reference(subject)
+            if self.antialias and image[TYPE] == INTENSITY:
+                if reference is not None:
+                    new_spacing = reference.spacing
+                else:
+                    new_spacing = self.target_spacing
+                self.smooth(image, new_spacing)
+
+            if self.backend == 'torch':
+                self.resample_torch(image, reference, interpolation)
+                continue
+
             floating_itk = image.as_sitk(force_3d=True)
 
             # Resample
-            if isinstance(self.reference_image, str):
-                try:
-                    reference_image_sitk = subject[self.reference_image].as_sitk()
-                except KeyError as error:
-                    message = (
-                        f'Reference name "{self.reference_image}"'
-                        ' not found in subject'
-                    )
-                    raise ValueError(message) from error
-            elif isinstance(self.reference_image, ScalarImage):
-                reference_image_sitk = self.reference_image.as_sitk()
-            elif self.reference_image is None:  # target is a spacing
+            if reference is not None:
+                reference_image_sitk = reference.as_sitk()
+            else:  # target is a spacing
                 reference_image_sitk = self.get_reference_image(
                     floating_itk,
                     self.target_spacing,
@@ -194,6 +224,89 @@ class Resample(SpatialTransform):
             image[AFFINE] = affine
         return subject
 
+    def is_fusable(self) -> bool:
+        return (
+            self.interpolation in TORCH_INTERPOLATIONS
+            and self.affine_name is None
+            and not isinstance(self.reference_image, str)
+            and not self.antialias
+        )
+
+    def get_voxel_mapping(
+            self,
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            ) -> VoxelMapping:
+        if self.reference_image is not None:
+            reference = self.reference_image
+            new_shape, new_affine = reference.spatial_shape, reference[AFFINE]
+        else:
+            new_shape, new_affine = self.get_reference_geometry(
+                shape,
+                affine,
+                self.target_spacing,
+            )
+        matrix = np.linalg.inv(affine) @ new_affine
+        return VoxelMapping(new_shape, new_affine, matrix=matrix, default_value=0)
+
+    def get_reference(self, subject: Subject) -> Optional[Image]:
+        if isinstance(self.reference_image, str):
+            try:
+                return subject[self.reference_image]
+            except KeyError as error:
+                message = (
+                    f'Reference name "{self.reference_image}"'
+                    ' not found in subject'
+                )
+                raise ValueError(message) from error
+        return self.reference_image
+
+    def smooth(self, image: Image, new_spacing: TypeTripletFloat) -> None:
+        """Blur an image before downsampling it to the new spacing."""
+        old_spacing = np.array(image.spacing)
+        factors = np.array(new_spacing) / old_spacing
+        if np.all(factors <= 1):  # no downsampling
+            return
+        sigmas = self.get_sigma(np.maximum(factors, 1), old_spacing)
+        image[DATA] = gaussian_filter(image[DATA], sigmas / old_spacing)
+
+    def resample_torch(
+            self,
+            image: Image,
+            reference: Optional[Image],
+            interpolation: Interpolation,
+            ) -> None:
+        if reference is not None:
+            shape, affine = reference.spatial_shape, reference[AFFINE]
+        else:  # target is a spacing
+            shape, affine = self.get_reference_geometry(
+                image.spatial_shape,
+                image[AFFINE],
+                self.target_spacing,
+            )
+        coordinates = get_affine_coordinates(shape, affine, image[AFFINE])
+        image[DATA] = resample(image[DATA], coordinates, interpolation)
+        image[AFFINE] = affine
+
+    @staticmethod
+    def get_reference_geometry(
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            spacing: TypeTripletFloat,
+            ) -> Tuple[TypeTripletInt, np.ndarray]:
+        """Compute the output grid, as in :meth:`get_reference_image`."""
+        rotation, old_spacing = get_rotation_and_spacing_from_affine(affine)
+        new_spacing = np.array(spacing)
+        old_size = np.array(shape)
+        new_size = old_size * old_spacing / new_spacing
+        new_size = np.ceil(new_size).astype(np.uint16)
+        new_size[old_size == 1] = 1  # keep singleton dimensions
+        new_origin_index = 0.5 * (new_spacing / old_spacing - 1)
+        new_affine = np.eye(4)
+        new_affine[:3, :3] = rotation * new_spacing
+        new_affine[:3, 3] = affine[:3, :3] @ new_origin_index + affine[:3, 3]
+        return tuple(new_size.tolist()), new_affine
+
     @staticmethod
     def get_reference_image(
             image: sitk.Image,
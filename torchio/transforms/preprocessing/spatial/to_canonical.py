@@ -2,8 +2,9 @@ import torch
 import numpy as np
 import nibabel as nib
 from ....data.subject import Subject
-from ....torchio import DATA, AFFINE
+from ....torchio import DATA, AFFINE, TypeTripletInt
 from ... import SpatialTransform
+from ...resampling import VoxelMapping
 
 
 class ToCanonical(SpatialTransform):
@@ -43,3 +44,18 @@ class ToCanonical(SpatialTransform):
             image[DATA] = torch.from_numpy(array[0])
             image[AFFINE] = reoriented.affine
         return subject
+
+    def is_fusable(self) -> bool:
+        return True
+
+    def get_voxel_mapping(
+            self,
+            shape: TypeTripletInt,
+            affine: np.ndarray,
+            ) -> VoxelMapping:
+        orientation = nib.io_orientation(affine)
+        # Maps indices in the reoriented grid to indices in the input grid
+        matrix = nib.orientations.inv_ornt_aff(orientation, shape)
+        new_shape = np.empty(3, dtype=int)
+        new_shape[orientation[:, 0].astype(int)] = shape
+        return VoxelMapping(new_shape, affine @ matrix, matrix=matrix)
@@ -0,0 +1,381 @@
+"""Resampling of tensors using :func:`torch.nn.functional.grid_sample`.
+
+These functions are used by the spatial transforms when they are instantiated
+with ``backend='torch'``. All channels of a tensor, and optionally all the
+instances in a 5D batch, are resampled in one call instead of converting each
+channel to a :class:`SimpleITK.Image`. Results are comparable to those
+obtained with :class:`SimpleITK.ResampleImageFilter` using linear or nearest
+neighbor interpolation.
+"""
+
+from typing import Callable, List, Sequence, Optional, Tuple, Union
+
+import torch
+import numpy as np
+import SimpleITK as sitk
+import torch.nn.functional as F
+
+from ..torchio import TypeData, TypeTripletFloat
+from ..utils import get_rotation_and_spacing_from_affine
+from .interpolation import Interpolation
+
+
+BACKENDS = 'sitk', 'torch'
+TORCH_INTERPOLATIONS = {
+    Interpolation.NEAREST: 'nearest',
+    Interpolation.LINEAR: 'bilinear',  # trilinear for 5D inputs
+}
+FLIP_XY_4 = np.diag((-1, -1, 1, 1))  # used to switch between LPS and RAS
+
+
+def get_lps_affine(affine: np.ndarray) -> np.ndarray:
+    """Return the matrix mapping voxel indices to LPS coordinates."""
+    return FLIP_XY_4 @ np.asarray(affine, dtype=np.float64)
+
+
+def get_center_lps(
+        shape: Sequence[int],
+        affine: np.ndarray,
+        ) -> TypeTripletFloat:
+    """Return the LPS coordinates of the center of an image grid."""
+    center_index = (np.array(shape) - 1) / 2
+    center = get_lps_affine(affine) @ np.append(center_index, 1)
+    return tuple(center[:3].tolist())
+
+
+def get_sitk_reference(
+        shape: Sequence[int],
+        affine: np.ndarray,
+        ) -> sitk.Image:
+    """Create a small SimpleITK image with the given grid, without data."""
+    rotation, spacing = get_rotation_and_spacing_from_affine(affine)
+    lps_affine = get_lps_affine(affine)
+    image = sitk.Image([int(n) for n in shape], sitk.sitkUInt8)
+    image.SetOrigin(lps_affine[:3, 3].tolist())
+    image.SetSpacing(spacing.tolist())
+    image.SetDirection((FLIP_XY_4[:3, :3] @ rotation).flatten().tolist())
+    return image
+
+
+def get_sitk_transform_matrix(transform: sitk.Transform) -> np.ndarray:
+    r"""Return the :math:`4 \times 4` matrix of a linear SimpleITK transform.
+
+    Args:
+        transform: Linear transform, such as an instance of
+            :class:`SimpleITK.Euler3DTransform` or a composition of linear
+            transforms.
+    """
+    origin = np.array(transform.TransformPoint((0, 0, 0)))
+    matrix = np.eye(4)
+    for axis in range(3):
+        point = [0, 0, 0]
+        point[axis] = 1
+        matrix[:3, axis] = np.array(transform.TransformPoint(point)) - origin
+    matrix[:3, 3] = origin
+    return matrix
+
+
+def get_voxel_coordinates(
+        shape: Sequence[int],
+        dtype: torch.dtype = torch.float32,
+        ) -> torch.Tensor:
+    """Return the index of each voxel, with shape :math:`(W, H, D, 3)`."""
+    coordinates = torch.empty(*shape, 3, dtype=dtype)
+    for axis, size in enumerate(shape):
+        view_shape = [1, 1, 1]
+        view_shape[axis] = size
+        values = torch.arange(size, dtype=dtype).reshape(view_shape)
+        coordinates[..., axis] = values
+    return coordinates
+
+
+def get_grid_coordinates(
+        shape: Sequence[int],
+        matrix: np.ndarray,
+        dtype: torch.dtype = torch.float32,
+        ) -> torch.Tensor:
+    r"""Apply a :math:`4 \times 4` matrix to the voxel indices of a grid.
+
+    Coordinates are computed in double precision one slice at a time along
+    the first axis, so that a double precision grid of the full volume is
+    never allocated.
+
+    Returns:
+        Tensor with shape :math:`(W, H, D, 3)`.
+    """
+    matrix = torch.as_tensor(matrix, dtype=torch.float64)
+    coordinates = torch.empty(*shape, 3, dtype=dtype)
+    slice_indices = get_voxel_coordinates((1, *shape[1:]), dtype=torch.float64)
+    first_slice = slice_indices[0] @ matrix[:3, :3].T + matrix[:3, 3]
+    step = matrix[:3, 0]
+    for i in range(shape[0]):
+        coordinates[i] = first_slice + i * step
+    return coordinates
+
+
+def get_affine_coordinates(
+        output_shape: Sequence[int],
+        output_affine: np.ndarray,
+        input_affine: np.ndarray,
+        transform_matrix: Optional[np.ndarray] = None,
+        ) -> torch.Tensor:
+    """Compute the input indices to be sampled for each output voxel.
+
+    Args:
+        output_shape: Spatial shape :math:`(W, H, D)` of the output.
+        output_affine: RAS affine matrix of the output.
+        input_affine: RAS affine matrix of the input.
+        transform_matrix: Matrix mapping points in the output LPS space to
+            points in the input LPS space, as in SimpleITK.
+            If ``None``, the identity is used.
+
+    Returns:
+        Float tensor of continuous indices with shape :math:`(W, H, D, 3)`.
+        The indices are computed in double precision, as in ITK, and stored
+        in single precision.
+    """
+    if transform_matrix is None:
+        transform_matrix = np.eye(4)
+    matrix = (
+        np.linalg.inv(get_lps_affine(input_affine))
+        @ transform_matrix
+        @ get_lps_affine(output_affine)
+    )
+    return get_grid_coordinates(output_shape, matrix)
+
+
+def get_field_coordinates(
+        displacement_field: sitk.Image,
+        affine: np.ndarray,
+        ) -> torch.Tensor:
+    """Convert a displacement field into input indices to be sampled.
+
+    Args:
+        displacement_field: Field in LPS physical units, e.g. as returned by
+            :func:`SimpleITK.TransformToDisplacementField`, defined on the
+            grid of the image with the given affine.
+        affine: RAS affine matrix of the input and output images.
+
+    Returns:
+        Float tensor of continuous indices with shape :math:`(W, H, D, 3)`.
+    """
+    field = sitk.GetArrayViewFromImage(displacement_field)
+    field = field.transpose(2, 1, 0, 3)
+    inverse = np.linalg.inv(get_lps_affine(affine))[:3, :3]
+    shape = field.shape[:3]
+    coordinates = get_voxel_coordinates(shape)
+    for i in range(shape[0]):
+        coordinates[i] += torch.from_numpy(field[i] @ inverse.T)
+    return coordinates
+
+
+def resample(
+        tensor: torch.Tensor,
+        coordinates: torch.Tensor,
+        interpolation: Interpolation,
+        default_value: Union[float, TypeData] = 0,
+        mask: Optional[torch.Tensor] = None,
+        ) -> torch.Tensor:
+    r"""Sample a tensor at continuous voxel indices.
+
+    Points outside the input buffer, defined as in ITK by the half-voxel
+    border around the voxel centers, are set to the default value.
+
+    Args:
+        tensor: Tensor with shape :math:`(C, W, H, D)` or
+            :math:`(N, C, W, H, D)`.
+        coordinates: Continuous indices with shape :math:`(W', H', D', 3)`,
+            or :math:`(N, W', H', D', 3)` for a batch.
+        interpolation: Either :attr:`Interpolation.LINEAR` or
+            :attr:`Interpolation.NEAREST`.
+        default_value: Value for points outside the input. A sequence with one
+            value per channel, or a tensor with shape :math:`(N, C)` for a
+            batch, may be given. If ``None``, the values at the border of the
+            input are used.
+        mask: Optional boolean tensor with the spatial shape of the
+            coordinates. Points where it is ``False`` are also set to the
+            default value.
+
+    Returns:
+        Float tensor with shape :math:`(C, W', H', D')` or
+        :math:`(N, C, W', H', D')`.
+    """
+    try:
+        mode = TORCH_INTERPOLATIONS[interpolation]
+    except KeyError as error:
+        message = (
+            f'Interpolation "{interpolation}" is not supported by the torch'
+            f' backend. Use one of {list(TORCH_INTERPOLATIONS)}'
+        )
+        raise ValueError(message) from error
+    is_batch = tensor.ndim == 5
+    if not is_batch:
+        tensor = tensor[np.newaxis]
+    if coordinates.ndim == 4:
+        coordinates = coordinates[np.newaxis]
+    tensor = tensor.float()
+    batch_size = len(tensor)
+    coordinates = coordinates.expand(batch_size, *coordinates.shape[1:])
+
+    # Coordinates are rounded and normalized with their own precision
+    shape = torch.tensor(tensor.shape[2:], dtype=coordinates.dtype)
+    if interpolation == Interpolation.NEAREST:
+        # Round half up as ITK does, instead of half to even
+        indices = torch.floor(coordinates + 0.5)
+    else:
+        indices = coordinates
+    normalized = indices / (shape - 1).clamp(min=1) * 2 - 1
+    # grid_sample expects the indices in reverse order, i.e. (k, j, i)
+    grid = normalized.flip(-1).to(tensor.dtype)
+    resampled = F.grid_sample(
+        tensor,
+        grid,
+        mode=mode,
+        padding_mode='border',
+        align_corners=True,
+    )
+
+    if default_value is None:
+        return resampled if is_batch else resampled[0]
+    inside = is_inside(coordinates, shape)[:, np.newaxis]
+    if mask is not None:
+        inside = inside & mask
+    default_value = torch.as_tensor(default_value, dtype=tensor.dtype)
+    if default_value.ndim < 2:
+        default_value = default_value.reshape(-1, 1, 1, 1)
+    else:  # one value per sample and channel
+        default_value = default_value.reshape(*default_value.shape, 1, 1, 1)
+    resampled = torch.where(inside, resampled, default_value)
+    if not is_batch:
+        resampled = resampled[0]
+    return resampled
+
+
+def resample_tensors(
+        tensors: List[torch.Tensor],
+        coordinates: torch.Tensor,
+        interpolation: Interpolation,
+        default_values: List[Union[float, TypeData]],
+        ) -> List[torch.Tensor]:
+    """Resample several 4D tensors on the same grid in a single call."""
+    sizes = [len(tensor) for tensor in tensors]
+    defaults = [
+        torch.as_tensor(value, dtype=torch.float32).reshape(-1).expand(size)
+        for value, size in zip(default_values, sizes)
+    ]
+    resampled = resample(
+        torch.cat([tensor.float() for tensor in tensors]),
+        coordinates,
+        interpolation,
+        default_value=torch.cat(defaults),
+    )
+    return list(resampled.split(sizes))
+
+
+class VoxelMapping:
+    r"""Mapping from output voxel indices to input voxel indices.
+
+    Spatial transforms that can be fused by
+    :class:`~torchio.transforms.Compose` return an instance of this class from
+    their ``get_voxel_mapping`` method.
+
+    Args:
+        shape: Spatial shape :math:`(W, H, D)` of the output.
+        affine: RAS affine matrix of the output.
+        matrix: :math:`4 \times 4` matrix mapping output indices to input
+            indices. Ignored if :attr:`function` is given.
+        function: Callable mapping a tensor of output indices with shape
+            :math:`(W, H, D, 3)` to input indices.
+        default_value: Value for points outside the input. It can be a
+            number, or a callable that takes the 4D input tensor and returns
+            one value per channel. If ``None``, the transform does not define
+            one.
+        sub_transforms: Transforms that the transform applies internally when
+            it is not fused, e.g. :class:`~torchio.transforms.Pad` and
+            :class:`~torchio.transforms.Crop` for
+            :class:`~torchio.transforms.CropOrPad`. They are recorded in the
+            subject history before the transform itself.
+    """
+    def __init__(
+            self,
+            shape: Sequence[int],
+            affine: np.ndarray,
+            matrix: Optional[np.ndarray] = None,
+            function: Optional[Callable] = None,
+            default_value: Union[None, float, Callable] = None,
+            sub_transforms: Optional[Sequence[Callable]] = None,
+            ):
+        self.shape = tuple(int(n) for n in shape)
+        self.affine = affine
+        self.matrix = np.eye(4) if matrix is None else matrix
+        self.function = function
+        self.default_value = default_value
+        self.sub_transforms = [] if sub_transforms is None else sub_transforms
+
+
+def compose_voxel_mappings(
+        mappings: List[VoxelMapping],
+        ) -> Tuple[torch.Tensor, List[Optional[torch.Tensor]]]:
+    """Compute the input indices sampled by a sequence of mappings.
+
+    Consecutive matrices are multiplied so that the grid of indices is only
+    computed once for a sequence of linear transforms.
+
+    Args:
+        mappings: Mappings in the order in which the transforms are applied.
+
+    Returns:
+        Tuple containing the continuous indices of the input of the first
+        mapping, with the spatial shape of the output of the last mapping,
+        and a list with one boolean tensor per mapping that is ``False`` where
+        the points fall outside the input grid of the mapping, e.g. in the
+        region added by a padding. The first mask is always ``None``, as the
+        input grid of the first mapping is checked when resampling, and the
+        other masks are ``None`` if all points are inside.
+    """
+    output_shape = mappings[-1].shape
+    matrix = np.eye(4)
+    coordinates = None
+    masks = [None] * len(mappings)
+
+    def apply_matrix(matrix, coordinates):
+        if coordinates is None:
+            return get_grid_coordinates(output_shape, matrix)
+        matrix = torch.as_tensor(matrix, dtype=coordinates.dtype)
+        return coordinates @ matrix[:3, :3].T + matrix[:3, 3]
+
+    for index in reversed(range(len(mappings))):
+        mapping = mappings[index]
+        if mapping.function is None:
+            matrix = mapping.matrix @ matrix
+        else:
+            coordinates = apply_matrix(matrix, coordinates)
+            coordinates = mapping.function(coordinates)
+            matrix = np.eye(4)
+        if index == 0:  # the input grid is checked when resampling
+            break
+        input_shape = np.array(mappings[index - 1].shape)
+        if coordinates is None:
+            # An affine mapping transforms the output box into a
+            # parallelepiped, so checking the corners is enough
+            corners = np.array(list(np.ndindex(2, 2, 2))) * (
+                np.array(output_shape) - 1)
+            corners = corners @ matrix[:3, :3].T + matrix[:3, 3]
+            if is_inside(corners, input_shape).all():
+                continue
+        coordinates = apply_matrix(matrix, coordinates)
+        matrix = np.eye(4)
+        masks[index] = is_inside(coordinates, input_shape)
+    return apply_matrix(matrix, coordinates), masks
+
+
+def is_inside(coordinates: TypeData, shape: TypeData) -> TypeData:
+    """Check whether continuous indices are inside the buffer of a grid.
+
+    As in ITK, the buffer includes the half-voxel border around the voxel
+    centers.
+    """
+    if isinstance(coordinates, torch.Tensor):
+        shape = torch.as_tensor(shape, dtype=coordinates.dtype)
+    inside = (coordinates >= -0.5) & (coordinates <= shape - 0.5)
+    return inside.all(-1)
@@ -0,0 +1,90 @@
+from functools import lru_cache
+
+import torch
+import numpy as np
+
+from ..torchio import TypeData
+
+
+# Kernels are truncated at this number of standard deviations, as in
+# scipy.ndimage.gaussian_filter
+TRUNCATE = 4
+
+
+def gaussian_filter(tensor: torch.Tensor, sigmas: TypeData) -> torch.Tensor:
+    r"""Smooth all the channels of a tensor with separable Gaussian kernels.
+
+    The same kernels and boundary conditions (reflection about the edge of
+    the last voxel) as :func:`scipy.ndimage.gaussian_filter` are used. The
+    filter along each axis is expressed as a matrix, so that all the channels
+    are filtered with one batched matrix multiplication per axis.
+
+    Args:
+        tensor: Tensor with shape :math:`(C, W, H, D)`.
+        sigmas: Standard deviations in voxels along each axis, either with
+            shape :math:`(3,)` or with shape :math:`(C, 3)` to use different
+            kernels for each channel.
+
+    Returns:
+        Float tensor with the same shape as the input.
+    """
+    num_channels = len(tensor)
+    sigmas = np.asarray(sigmas, dtype=float)
+    sigmas = np.broadcast_to(sigmas, (num_channels, 3))
+    result = tensor.float()
+    shape = result.shape
+    for axis in range(3):
+        axis_sigmas = sigmas[:, axis].tolist()
+        if not any(get_radius(sigma) for sigma in axis_sigmas):
+            continue
+        size = shape[axis + 1]
+        matrices = torch.stack([
+            get_gaussian_matrix(sigma, size) for sigma in axis_sigmas
+        ])
+        if axis == 0:
+            result = matrices.bmm(result.reshape(num_channels, size, -1))
+        elif axis == 1:
+            result = matrices[:, np.newaxis].matmul(result)
+        elif axis == 2:
+            result = result.reshape(num_channels, -1, size)
+            result = result.bmm(matrices.transpose(1, 2))
+        result = result.reshape(shape)
+    return result
+
+
+def get_radius(sigma: float) -> int:
+    return int(TRUNCATE * sigma + 0.5)
+
+
+@lru_cache(maxsize=64)
+def get_gaussian_kernel(sigma: float) -> np.ndarray:
+    """Normalized 1D Gaussian kernel.
+
+    The returned array is cached and must not be modified.
+    """
+    radius = get_radius(sigma)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2) if radius else np.ones(1)
+    kernel /= kernel.sum()
+    kernel.flags.writeable = False
+    return kernel
+
+
+@lru_cache(maxsize=64)
+def get_gaussian_matrix(sigma: float, size: int) -> torch.Tensor:
+    """Matrix that filters a 1D signal of the given size.
+
+    The signal is extended by reflection about its edges, so the matrix rows
+    sum to one. The returned tensor is cached and must not be modified.
+    """
+    kernel = get_gaussian_kernel(sigma)
+    radius = len(kernel) // 2
+    indices = np.arange(-radius, size + radius) % (2 * size)
+    indices = np.where(indices < size, indices, 2 * size - 1 - indices)
+    rows = np.repeat(np.arange(size), len(kernel))
+    offsets = np.arange(size)[:, np.newaxis] + np.arange(len(kernel))
+    columns = indices[offsets].ravel()
+    weights = np.tile(kernel, size)
+    matrix = np.zeros((size, size))
+    np.add.at(matrix, (rows, columns), weights)
+    return torch.from_numpy(matrix).float()
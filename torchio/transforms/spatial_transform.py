@@ -1,4 +1,16 @@
-from .transform import Transform
+from typing import Sequence
+
+import torch
+import numpy as np
+
+from .. import DATA, AFFINE, INTENSITY
+from .transform import (
+    Transform,
+    get_batch_images_dict,
+    get_batch_image_type,
+)
+from .interpolation import Interpolation
+from .resampling import VoxelMapping, resample, compose_voxel_mappings
 
 
 class SpatialTransform(Transform):
@@ -10,3 +22,98 @@ class SpatialTransform(Transform):
     @staticmethod
     def get_images_dict(sample):
         return sample.get_images_dict(intensity_only=False)
+
+    @staticmethod
+    def get_batch_images_dict(batch):
+        return get_batch_images_dict(batch, intensity_only=False)
+
+    def is_fusable(self) -> bool:
+        """Return ``True`` if the transform can be expressed as a mapping
+        between voxel indices, so that it can be fused with other spatial
+        transforms by :py:class:`~torchio.transforms.Compose`."""
+        return False
+
+    def get_voxel_mapping(
+            self,
+            shape: Sequence[int],
+            affine: np.ndarray,
+            ) -> VoxelMapping:
+        """Sample the transform parameters and return the voxel mapping.
+
+        Args:
+            shape: Spatial shape of the input images.
+            affine: Affine matrix of the input images.
+        """
+        raise NotImplementedError
+
+    def apply_batch_transform(self, batch: dict) -> dict:
+        # Transforms that can be expressed as a voxel mapping are applied to
+        # the whole batch with a single call to grid_sample per image
+        if not self.is_fusable():
+            return super().apply_batch_transform(batch)
+        images = self.get_batch_images_dict(batch)
+        first_image = next(iter(images.values()))
+        shape = first_image[DATA].shape[2:]
+        affines = first_image[AFFINE]
+        for name, image in images.items():
+            same_grid = (
+                image[DATA].shape[2:] == shape
+                and torch.allclose(
+                    torch.as_tensor(image[AFFINE]).double(),
+                    torch.as_tensor(affines).double(),
+                )
+            )
+            if not same_grid:
+                message = (
+                    f'Image "{name}" is not on the same grid as the other'
+                    f' images in the batch, so {self.name} cannot be applied'
+                )
+                raise RuntimeError(message)
+
+        mappings = [
+            self.get_voxel_mapping(shape, affine)
+            for affine in np.asarray(affines, dtype=float)
+        ]
+        output_shapes = {mapping.shape for mapping in mappings}
+        if len(output_shapes) > 1:
+            message = (
+                f'The output shapes of {self.name} are different for the'
+                f' samples in the batch: {output_shapes}'
+            )
+            raise RuntimeError(message)
+        coordinates = torch.stack([
+            compose_voxel_mappings([mapping])[0] for mapping in mappings
+        ])
+        output_affines = np.stack([mapping.affine for mapping in mappings])
+
+        interpolation = getattr(self, 'interpolation', Interpolation.LINEAR)
+        for image in images.values():
+            if get_batch_image_type(image) == INTENSITY:
+                image_interpolation = interpolation
+            else:
+                image_interpolation = Interpolation.NEAREST
+            default_values = [
+                self.get_batch_default_value(mapping, tensor)
+                for mapping, tensor in zip(mappings, image[DATA])
+            ]
+            image[DATA] = resample(
+                image[DATA],
+                coordinates,
+                image_interpolation,
+                default_value=torch.stack(default_values),
+            )
+            image[AFFINE] = torch.from_numpy(output_affines)
+        return batch
+
+    @staticmethod
+    def get_batch_default_value(
+            mapping: VoxelMapping,
+            tensor: torch.Tensor,
+            ) -> torch.Tensor:
+        default_value = mapping.default_value
+        if default_value is None:
+            default_value = 0
+        elif callable(default_value):
+            default_value = default_value(tensor)
+        default_value = torch.as_tensor(default_value, dtype=torch.float32)
+        return default_value.reshape(-1).expand(len(tensor))
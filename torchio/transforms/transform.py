@@ -2,18 +2,19 @@ import copy
 import numbers
 import warnings
 from abc import ABC, abstractmethod
-from typing import Optional, Union, Tuple, List
+from typing import Dict, Optional, Union, Tuple, List
 
 import torch
 import numpy as np
 import nibabel as nib
 import SimpleITK as sitk
 
-from .. import TypeData, DATA, AFFINE, TypeNumber
+from .. import TypeData, DATA, AFFINE, TYPE, INTENSITY, TypeNumber
 from ..data.subject import Subject
 from ..data.image import Image, ScalarImage
 from ..utils import nib_to_sitk, sitk_to_nib, is_jsonable, to_tuple
 from .interpolation import Interpolation
+from .resampling import BACKENDS, TORCH_INTERPOLATIONS
 
 
 TypeTransformInput = Union[
@@ -25,6 +26,62 @@ TypeTransformInput = Union[
     dict,
 ]
 
+JSON_TYPES = str, int, float, bool, type(None)
+CONTAINER_TYPES = list, tuple, dict
+
+
+class TransformRecord:
+    """Parameters of a transform call, serialized only when needed.
+
+    The attributes of the transform are copied when it is called, but they are
+    converted to JSON-compatible values only when the history of the subject
+    is read. Whether the values of an attribute need to be converted to
+    strings is stored per transform class and value type, so that
+    :func:`json.dumps` is called once per attribute instead of once per call.
+    Instances are pickled as plain dictionaries.
+
+    Args:
+        transform_class: Class of the transform.
+        parameters: Copy of the attributes of the transform.
+    """
+    _schemas: Dict[type, Dict[Tuple[str, type], bool]] = {}
+
+    def __init__(self, transform_class: type, parameters: dict):
+        self.transform_class = transform_class
+        self.parameters = parameters
+        self._dict = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __reduce__(self):
+        return dict, (self.to_dict(),)
+
+    def to_dict(self) -> dict:
+        if self._dict is None:
+            schema = self._schemas.setdefault(self.transform_class, {})
+            parameters = {}
+            for key, value in self.parameters.items():
+                if not self._is_jsonable(schema, key, value):
+                    value = value.__str__()
+                parameters[key] = value
+            self._dict = parameters
+            self.parameters = None
+        return self._dict
+
+    @staticmethod
+    def _is_jsonable(schema: dict, key: str, value) -> bool:
+        value_type = type(value)
+        if value_type in JSON_TYPES:
+            return True
+        # The contents of containers may differ between calls
+        if value_type in CONTAINER_TYPES:
+            return is_jsonable(value)
+        field = key, value_type
+        if field not in schema:
+            schema[field] = is_jsonable(value)
+        return schema[field]
+
 
 class Transform(ABC):
     """Abstract class for all TorchIO transforms.
@@ -46,7 +103,15 @@ class Transform(ABC):
         copy: Make a shallow copy of the input before applying the transform.
         keys: Mandatory if the input is a Python dictionary. The transform will
             be applied only to the data in each key.
+
+    The parameters of each call are added to the history of the transformed
+    :py:class:`~torchio.Subject`. They are serialized lazily, when the history
+    is read. Set the attribute :attr:`record_history` of an instance to
+    ``False`` to skip recording, e.g. for transforms called many times
+    internally.
     """
+    record_history = True
+
     def __init__(
             self,
             p: float = 1,
@@ -73,8 +138,8 @@ class Transform(ABC):
                 a tensor, the affine matrix is an identity and a tensor will be
                 also returned.
         """
-        self.transform_params = {}
-        self._store_params()
+        if self.record_history:
+            self._store_params()
 
         if torch.rand(1).item() > self.probability:
             return data
@@ -147,7 +212,9 @@ class Transform(ABC):
             transformed = nib.Nifti1Image(data[0].numpy(), image[AFFINE])
 
         # If not a Compose
-        if isinstance(transformed, Subject) and not (self.name in ['Compose', 'OneOf']):
+        is_composition = self.name in ['Compose', 'OneOf']
+        is_recorded = self.record_history and not is_composition
+        if isinstance(transformed, Subject) and is_recorded:
             transformed.add_transform(
                 self,
                 parameters_dict=self.transform_params,
@@ -155,12 +222,69 @@ class Transform(ABC):
 
         return transformed
 
+    def transform_batch(self, batch: dict) -> dict:
+        r"""Transform a collated batch of subjects.
+
+        The parameters are sampled independently for each sample, using the
+        global :py:mod:`torch` random number generator, and applied with
+        vectorized operations. The history of the samples is not recorded.
+
+        Args:
+            batch: Dictionary as returned by a
+                :py:class:`~torch.utils.data.DataLoader`, in which each image
+                is a dictionary with a tensor of shape
+                :math:`(B, C, W, H, D)` and a tensor with :math:`B` affine
+                matrices.
+
+        Returns:
+            Shallow copy of the batch with the transformed images.
+        """
+        batch = {
+            key: dict(value) if is_batch_image(value) else value
+            for key, value in batch.items()
+        }
+        images = get_batch_images_dict(batch, intensity_only=False)
+        if not images:
+            return batch
+        batch_size = len(next(iter(images.values()))[DATA])
+        applied = torch.rand(batch_size) <= self.probability
+        if applied.all():
+            return self.apply_batch_transform(batch)
+        if not applied.any():
+            return batch
+
+        indices = applied.nonzero()[:, 0]
+        subset = dict(batch)
+        for name, image in images.items():
+            subset[name] = dict(image)
+            subset[name][DATA] = image[DATA][indices]
+            subset[name][AFFINE] = image[AFFINE][indices]
+        subset = self.apply_batch_transform(subset)
+        for name, image in images.items():
+            transformed = subset[name][DATA]
+            if transformed.shape[1:] != image[DATA].shape[1:]:
+                message = (
+                    f'{self.name} changes the shape of the images, so it'
+                    ' must be applied to all the samples in the batch'
+                )
+                raise RuntimeError(message)
+            data = image[DATA].to(transformed.dtype, copy=True)
+            data[indices] = transformed
+            affine = image[AFFINE].clone()
+            affine[indices] = torch.as_tensor(
+                subset[name][AFFINE], dtype=affine.dtype)
+            image[DATA] = data
+            image[AFFINE] = affine
+        return batch
+
+    def apply_batch_transform(self, batch: dict) -> dict:
+        message = f'{self.name} does not support batches'
+        raise NotImplementedError(message)
+
     def _store_params(self):
-        self.transform_params.update(self.__dict__.copy())
-        del self.transform_params['transform_params']
-        for key, value in self.transform_params.items():
-            if not is_jsonable(value):
-                self.transform_params[key] = value.__str__()
+        parameters = self.__dict__.copy()
+        parameters.pop('transform_params', None)
+        self.transform_params = TransformRecord(self.__class__, parameters)
 
     @abstractmethod
     def apply_transform(self, subject: Subject):
@@ -352,6 +476,24 @@ class Transform(ABC):
             raise TypeError(message)
         return interpolation
 
+    @staticmethod
+    def parse_backend(backend: str, interpolation: Interpolation) -> str:
+        if backend not in BACKENDS:
+            message = (
+                f'Backend "{backend}" is not among the supported values:'
+                f' {BACKENDS}'
+            )
+            raise ValueError(message)
+        if backend == 'torch' and interpolation not in TORCH_INTERPOLATIONS:
+            supported_values = [key.name.lower() for key in TORCH_INTERPOLATIONS]
+            message = (
+                f'Interpolation "{interpolation.name.lower()}" is not'
+                ' supported by the torch backend. Supported values:'
+                f' {supported_values}'
+            )
+            raise ValueError(message)
+        return backend
+
     def _get_subject_from_tensor(self, tensor: torch.Tensor) -> Subject:
         image = ScalarImage(tensor=tensor)
         return self._get_subject_from_image(image)
@@ -388,3 +530,27 @@ class Transform(ABC):
     @property
     def name(self):
         return self.__class__.__name__
+
+
+def is_batch_image(value) -> bool:
+    return isinstance(value, dict) and DATA in value and AFFINE in value
+
+
+def get_batch_images_dict(batch: dict, intensity_only: bool = True) -> dict:
+    """Return the images in a collated batch."""
+    images = {}
+    for name, value in batch.items():
+        if not is_batch_image(value):
+            continue
+        is_intensity = get_batch_image_type(value) == INTENSITY
+        if intensity_only and not is_intensity:
+            continue
+        images[name] = value
+    return images
+
+
+def get_batch_image_type(image: dict) -> Optional[str]:
+    image_type = image.get(TYPE)
+    if image_type is None or isinstance(image_type, str):
+        return image_type
+    return image_type[0]  # collated as a list of strings
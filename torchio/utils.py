@@ -173,7 +173,12 @@ def nib_to_sitk(
         force_3d: bool = False,
         force_4d: bool = False,
         ) -> sitk.Image:
-    """Create a SimpleITK image from a tensor and a 4x4 affine matrix."""
+    """Create a SimpleITK image from a tensor and a 4x4 affine matrix.
+
+    The array is copied once into a C-contiguous buffer with the axes order
+    expected by SimpleITK, which then copies it into the image buffer.
+    Letting SimpleITK read the transposed array directly is much slower.
+    """
     if data.ndim != 4:
         raise ValueError(f'Input must be 4D, but has shape {tuple(data.shape)}')
     # Possibilities
@@ -190,7 +195,8 @@ def nib_to_sitk(
         array = array[..., 0]
     if not is_multichannel and not force_4d:
         array = array[0]
-    array = array.transpose()  # (W, H, D, C) or (W, H, D)
+    # (D, H, W, C) or (D, H, W) in SimpleITK, which uses (z, y, x) indexing
+    array = np.ascontiguousarray(array.transpose())
     image = sitk.GetImageFromArray(array, isVector=is_multichannel)
 
     rotation, spacing = get_rotation_and_spacing_from_affine(affine)
@@ -211,8 +217,22 @@ def nib_to_sitk(
 def sitk_to_nib(
         image: sitk.Image,
         keepdim: bool = False,
+        dtype: Optional[np.dtype] = None,
         ) -> Tuple[np.ndarray, np.ndarray]:
-    data = sitk.GetArrayFromImage(image).transpose()
+    """Create an array and a 4x4 affine matrix from a SimpleITK image.
+
+    The image buffer is copied only once, even if the data type is converted.
+    The returned array is a transposed view of the copy, so it is not
+    C-contiguous.
+
+    Args:
+        image: SimpleITK image.
+        keepdim: If ``False``, the array is converted to 4D.
+        dtype: Data type of the array. If ``None``, the image type is kept.
+    """
+    # The view is only valid while the image exists, so it is copied here
+    view = sitk.GetArrayViewFromImage(image)
+    data = np.array(view, dtype=dtype).transpose()
     num_components = image.GetNumberOfComponentsPerPixel()
     if num_components == 1:
         data = data[np.newaxis]  # add channels dimension
@@ -223,9 +243,16 @@ def sitk_to_nib(
         data = ensure_4d(data, num_spatial_dims=input_spatial_dims)
     assert data.shape[0] == num_components
     assert data.shape[1: 1 + input_spatial_dims] == image.GetSize()
-    spacing = np.array(image.GetSpacing())
-    direction = np.array(image.GetDirection())
-    origin = image.GetOrigin()
+    affine = get_ras_affine_from_sitk(image)
+    return data, affine
+
+
+def get_ras_affine_from_sitk(
+        sitk_object: Union[sitk.Image, sitk.ImageFileReader],
+        ) -> np.ndarray:
+    spacing = np.array(sitk_object.GetSpacing())
+    direction = np.array(sitk_object.GetDirection())
+    origin = sitk_object.GetOrigin()
     if len(direction) == 9:
         rotation = direction.reshape(3, 3)
     elif len(direction) == 4:  # ignore first dimension if 2D (1, W, H, 1)
@@ -242,7 +269,7 @@ def sitk_to_nib(
     affine = np.eye(4)
     affine[:3, :3] = rotation_zoom
     affine[:3, 3] = translation
-    return data, affine
+    return affine
 
 
 def ensure_4d(tensor: TypeData, num_spatial_dims=None) -> TypeData: